@@ -0,0 +1,62 @@
+"""Compares loading a ChatLog from JSON, eagerly and lazily, with loading it
+from a binary snapshot. For snapshots, both the startup time of load_binary
+and the time to then create every conversation are reported, along with the
+file sizes.
+
+Run with ``python benchmarks/binary.py [size ...]`` from the repository root.
+The default sizes are 10^4, 10^5 and 10^6 messages, in conversations of 1,000
+messages each."""
+
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import gc
+import random
+import tempfile
+from datetime import datetime, timedelta
+from time import perf_counter
+from pychats import ChatLogBuilder, from_json, load_binary
+
+def make_log(size):
+    builder, start = ChatLogBuilder("Benchmark"), datetime(2010, 1, 1)
+    for i in range(size):
+        builder.add(
+         i // 1000, "Contact %i" % (i % 100),
+         start + timedelta(seconds=random.randrange(10 ** 9)), "Message %i" % i
+        )
+    return builder.build()
+
+
+def timed(function, *args):
+    gc.collect()
+    start = perf_counter()
+    result = function(*args)
+    return result, perf_counter() - start
+
+
+if __name__ == "__main__":
+    sizes = [int(size) for size in sys.argv[1:]] or [10 ** 4, 10 ** 5, 10 ** 6]
+    print("%10s %10s %10s %10s %10s %8s %10s %10s" % (
+     "messages", "json", "lazy json", "binary", "+convs", "gain",
+     "json size", "bin size"
+    ))
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, "log.json")
+        binary_path = os.path.join(directory, "log.bin")
+        for size in sizes:
+            log = make_log(size)
+            log.save(json_path)
+            log.save_binary(binary_path)
+            del log
+            log, json_time = timed(from_json, json_path)
+            del log
+            log, lazy_time = timed(from_json, json_path, True)
+            del log
+            log, binary_time = timed(load_binary, binary_path)
+            conversations, convs_time = timed(log.conversations)
+            print("%10i %9.3fs %9.3fs %9.4fs %9.3fs %7.0fx %8.1fMB %8.1fMB" % (
+             size, json_time, lazy_time, binary_time, convs_time,
+             json_time / binary_time,
+             os.path.getsize(json_path) / 2 ** 20,
+             os.path.getsize(binary_path) / 2 ** 20
+            ))
+            del log, conversations
@@ -0,0 +1,71 @@
+"""Compares creating a ChatLog from raw message tuples by building JSON dicts
+and calling ChatLog.from_json, with feeding the tuples to a ChatLogBuilder.
+Both the time taken and the peak memory allocated while loading are reported.
+
+Run with ``python benchmarks/builder.py [size ...]`` from the repository root.
+The default sizes are 10^4, 10^5 and 10^6 messages, in conversations of 1,000
+messages each."""
+
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import gc
+import random
+import tracemalloc
+from datetime import datetime, timedelta
+from time import perf_counter
+from pychats import ChatLog, ChatLogBuilder
+from pychats.chats.timestamps import format_timestamp
+
+def make_rows(size):
+    start = datetime(2010, 1, 1)
+    return [(
+     i // 1000, "Contact %i" % (i % 100),
+     start + timedelta(seconds=random.randrange(10 ** 9)), "Message %i" % i
+    ) for i in range(size)]
+
+
+def load_json(rows):
+    conversations = {}
+    for conversation_id, name, timestamp, text in rows:
+        conversations.setdefault(conversation_id, []).append({
+         "text": text, "timestamp": format_timestamp(timestamp),
+         "sender": {"name": name, "tags": []}
+        })
+    return ChatLog.from_json({"name": "Benchmark", "conversations": [
+     {"messages": messages} for messages in conversations.values()
+    ]})
+
+
+def load_builder(rows):
+    builder = ChatLogBuilder("Benchmark")
+    for row in rows:
+        builder.add(*row)
+    return builder.build()
+
+
+def measure(load, rows):
+    gc.collect()
+    start = perf_counter()
+    log = load(rows)
+    elapsed = perf_counter() - start
+    del log
+    gc.collect()
+    tracemalloc.start()
+    log = load(rows)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 2 ** 20
+
+
+if __name__ == "__main__":
+    sizes = [int(size) for size in sys.argv[1:]] or [10 ** 4, 10 ** 5, 10 ** 6]
+    print("%10s %10s %10s %10s %10s" % (
+     "messages", "json", "builder", "json peak", "build peak"
+    ))
+    for size in sizes:
+        rows = make_rows(size)
+        json_time, json_peak = measure(load_json, rows)
+        builder_time, builder_peak = measure(load_builder, rows)
+        print("%10i %9.3fs %9.3fs %8.1fMB %8.1fMB" % (
+         size, json_time, builder_time, json_peak, builder_peak
+        ))
@@ -0,0 +1,46 @@
+"""Compares adding messages to a Conversation one at a time with
+Conversation.add_messages, for messages in random order.
+
+Run with ``python benchmarks/bulk_add.py [size ...]`` from the repository
+root. The default sizes are 10^4, 10^5 and 10^6 messages - the per-message
+loop is much slower at the largest size."""
+
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import random
+from datetime import datetime, timedelta
+from time import perf_counter
+from pychats import Contact, Conversation, Message
+
+def make_messages(size):
+    contacts = [Contact("Contact %i" % i) for i in range(10)]
+    start = datetime(2010, 1, 1)
+    messages = [Message(
+     "Message %i" % i, start + timedelta(seconds=random.randrange(10 ** 9)),
+     contacts[i % 10]
+    ) for i in range(size)]
+    return contacts, messages
+
+
+def time_loop(messages):
+    conversation = Conversation()
+    start = perf_counter()
+    for message in messages:
+        conversation.add_message(message)
+    return perf_counter() - start
+
+
+def time_bulk(messages):
+    conversation = Conversation()
+    start = perf_counter()
+    conversation.add_messages(messages)
+    return perf_counter() - start
+
+
+if __name__ == "__main__":
+    sizes = [int(size) for size in sys.argv[1:]] or [10 ** 4, 10 ** 5, 10 ** 6]
+    print("%10s %12s %12s %8s" % ("messages", "loop", "bulk", "gain"))
+    for size in sizes:
+        contacts, messages = make_messages(size)
+        loop, bulk = time_loop(messages), time_bulk(messages)
+        print("%10i %11.3fs %11.3fs %7.1fx" % (size, loop, bulk, loop / bulk))
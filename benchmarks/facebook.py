@@ -0,0 +1,51 @@
+"""Compares the BeautifulSoup and event-driven backends for parsing Facebook
+messages.htm files, on generated files with one message per thread, and then
+times loading the largest file into a ChatLog with increasing numbers of
+worker processes, up to the number of CPUs.
+
+Run with ``python benchmarks/facebook.py [threads ...]`` from the repository
+root. The default sizes are 10^3, 10^4 and 5 * 10^4 threads."""
+
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from time import perf_counter
+from pychats.parse.facebook import iter_thread_json, html_to_chatlog
+
+THREAD = ('<div class="thread">%i@facebook.com, 1@facebook.com'
+ '<div class="message"><div class="message_header">'
+ '<span class="user">Contact %i</span>'
+ '<span class="meta">Friday, 19 August 2016 at 13:13 UTC+01</span>'
+ '</div></div><p>Message %i</p></div>')
+
+def make_html(size):
+    return '<html><body><div class="contents"><div>%s</div></div></body></html>' % (
+     "".join(THREAD % (i, i, i) for i in range(size))
+    )
+
+
+def time_backend(html, backend):
+    start = perf_counter()
+    for thread in iter_thread_json(html, backend): pass
+    return perf_counter() - start
+
+
+def time_workers(html, workers):
+    start = perf_counter()
+    html_to_chatlog(html, workers=workers)
+    return perf_counter() - start
+
+
+if __name__ == "__main__":
+    sizes = [int(size) for size in sys.argv[1:]] or [10 ** 3, 10 ** 4, 5 * 10 ** 4]
+    print("%10s %12s %12s %8s" % ("threads", "soup", "events", "gain"))
+    for size in sizes:
+        html = make_html(size)
+        soup, events = time_backend(html, "soup"), time_backend(html, "events")
+        print("%10i %11.3fs %11.3fs %7.1fx" % (size, soup, events, soup / events))
+    print()
+    print("%10s %12s %8s" % ("workers", "load", "gain"))
+    workers, single = 1, time_workers(html, 1)
+    while workers <= (os.cpu_count() or 1):
+        load = single if workers == 1 else time_workers(html, workers)
+        print("%10i %11.3fs %7.1fx" % (workers, load, single / load))
+        workers *= 2
@@ -0,0 +1,88 @@
+"""Reports the memory used per message by Message objects, compared with
+equivalent objects which store their attributes in a ``__dict__`` (as Message
+and Contact did before they had ``__slots__``), by a whole ChatLog, and by
+MessageColumns.
+
+Run with ``python benchmarks/memory.py [messages]`` from the repository root.
+The default is 1,000,000 messages."""
+
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import gc
+import tracemalloc
+from datetime import datetime, timedelta
+from pychats import Contact, Conversation, Message, ChatLog, MessageColumns
+
+class DictContact:
+
+    def __init__(self, name):
+        self._name, self._tags, self._registry = name, set(), None
+
+
+
+class DictMessage:
+
+    def __init__(self, text, timestamp, sender):
+        self._text, self._timestamp = text, timestamp
+        self._sender, self._conversation = sender, None
+
+
+
+def build_chatlog(size):
+    contacts = [Contact("Contact %i" % i) for i in range(100)]
+    log, start = ChatLog("Benchmark"), datetime(2010, 1, 1)
+    for c in range(size // 1000):
+        conversation = Conversation()
+        conversation.add_messages([Message(
+         "Message %i" % i, start + timedelta(seconds=i), contacts[i % 100]
+        ) for i in range(c * 1000, c * 1000 + 1000)])
+        log.add_conversation(conversation)
+    return log
+
+
+def build_messages(message_class, contact_class):
+    def build(size):
+        contacts = [contact_class("Contact %i" % i) for i in range(100)]
+        start = datetime(2010, 1, 1)
+        return [message_class(
+         "Message %i" % i, start + timedelta(seconds=i), contacts[i % 100]
+        ) for i in range(size)]
+    return build
+
+
+def build_columns(size):
+    contacts = [Contact("Contact %i" % i) for i in range(100)]
+    columns, start = MessageColumns(), datetime(2010, 1, 1)
+    for i in range(size):
+        columns.append(
+         "Message %i" % i, start + timedelta(seconds=i), contacts[i % 100]
+        )
+    columns.text(0)
+    return columns
+
+
+def measure(build, size):
+    gc.collect()
+    tracemalloc.start()
+    result = build(size)
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return used / size
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 10 ** 6
+    print("Messages:                  %i" % size)
+    print("Messages with __dict__:    %.0f bytes/message" % measure(
+     build_messages(DictMessage, DictContact), size
+    ))
+    print("Messages with __slots__:   %.0f bytes/message" % measure(
+     build_messages(Message, Contact), size
+    ))
+    print("Whole ChatLog:             %.0f bytes/message" % measure(
+     build_chatlog, size
+    ))
+    print("MessageColumns:            %.0f bytes/message" % measure(
+     build_columns, size
+    ))
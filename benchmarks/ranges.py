@@ -0,0 +1,70 @@
+"""Compares finding the messages sent in a time range with messages_between
+against scanning every message, for one conversation and for a chatlog.
+
+Run with ``python benchmarks/ranges.py [size ...]`` from the repository root.
+The default sizes are 10^4, 10^5 and 10^6 messages. The chatlog splits the
+messages between conversations of 1,000 messages each that all cover the same
+period, so a range query on it has to search every conversation. Every query
+asks for an hour of messages, which is 36 of them."""
+
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from datetime import datetime, timedelta
+from time import perf_counter
+from pychats import Contact, Message, Conversation, ChatLog
+
+def make_messages(size):
+    contacts, start = [Contact("Contact %i" % i) for i in range(2)], datetime(2010, 1, 1)
+    return [Message(
+     "Message %i" % i, start + timedelta(seconds=100 * i), contacts[i % 2]
+    ) for i in range(size)]
+
+
+def make_log(messages):
+    log, count = ChatLog("Benchmark"), max(len(messages) // 1000, 1)
+    for index in range(count):
+        conversation = Conversation()
+        conversation.add_messages(messages[index::count])
+        log.add_conversation(conversation)
+    return log
+
+
+def scan_conversation(conversation, start, end):
+    return [m for m in conversation.messages() if start <= m.timestamp() < end]
+
+
+def scan_log(log, start, end):
+    return sorted([m for conversation in log.conversations()
+     for m in conversation.messages() if start <= m.timestamp() < end
+    ], key=lambda m: m.timestamp())
+
+
+def time(function, *args, repeat=20):
+    start = perf_counter()
+    for _ in range(repeat): list(function(*args))
+    return (perf_counter() - start) / repeat
+
+
+if __name__ == "__main__":
+    sizes = [int(size) for size in sys.argv[1:]] or [10 ** 4, 10 ** 5, 10 ** 6]
+    print("%10s %12s %12s %12s %12s" % (
+     "messages", "conv scan", "conv range", "log scan", "log range"
+    ))
+    for size in sizes:
+        messages = make_messages(size)
+        conversation = Conversation()
+        conversation.add_messages(messages)
+        start = messages[size // 2].timestamp()
+        end = start + timedelta(hours=1)
+        conversation_times = (
+         time(scan_conversation, conversation, start, end, repeat=3),
+         time(conversation.messages_between, start, end)
+        )
+        log = make_log(make_messages(size))
+        log_times = (
+         time(scan_log, log, start, end, repeat=3),
+         time(log.messages_between, start, end)
+        )
+        print("%10i %11.5fs %11.5fs %11.5fs %11.5fs" % (
+         size, *conversation_times, *log_times
+        ))
@@ -0,0 +1,61 @@
+"""Times building, querying, saving and loading a SearchIndex, and compares
+its queries with scanning the text of every message.
+
+Run with ``python benchmarks/search.py [messages]`` from the repository root.
+The default is 1,000,000 messages, in conversations of 1,000 messages each,
+with text drawn from a vocabulary of 50,000 words."""
+
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import random
+import tempfile
+from datetime import datetime, timedelta
+from time import perf_counter
+from pychats import ChatLogBuilder
+from pychats.search import SearchIndex, tokenize
+
+def make_log(size):
+    words = ["word%i" % i for i in range(50000)]
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    builder, start = ChatLogBuilder("Benchmark"), datetime(2010, 1, 1)
+    for i in range(size):
+        builder.add(
+         i // 1000, "Contact %i" % (i % 100), start + timedelta(seconds=i),
+         " ".join(random.choices(words, weights, k=random.randrange(1, 12)))
+        )
+    return builder.build()
+
+
+def scan(log, query):
+    terms = set(tokenize(query))
+    return [message for conversation in log
+     for message in conversation._messages
+      if terms <= set(tokenize(message.text()))]
+
+
+def time(function, *args):
+    start = perf_counter()
+    result = function(*args)
+    return perf_counter() - start, result
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 10 ** 6
+    log = make_log(size)
+    elapsed, index = time(SearchIndex, log)
+    print("%i messages, %i terms" % (len(index), len(index._postings)))
+    print("%-24s %10.3fs" % ("build", elapsed))
+    path = os.path.join(tempfile.mkdtemp(), "index")
+    print("%-24s %10.3fs" % ("save", time(index.save, path)[0]))
+    print("%-24s %10.3fs" % ("load", time(SearchIndex.load, path, log)[0]))
+    os.remove(path)
+    os.rmdir(os.path.dirname(path))
+    print("%-24s %10s %10s %10s" % ("query", "results", "index", "scan"))
+    for query in (
+     "word40000", "word3", "word3 word40000", "word1 word2 word3",
+     '"word1 word2"', "word4000*"
+    ):
+        elapsed, results = time(index.search, query)
+        scanned = "-" if "*" in query or '"' in query\
+         else "%.3fs" % time(scan, log, query)[0]
+        print("%-24s %10i %9.4fs %10s" % (query, len(results), elapsed, scanned))
@@ -0,0 +1,88 @@
+"""Times the pychats.stats functions on a synthetic MessageColumns store, and
+compares them with the equivalent loops over Message objects. They are also
+timed on a ChatLog of the same messages, both building each conversation's
+columns and with the conversations keeping them.
+
+Run with ``python benchmarks/stats.py [messages]`` from the repository root.
+The default is 10,000,000 messages - the Message loops are run on a tenth of
+that, as they need all the Message objects in memory."""
+
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import random
+from array import array
+from collections import Counter
+from time import perf_counter
+from pychats import Contact, MessageColumns, Conversation, ChatLog
+import pychats.stats as stats
+
+def make_columns(size):
+    columns = MessageColumns()
+    columns.contacts = [Contact("Contact %i" % i) for i in range(2)]
+    timestamp, timestamps = 1262304000 * 10 ** 6, []
+    for _ in range(size):
+        timestamp += random.randrange(600 * 10 ** 6)
+        timestamps.append(timestamp)
+    columns.timestamps = array("q", timestamps)
+    columns.senders = array("I", [random.randrange(2) for _ in range(size)])
+    columns.offsets = array("Q", [0] * (size + 1))
+    return columns
+
+
+def message_loop(messages):
+    counts, hours, times, previous = Counter(), Counter(), [], None
+    for message in messages:
+        counts[message.sender()] += 1
+        hours[message.timestamp().hour] += 1
+        if previous and previous.sender() is not message.sender():
+            times.append(message.timestamp() - previous.timestamp())
+        previous = message
+    return counts, hours, times
+
+
+def make_chatlog(columns, messages, conversations=10):
+    chatlog = ChatLog("Benchmark")
+    size = messages // conversations
+    for start in range(0, size * conversations, size):
+        chunk = MessageColumns()
+        chunk.contacts = columns.contacts
+        chunk.timestamps = columns.timestamps[start:start + size]
+        chunk.senders = columns.senders[start:start + size]
+        chunk.offsets = array("Q", [0] * (size + 1))
+        chatlog.add_conversation(Conversation.from_columns(chunk))
+    return chatlog
+
+
+def time(function, *args):
+    start = perf_counter()
+    function(*args)
+    return perf_counter() - start
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 10 ** 7
+    columns = make_columns(size)
+    print("NumPy: %s" % ("yes" if stats.numpy is not None else "no"))
+    print("%i messages in MessageColumns:" % size)
+    for name, function, args in [
+     ("message_counts", stats.message_counts, ()),
+     ("histogram (hour)", stats.histogram, ("hour",)),
+     ("histogram (day)", stats.histogram, ("day",)),
+     ("response_times", stats.response_times, ()),
+     ("streaks", stats.streaks, ())]:
+        seconds = time(function, columns, *args)
+        print("  %-20s %8.3fs" % (name, seconds))
+    loop_size = size // 10
+    chatlog = make_chatlog(columns, loop_size)
+    print("%i messages in a ChatLog:" % loop_size)
+    seconds = time(stats.message_counts, chatlog)
+    print("  %-24s %8.3fs" % ("message_counts", seconds))
+    for conversation in chatlog: conversation.columns(keep=True)
+    seconds = time(stats.message_counts, chatlog)
+    print("  %-24s %8.3fs" % ("message_counts (kept)", seconds))
+    messages = list(columns[:loop_size])
+    seconds = time(message_loop, messages)
+    print("Loop over %i Messages (counts, hours, response times): %.3fs" % (
+     loop_size, seconds
+    ))
+    print("  extrapolated to %i messages: %.1fs" % (size, seconds * 10))
@@ -0,0 +1,39 @@
+"""Compares the pychats timestamp codecs, including the Facebook meta line
+parser, with strptime/strftime.
+
+Run with ``python benchmarks/timestamps.py`` from the repository root."""
+
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from datetime import datetime
+from timeit import timeit
+from pychats.chats.timestamps import parse_timestamp, format_timestamp
+from pychats.parse.facebook import parse_meta, META_FORMAT
+
+NUMBER = 100000
+TEXT = "2009-05-23 12:12:01"
+TIMESTAMP = datetime(2009, 5, 23, 12, 12, 1)
+META = "Friday, 19 August 2016 at 13:13 UTC+01"
+
+def compare(name, old, new):
+    old_time, new_time = timeit(old, number=NUMBER), timeit(new, number=NUMBER)
+    print("%-22s %8.2f us %8.2f us %6.1fx" % (
+     name, old_time / NUMBER * 1e6, new_time / NUMBER * 1e6, old_time / new_time
+    ))
+
+
+if __name__ == "__main__":
+    print("%-22s %11s %11s %7s" % ("", "strptime", "codec", "gain"))
+    compare(
+     "parse", lambda: datetime.strptime(TEXT, "%Y-%m-%d %H:%M:%S"),
+     lambda: parse_timestamp(TEXT)
+    )
+    compare(
+     "format", lambda: TIMESTAMP.strftime("%Y-%m-%d %H:%M:%S"),
+     lambda: format_timestamp(TIMESTAMP)
+    )
+    compare(
+     "facebook meta", lambda: datetime.strptime(
+      " ".join(META.split(" ")[:-1]), META_FORMAT
+     ), lambda: parse_meta(META)
+    )
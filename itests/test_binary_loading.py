@@ -0,0 +1,30 @@
+import json
+import os
+from unittest import TestCase
+import pychats
+from pychats import stats
+
+class Tests(TestCase):
+
+    def tearDown(self):
+        if os.path.exists("itests/test_files/temp.bin"):
+            os.remove("itests/test_files/temp.bin")
+
+
+    def test_binary_round_trip(self):
+        log = pychats.from_json("itests/test_files/log.json")
+        log.save_binary("itests/test_files/temp.bin")
+        loaded = pychats.load_binary("itests/test_files/temp.bin")
+        self.assertEqual(
+         repr(loaded), "<'Intercepted communications' ChatLog (3 Conversations)>"
+        )
+        self.assertEqual(
+         {c.name(): n for c, n in stats.message_counts(loaded).items()},
+         {c.name(): n for c, n in stats.message_counts(log).items()}
+        )
+        self.assertEqual(
+         json.dumps(loaded.to_json(), sort_keys=True),
+         json.dumps(log.to_json(), sort_keys=True)
+        )
+        for conversation in loaded.conversations():
+            self.assertIs(conversation.chatlog(), loaded)
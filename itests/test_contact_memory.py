@@ -0,0 +1,71 @@
+import gc
+import os
+import tracemalloc
+import weakref
+from unittest import TestCase
+import pychats
+
+class Tests(TestCase):
+
+    def test_contacts_are_freed_with_their_chatlog(self):
+        log = pychats.from_json("itests/test_files/log.json")
+        refs = [weakref.ref(message.sender()) for conv in log.conversations()
+         for message in conv.messages()]
+        del log
+        gc.collect()
+        self.assertTrue(refs)
+        self.assertTrue(all(ref() is None for ref in refs))
+
+
+    def test_memory_is_flat_across_repeated_loads(self):
+        contacts = len(pychats.Contact.all_contacts)
+        for _ in range(100):
+            pychats.from_json("itests/test_files/log.json")
+        gc.collect()
+        tracemalloc.start()
+        try:
+            baseline = tracemalloc.get_traced_memory()[0]
+            for _ in range(1000):
+                pychats.from_json("itests/test_files/log.json")
+            gc.collect()
+            growth = tracemalloc.get_traced_memory()[0] - baseline
+        finally:
+            tracemalloc.stop()
+        self.assertLess(growth, 64 * 1024)
+        self.assertEqual(len(pychats.Contact.all_contacts), contacts)
+
+
+    def test_loading_inside_a_scope_uses_its_contacts(self):
+        log = pychats.from_json("itests/test_files/log.json")
+        names = set(c.name() for conv in log for c in conv.participants())
+        log.save_binary("itests/test_files/temp.bin")
+        try:
+            loaders = [
+             lambda: pychats.from_json("itests/test_files/log.json"),
+             lambda: pychats.from_json("itests/test_files/log.json", lazy=True),
+             lambda: list(pychats.iter_json("itests/test_files/log.json")),
+             lambda: pychats.load_binary("itests/test_files/temp.bin"),
+             lambda: pychats.ChatLog.from_json(log.to_json())
+            ]
+            for load in loaders:
+                with pychats.ContactScope() as contacts:
+                    first, second = load(), load()
+                senders = [
+                 set(c for conv in loaded for c in conv.participants())
+                 for loaded in (first, second)
+                ]
+                self.assertEqual(set(c.name() for c in senders[0]), names)
+                self.assertEqual(senders[0], senders[1])
+                self.assertEqual(set(contacts), senders[0])
+                for contact in senders[0]:
+                    self.assertNotIn(contact, pychats.Contact.all_contacts)
+        finally:
+            os.remove("itests/test_files/temp.bin")
+
+
+    def test_loading_facebook_inside_a_scope_uses_its_contacts(self):
+        with pychats.ContactScope() as contacts:
+            log = pychats.from_facebook("itests/test_files/messages.htm")
+        senders = set(c for conv in log for c in conv.participants())
+        self.assertTrue(senders)
+        self.assertEqual(set(contacts), senders)
@@ -79,3 +79,23 @@ class Tests(TestCase):
         last_message = conversation1.messages()[-1]
         last_message.timestamp(datetime(1990, 1, 1, 12, 30, 12))
         self.assertEqual(conversation1.messages()[0], last_message)
+
+
+    def test_participants_follow_sender_changes(self):
+        marvin = pychats.Contact("Marvin Goodwright")
+        mildred = pychats.Contact("Mildred Mayhew")
+        spencer = pychats.Contact("Spencer Splendidboots")
+        conversation = pychats.Conversation()
+        message1 = pychats.Message("Hi", datetime(2009, 5, 23, 12, 0, 0), mildred)
+        message2 = pychats.Message("Hey", datetime(2009, 5, 23, 12, 0, 1), marvin)
+        conversation.add_messages([message1, message2])
+        self.assertEqual(message1.recipients(), set([marvin]))
+        message2.sender(spencer)
+        self.assertEqual(conversation.participants(), set([mildred, spencer]))
+        self.assertEqual(message1.recipients(), set([spencer]))
+        self.assertEqual(conversation.sender_counts(), {mildred: 1, spencer: 1})
+        message2.sender(mildred)
+        self.assertEqual(conversation.participants(), set([mildred]))
+        self.assertEqual(message1.recipients(), set())
+        self.assertEqual(conversation.messages_by(mildred), [message1, message2])
+        self.assertEqual(conversation.messages_by(spencer), [])
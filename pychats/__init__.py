@@ -1,5 +1,8 @@
 __version__ = "2.2.0"
 __author__ = "Sam Ireland"
 
-from .chats import Contact, Conversation, Message, ChatLog, from_json
+from .chats import Contact, ContactRegistry, ContactScope, Conversation, Message
+from .chats import ColumnConversation
+from .chats import MessageColumns, ChatLog, ChatLogBuilder, from_json, iter_json
+from .chats import LazyChatLog, load_binary
 from .parse import from_facebook
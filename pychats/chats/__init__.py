@@ -1,4 +1,7 @@
-from .people import Contact
+from .people import Contact, ContactRegistry, ContactScope
 from .messages import Message
-from .conversations import Conversation
-from .chatlogs import ChatLog, from_json
+from .columns import MessageColumns
+from .views import SequenceView, SetView
+from .conversations import Conversation, ColumnConversation
+from .chatlogs import ChatLog, LazyChatLog, ChatLogBuilder
+from .chatlogs import from_json, iter_json, load_binary
@@ -1,7 +1,22 @@
-"""This module contains the Chatlog class."""
+"""This module contains the Chatlog class, the LazyChatLog class for
+chatlogs that are decoded from a file as they are used, and the
+ChatLogBuilder class for creating chatlogs from raw message data."""
 
+import heapq
 import json
-from .conversations import Conversation
+import weakref
+from collections import OrderedDict
+from datetime import datetime
+from json.encoder import encode_basestring_ascii
+from .people import Contact, _load_registry
+from .messages import Message, _check_json
+from .conversations import Conversation, ColumnConversation, _check_range
+from .columns import MessageColumns
+from .views import SetView
+from .jsonfiles import JsonItemReader
+from .mapping import map_file, open_map, replace_file
+from .snapshots import write_snapshot, read_snapshot, read_columns
+from .timestamps import parse_timestamp, format_timestamp
 
 class ChatLog:
     """A collection of :py:class:`.Conversation` objects from a single source.
@@ -13,6 +28,7 @@ class ChatLog:
             raise TypeError("name must be str, not '%s'" % name)
         self._name = name
         self._conversations = set()
+        self._indexes = weakref.WeakSet()
 
 
     @staticmethod
@@ -20,6 +36,12 @@ class ChatLog:
         """An alternate constructor. It creates a py:class:`.ChatLog` from a
         JSON ``dict``.
 
+        Senders are looked up in a new py:class:`.ContactRegistry` for each
+        chatlog, so contacts are shared within the chatlog but not with
+        contacts that were created elsewhere - unless a
+        py:class:`.ContactScope` is active, in which case the scope's
+        registry is used.
+
         :param dict json: The ``dict`` to convert.
         :raises TypeError: if something other than a ``dict`` is given.
         :raises ValueError: if the ``dict`` doesn't have a ``name`` key.
@@ -32,9 +54,12 @@ class ChatLog:
             raise ValueError("ChatLog json needs 'name' key: %s" % str(json))
         if "conversations" not in json:
             raise ValueError("ChatLog json needs 'conversations' key: %s" % str(json))
-        conversations = [Conversation.from_json(c) for c in json["conversations"]]
+        contacts = _load_registry()
+        conversations = [
+         Conversation.from_json(c, contacts) for c in json["conversations"]
+        ]
         log = ChatLog(json["name"])
-        log._conversations = conversations
+        log.add_conversations(conversations)
         return log
 
 
@@ -46,6 +71,14 @@ class ChatLog:
         )
 
 
+    def __len__(self):
+        return len(self._conversations)
+
+
+    def __iter__(self):
+        return iter(self._conversations)
+
+
     def name(self, name=None):
         """Returns the name of the chatlog. If a string is provided, the
         name will be updated to that.
@@ -60,12 +93,37 @@ class ChatLog:
             return self._name
 
 
-    def conversations(self):
+    def conversations(self, copy=False):
         """Returns all the :py:class:`.Conversation` objects in this chatlog.
+        By default this is a read-only view, which reflects conversations
+        being added to and removed from the chatlog later.
+
+        :param bool copy: If ``True``, a new ``set`` is returned.
+        :returns: ``SetView`` of ``Conversation``"""
+
+        if copy: return set(self._conversations)
+        return SetView(self._conversations)
+
 
-        :returns: ``set`` of ``Conversation``"""
+    def messages_between(self, start=None, end=None):
+        """Returns the :py:class:`.Message` objects from every conversation in
+        the chatlog that were sent at or after one time and before another, in
+        timestamp order. Each conversation's messages in the range are found
+        by binary search, and the conversations are then merged lazily, so
+        only as many messages are looked at as are taken from the iterator.
 
-        return set(self._conversations)
+        :param datetime start: If given, earlier messages are left out.
+        :param datetime end: If given, messages sent at this time or later are\
+        left out.
+        :raises TypeError: if something other than a ``datetime`` is given.
+        :returns: iterator of ``Message``"""
+
+        _check_range(start, end)
+        ranges = []
+        for conversation in self:
+            messages = conversation.messages_between(start, end)
+            if messages: ranges.append(messages)
+        return heapq.merge(*ranges, key=Message.timestamp)
 
 
     def add_conversation(self, conversation):
@@ -88,6 +146,34 @@ class ChatLog:
             )
         self._conversations.add(conversation)
         conversation._chatlog = self
+        if self._indexes: self._notify("_add_conversations", [conversation])
+
+
+    def add_conversations(self, conversations):
+        """Adds several :py:class:`.Conversation` objects to the chatlog at
+        once, validating them all before any are added.
+
+        :param conversations: an iterable of ``Conversation`` objects to add.
+        :raises ValueError: if you try to add a conversation that is already\
+        there, or give the same conversation more than once."""
+
+        conversations, seen = list(conversations), set()
+        for conversation in conversations:
+            if not isinstance(conversation, Conversation):
+                raise TypeError(
+                 "Can only add Conversation objects, not '%s'" % conversation
+                )
+            if conversation in self._conversations or conversation in seen:
+                raise ValueError(
+                 "Cannot add %s to %s as it is already present" % (
+                  str(conversation), self
+                 )
+                )
+            seen.add(conversation)
+        self._conversations.update(seen)
+        for conversation in seen:
+            conversation._chatlog = self
+        if self._indexes: self._notify("_add_conversations", conversations)
 
 
     def remove_conversation(self, conversation):
@@ -96,6 +182,7 @@ class ChatLog:
         :param Conversation conversation: the conversation to remove."""
 
         self._conversations.remove(conversation)
+        if self._indexes: self._notify("_remove_conversations", [conversation])
 
 
     def to_json(self):
@@ -114,17 +201,501 @@ class ChatLog:
     def save(self, path):
         """Saves the ChatLog to a JSON file.
 
+        The JSON is written a chunk of messages at a time rather than being
+        built up in memory first, but it is identical to what you would get
+        from dumping :py:meth:`to_json`. It is written to a temporary file
+        which then replaces the file at the path, so a lazy chatlog can be
+        saved over the file it was loaded from and still be used afterwards.
+
+        :param str path: The file to save it to."""
+
+        with replace_file(path, "w") as f:
+            _write_json(self, f)
+
+
+    def save_binary(self, path):
+        """Saves the ChatLog to a binary snapshot file, which can be loaded
+        again with :py:func:`.load_binary` much faster than JSON can be. The
+        snapshot keeps everything that :py:meth:`to_json` does, and also keeps
+        timestamps to the microsecond.
+
+        Timestamps must be naive ``datetime`` objects. As with :py:meth:`save`,
+        the file at the path is replaced rather than overwritten, so a lazy
+        chatlog can be saved over the file it was loaded from.
+
         :param str path: The file to save it to."""
-        
-        with open(path, "w") as f:
-            json.dump(self.to_json(), f)
 
+        with replace_file(path, "wb") as f:
+            write_snapshot(self._name, self._columns(), f)
+
+
+    def _modified(self, conversation):
+        # Called whenever one of the chatlog's conversations changes.
+        pass
+
+
+    def _notify(self, name, items):
+        # Passes a change to the chatlog on to its search indexes.
+        for index in list(self._indexes):
+            getattr(index, name)(items)
+
+
+    def _columns(self):
+        # Returns a MessageColumns store for each conversation, largest first.
+        return [conversation._columns() for conversation in sorted(
+         self._conversations, key=lambda k: k.length(), reverse=True
+        )]
+
+
+
+class ChatLogBuilder:
+    """Creates a :py:class:`.ChatLog` from raw message data, without going
+    through JSON ``dict`` objects. Parsers feed it ``(conversation_id,
+    sender_name, timestamp, text)`` values with :py:meth:`add`, and once every
+    message has been added, :py:meth:`build` creates the chatlog.
+
+    Senders are interned by name, so there is one :py:class:`.Contact` per
+    name, and they are added to a single :py:class:`.ContactRegistry`. The
+    messages of each conversation are stored as columns until the chatlog is
+    built, and each conversation is then sorted once.
+
+    :param str name: The name of the chatlog.
+    :param ContactRegistry contacts: The registry to add senders to. If this\
+    isn't given, the active :py:class:`.ContactScope`'s registry is used, or\
+    a new one if there is no scope."""
+
+    def __init__(self, name, contacts=None):
+        if not isinstance(name, str):
+            raise TypeError("name must be str, not '%s'" % name)
+        self._name = name
+        self._contacts = _load_registry() if contacts is None else contacts
+        self._senders = {}
+        self._conversations = {}
+
+
+    def __repr__(self):
+        return "<ChatLogBuilder '%s' (%i message%s)>" % (
+         self._name, len(self), "" if len(self) == 1 else "s"
+        )
+
+
+    def __len__(self):
+        return sum(len(c[0]) for c in self._conversations.values())
+
+
+    def find(self, name):
+        """Returns the :py:class:`.Contact` the builder uses for the given
+        sender name, or ``None`` if it hasn't seen that name yet and there is
+        no contact with that name in its registry.
+
+        :param str name: The name to look up.
+        :rtype: ``Contact``"""
+
+        sender = self._senders.get(name)
+        if sender is None:
+            sender = self._contacts.find(name)
+            if sender is not None: self._senders[name] = sender
+        return sender
+
+
+    def add_contact(self, contact):
+        """Tells the builder to use the given :py:class:`.Contact` for all
+        messages from senders with its name.
+
+        :param Contact contact: The contact to use.
+        :raises TypeError: if a non-Contact is given.
+        :raises ValueError: if the builder already has a contact of that name."""
+
+        if not isinstance(contact, Contact):
+            raise TypeError("Can only add Contact objects, not '%s'" % contact)
+        if contact.name() in self._senders:
+            raise ValueError("There is already a contact called '%s'" % (
+             contact.name()
+            ))
+        self._senders[contact.name()] = contact
+        self._contacts.add(contact)
+
+
+    def add_conversation(self, conversation_id):
+        """Makes sure that the chatlog will have a conversation with the given
+        ID, even if no messages are added to it.
+
+        :param conversation_id: Any hashable value identifying the conversation."""
+
+        if conversation_id not in self._conversations:
+            self._conversations[conversation_id] = ([], [], [])
+
+
+    def add(self, conversation_id, sender_name, timestamp, text):
+        """Adds a message to the conversation with the given ID, which will
+        be created if this is its first message. Messages can be added in any
+        order.
+
+        :param conversation_id: Any hashable value identifying the conversation.
+        :param str sender_name: The name of the person who sent the message.
+        :param datetime timestamp: The time the message was sent.
+        :param str text: The text of the message.
+        :raises TypeError: if the timestamp is not a ``datetime``.
+        :raises TypeError: if the text is not a ``str``."""
+
+        if not isinstance(timestamp, datetime):
+            raise TypeError("timestamp must be datetime, not '%s'" % timestamp)
+        if not isinstance(text, str):
+            raise TypeError("text must be str, not '%s'" % text)
+        sender = self._senders.get(sender_name) or self.find(sender_name)
+        if sender is None:
+            sender = Contact(sender_name)
+            self.add_contact(sender)
+        columns = self._conversations.get(conversation_id)
+        if columns is None:
+            columns = self._conversations[conversation_id] = ([], [], [])
+        columns[0].append(timestamp)
+        columns[1].append(sender)
+        columns[2].append(text)
+
+
+    def build(self):
+        """Creates the :py:class:`.ChatLog`, with one :py:class:`.Conversation`
+        for each conversation ID. Messages with the same timestamp keep the
+        order they were added in. The builder is emptied afterwards.
+
+        :rtype: ``ChatLog``"""
+
+        conversations = [
+         _make_conversation(columns) for columns in self._conversations.values()
+        ]
+        self._conversations = {}
+        log = ChatLog(self._name)
+        log.add_conversations(conversations)
+        return log
+
+
+    def _pop_conversation(self, conversation_id):
+        # Creates just one conversation, and forgets its messages.
+        return _make_conversation(self._conversations.pop(conversation_id))
+
+
+
+def _make_conversation(columns):
+    # Conversations are kept as columns unless a timestamp has a time zone,
+    # which the columns can't store.
+    timestamps, senders, texts = columns
+    if any(timestamp.tzinfo is not None for timestamp in timestamps):
+        conversation = Conversation()
+        conversation.add_messages(map(Message, texts, timestamps, senders))
+        return conversation
+    store = MessageColumns()
+    for index in sorted(range(len(timestamps)), key=timestamps.__getitem__):
+        store.append(texts[index], timestamps[index], senders[index])
+    return ColumnConversation(store)
+
+
+
+class LazyChatLog(ChatLog):
+    """A :py:class:`.ChatLog` whose conversations stay in the file it was
+    loaded from until they are needed. These are created by
+    :py:func:`.load_binary`, and by :py:func:`.from_json` when ``lazy`` is
+    ``True``.
+
+    Iterating over a lazy chatlog decodes one conversation at a time, and the
+    most recently used ``cache_size`` conversations are kept, so even very
+    large chatlogs can be browsed in constant memory. A conversation remains
+    the same object for as long as anything else refers to it, and once it
+    has been changed it is kept for as long as the chatlog, so that the
+    changes are never lost.
+
+    Anything that needs every conversation at once - such as
+    :py:meth:`conversations`, adding or removing conversations,
+    :py:meth:`to_json` or saving - decodes them all and keeps them, after
+    which the chatlog behaves like any other ``ChatLog``.
+
+    :param str name: The name of the chatlog.
+    :param source: The object the conversations are decoded from.
+    :param int cache_size: The number of decoded conversations to keep."""
+
+    def __init__(self, name, source, cache_size=128):
+        ChatLog.__init__(self, name)
+        if not isinstance(cache_size, int):
+            raise TypeError("cache_size must be int, not '%s'" % cache_size)
+        if cache_size < 0:
+            raise ValueError("cache_size cannot be negative")
+        del self._conversations
+        self._source, self._cache_size = source, cache_size
+        self._cache, self._live = OrderedDict(), weakref.WeakValueDictionary()
+        self._changed, self._indexes_of = {}, weakref.WeakKeyDictionary()
+
+
+    def __repr__(self):
+        return "<'%s' ChatLog (%i Conversation%s)>" % (
+         self._name, len(self), "" if len(self) == 1 else "s"
+        )
+
+
+    def __len__(self):
+        if self.loaded(): return ChatLog.__len__(self)
+        return len(self._source)
+
+
+    def __iter__(self):
+        if self.loaded():
+            yield from ChatLog.__iter__(self)
+        else:
+            for index in range(len(self._source)):
+                yield self._conversation(index)
+
+
+    def __getattr__(self, name):
+        if name != "_conversations" or "_source" not in self.__dict__:
+            raise AttributeError(name)
+        conversations = set(
+         self._conversation(index) for index in range(len(self._source))
+        )
+        self._conversations = conversations
+        return conversations
+
+
+    def loaded(self):
+        """Returns ``True`` if every conversation has been decoded and is
+        being kept.
 
+        :rtype: ``bool``"""
 
-def from_json(path):
+        return "_conversations" in self.__dict__
+
+
+    def _conversation(self, index):
+        conversation = self._cache.get(index)
+        if conversation is not None:
+            self._cache.move_to_end(index)
+            return conversation
+        conversation = self._live.get(index)
+        if conversation is None:
+            conversation = self._source.conversation(index)
+            conversation._chatlog = self
+            self._live[index] = conversation
+            self._indexes_of[conversation] = index
+        if self._cache_size:
+            self._cache[index] = conversation
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return conversation
+
+
+    def _modified(self, conversation):
+        # Changed conversations are never dropped, as the changes are only in
+        # the conversation objects.
+        if not self.loaded():
+            index = self._indexes_of.get(conversation)
+            if index is not None: self._changed[index] = conversation
+
+
+    def _columns(self):
+        # Conversations that are still in use may have been changed, so their
+        # columns come from them rather than from the file.
+        if self.loaded():
+            return ChatLog._columns(self)
+        columns = []
+        for index in range(len(self._source)):
+            conversation = self._live.get(index)
+            columns.append(self._source.columns(index) if conversation is None
+             else conversation._columns())
+        return columns
+
+
+
+class _SnapshotSource:
+    # The conversations of a memory-mapped binary snapshot.
+
+    def __init__(self, data, contacts, locations):
+        self._data, self._contacts = data, contacts
+        self._locations = locations
+
+
+    def __len__(self):
+        return len(self._locations)
+
+
+    def conversation(self, index):
+        return ColumnConversation(self.columns(index))
+
+
+    def columns(self, index):
+        return read_columns(self._data, self._locations[index], self._contacts)
+
+
+
+class _JsonSource:
+    # The conversations of a memory-mapped JSON file, found by their spans.
+    # Senders are shared between every conversation decoded.
+
+    def __init__(self, data, spans):
+        self._data, self._spans = data, spans
+        self._builder = ChatLogBuilder("")
+
+
+    def __len__(self):
+        return len(self._spans)
+
+
+    def conversation(self, index):
+        start, end = self._spans[index]
+        _add_conversation_json(
+         self._builder, index, json.loads(self._data[start:end])
+        )
+        return self._builder._pop_conversation(index)
+
+
+    def columns(self, index):
+        return self.conversation(index)._columns()
+
+
+
+def _write_json(log, f, chunk_size=1000):
+    # Writes the same JSON as json.dump(log.to_json(), f), with each sender's
+    # JSON only encoded once.
+    senders = {}
+    f.write('{"name": %s, "conversations": [' % encode_basestring_ascii(log._name))
+    conversations = sorted(
+     log._conversations, key=lambda k: k.length(), reverse=True
+    )
+    for index, conversation in enumerate(conversations):
+        f.write(', {"messages": [' if index else '{"messages": [')
+        chunk, separator = [], ""
+        for message in conversation._iter_messages():
+            sender = senders.get(message._sender)
+            if sender is None:
+                sender = senders[message._sender] = json.dumps(
+                 message._sender.to_json()
+                )
+            chunk.append('{"text": %s, "timestamp": "%s", "sender": %s}' % (
+             encode_basestring_ascii(message._text),
+             format_timestamp(message._timestamp),
+             sender
+            ))
+            if len(chunk) == chunk_size:
+                f.write(separator + ", ".join(chunk))
+                chunk, separator = [], ", "
+        if chunk:
+            f.write(separator + ", ".join(chunk))
+        f.write("]}")
+    f.write("]}")
+
+
+def from_json(path, lazy=False, cache_size=128):
     """Creates a JSON object from a JSON file at the specified path.
 
+    The file is memory-mapped and decoded incrementally, and each
+    conversation's messages are passed to a :py:class:`.ChatLogBuilder` as
+    soon as it has been read, so neither the text nor the JSON of the whole
+    file is ever held in memory at once.
+
+    If ``lazy`` is ``True``, the file is only scanned to find where each
+    conversation is, and a :py:class:`.LazyChatLog` is returned which decodes
+    conversations from the file when they are needed. Conversations are then
+    only checked when they are decoded.
+
+    :path str path: The path to the JSON file.
+    :param bool lazy: If ``True``, conversations are decoded when needed.
+    :param int cache_size: The number of decoded conversations a lazy\
+    chatlog keeps.
+    :raises ValueError: if the JSON doesn't have a ``name`` key.
+    :raises ValueError: if the JSON doesn't have a ``conversations`` key.
+    :rtype: ``ChatLog``"""
+
+    if lazy: return _lazy_from_json(path, cache_size)
+    with map_file(path) as f:
+        reader = JsonItemReader(f)
+        name, builder = None, ChatLogBuilder("")
+        for index, (key, value) in enumerate(reader):
+            if key == "conversations":
+                _add_conversation_json(builder, index, value)
+            elif key == "name":
+                name = value
+    _check_json_keys(reader, path)
+    # The name can come after the conversations, and is checked by build().
+    builder._name = name
+    return builder.build()
+
+
+def _lazy_from_json(path, cache_size):
+    data = open_map(path)
+    reader, name, spans = JsonItemReader(data), None, []
+    for key, value in reader:
+        if key == "conversations":
+            spans.append(reader.span)
+        elif key == "name":
+            name = value
+    _check_json_keys(reader, path)
+    return LazyChatLog(name, _JsonSource(data, spans), cache_size)
+
+
+def _check_json_keys(reader, path):
+    if "name" not in reader.keys:
+        raise ValueError("ChatLog json needs 'name' key: %s" % path)
+    if "conversations" not in reader.keys:
+        raise ValueError("ChatLog json needs 'conversations' key: %s" % path)
+
+
+def iter_json(path):
+    """Yields the :py:class:`.Conversation` objects in a JSON file at the
+    specified path one at a time, reading the file incrementally as it goes.
+    Senders are shared between the conversations yielded.
+
     :path str path: The path to the JSON file."""
 
-    with open(path) as f:
-        return ChatLog.from_json(json.load(f))
+    # The registry is chosen now, in case iteration starts outside of a scope.
+    return _iter_json_conversations(path, _load_registry())
+
+
+def _iter_json_conversations(path, contacts):
+    with map_file(path) as f:
+        for key, value in _iter_json_items(JsonItemReader(f), contacts):
+            if key == "conversations":
+                yield value
+
+
+def load_binary(path, cache_size=128):
+    """Loads a :py:class:`.LazyChatLog` from a binary snapshot file created
+    with :py:meth:`.ChatLog.save_binary`.
+
+    The file is memory-mapped, and only its name, contacts and the positions
+    of its conversations are read straight away - each conversation is
+    created when it is needed. The file stays mapped for as long as the
+    chatlog exists.
+
+    :param str path: The path to the snapshot file.
+    :param int cache_size: The number of decoded conversations to keep.
+    :raises ValueError: if the file isn't a valid snapshot.
+    :rtype: ``LazyChatLog``"""
+
+    data = open_map(path)
+    name, contacts, locations = read_snapshot(data)
+    return LazyChatLog(
+     name, _SnapshotSource(data, contacts, locations), cache_size
+    )
+
+
+def _add_conversation_json(builder, conversation_id, json):
+    # Does the same checks as Conversation.from_json and Message.from_json.
+    if not isinstance(json, dict):
+        raise TypeError("'%s' is not a dict" % str(json))
+    if "messages" not in json:
+        raise ValueError("Conversation json needs 'messages' key: %s" % str(json))
+    builder.add_conversation(conversation_id)
+    for message in json["messages"]:
+        _check_json(message)
+        name = message["sender"]["name"]
+        if builder.find(name) is None:
+            builder.add_contact(Contact.from_json(message["sender"]))
+        builder.add(
+         conversation_id, name,
+         parse_timestamp(message["timestamp"]), message["text"]
+        )
+
+
+def _iter_json_items(reader, contacts):
+    for key, value in reader:
+        if key == "conversations":
+            yield key, Conversation.from_json(value, contacts)
+        else:
+            yield key, value
@@ -0,0 +1,149 @@
+"""This module contains the MessageColumns class, a compact column-oriented
+store of messages."""
+
+from array import array
+from .messages import Message
+from .timestamps import timestamp_to_epoch, epoch_to_timestamp
+
+class MessageColumns:
+    """A compact store of a sequence of messages, held as columns rather than
+    as one :py:class:`.Message` object per message. Timestamps are stored as
+    microseconds since the epoch in an integer array, senders as indexes into
+    a table of :py:class:`.Contact` objects, and the text of every message in
+    one string with an array of offsets into it.
+
+    This takes a small fraction of the memory of the equivalent
+    ``Message`` objects, which makes it suitable for holding very large logs
+    for analysis. Indexing or iterating over it creates ``Message`` objects
+    on demand - these are new objects each time, and do not belong to any
+    :py:class:`.Conversation`. A :py:class:`.ColumnConversation` can be
+    used to keep a whole conversation in this form.
+
+    Timestamps must be naive ``datetime`` objects."""
+
+    def __init__(self):
+        self.timestamps = array("q")
+        self.senders = array("I")
+        self.offsets = array("Q", [0])
+        self.contacts = []
+        self._contact_indexes = {}
+        self._text = ""
+        self._pending = []
+
+
+    @staticmethod
+    def from_messages(messages):
+        """An alternate constructor. It creates a :py:class:`.MessageColumns`
+        from an iterable of :py:class:`.Message` objects, in the order given.
+
+        :param messages: An iterable of ``Message`` objects.
+        :rtype: ``MessageColumns``"""
+
+        columns = MessageColumns()
+        for message in messages:
+            columns.append(message._text, message._timestamp, message._sender)
+        return columns
+
+
+    def __repr__(self):
+        return "<MessageColumns (%i message%s)>" % (
+         len(self), "" if len(self) == 1 else "s"
+        )
+
+
+    def __len__(self):
+        return len(self.timestamps)
+
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0: index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("MessageColumns index out of range")
+        return Message(
+         self.text(index),
+         epoch_to_timestamp(self.timestamps[index]),
+         self.contacts[self.senders[index]]
+        )
+
+
+    def __iter__(self):
+        text, offsets, contacts = self._join_text(), self.offsets, self.contacts
+        for index, (timestamp, sender) in enumerate(
+         zip(self.timestamps, self.senders)):
+            yield Message(
+             text[offsets[index]:offsets[index + 1]],
+             epoch_to_timestamp(timestamp), contacts[sender]
+            )
+
+
+    def append(self, text, timestamp, sender):
+        """Adds a message to the end of the columns.
+
+        :param str text: The text of the message.
+        :param datetime timestamp: The time the message was sent.
+        :param Contact sender: The :py:class:`.Contact` who sent the message."""
+
+        index = self._contact_indexes.get(sender)
+        if index is None:
+            index = self._contact_indexes[sender] = len(self.contacts)
+            self.contacts.append(sender)
+        self.timestamps.append(timestamp_to_epoch(timestamp))
+        self.senders.append(index)
+        self.offsets.append(self.offsets[-1] + len(text))
+        self._pending.append(text)
+
+
+    def text(self, index):
+        """Returns the text of the message at the given position, without
+        creating a ``Message`` for it.
+
+        :param int index: The position of the message.
+        :rtype: ``str``"""
+
+        return self._join_text()[self.offsets[index]:self.offsets[index + 1]]
+
+
+    def sender(self, index):
+        """Returns the :py:class:`.Contact` who sent the message at the given
+        position, without creating a ``Message`` for it.
+
+        :param int index: The position of the message.
+        :rtype: ``Contact``"""
+
+        return self.contacts[self.senders[index]]
+
+
+    def timestamp(self, index):
+        """Returns the time the message at the given position was sent,
+        without creating a ``Message`` for it.
+
+        :param int index: The position of the message.
+        :rtype: ``datetime``"""
+
+        return epoch_to_timestamp(self.timestamps[index])
+
+
+    def copy(self):
+        """Returns a new :py:class:`.MessageColumns` with the same messages,
+        which can be changed without affecting this one.
+
+        :rtype: ``MessageColumns``"""
+
+        columns = MessageColumns()
+        columns.timestamps = array("q", self.timestamps)
+        columns.senders = array("I", self.senders)
+        columns.offsets = array("Q", self.offsets)
+        columns.contacts = list(self.contacts)
+        columns._contact_indexes = dict(self._contact_indexes)
+        columns._text = self._join_text()
+        return columns
+
+
+    def _join_text(self):
+        # Returns the text of every message as one string.
+        if self._pending:
+            self._text += "".join(self._pending)
+            self._pending = []
+        return self._text
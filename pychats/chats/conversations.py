@@ -1,14 +1,49 @@
-"""This module contains the Conversation class."""
-
+"""This module contains the Conversation class, and the ColumnConversation
+class which keeps its messages as columns."""
+
+import weakref
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from collections.abc import Sequence, Set
+from contextlib import contextmanager
+from datetime import datetime
+from .people import Contact
 from .messages import Message
+from .columns import MessageColumns
+from .timestamps import timestamp_to_epoch, epoch_to_timestamp
+from .views import SequenceView, SetView
 
 class Conversation:
     """Represents a conversation between two or more people. Ultimately it is a
-    collection of messages, each of which has a sender."""
+    collection of messages, each of which has a sender.
+
+    Messages are kept in timestamp order, alongside a parallel list of their
+    timestamps which is used to find a message's position by binary search.
+    The conversation also keeps an index of each participant's messages, with
+    their own parallel list of timestamps, so that one person's messages can
+    be found without going through everyone else's. Each participant's
+    messages are in the same order as they are in the conversation, including
+    messages sent at the same time."""
+
+    __slots__ = (
+     "_messages", "_timestamps", "_message_set", "_participants", "_senders",
+     "_deferred",
+     "_unordered", "_chatlog", "_changes", "_sender_changes",
+     "_column_cache", "__weakref__"
+    )
 
     def __init__(self):
         self._messages = []
+        self._timestamps = []
+        self._message_set = set()
+        self._participants = {}
+        self._senders = weakref.WeakValueDictionary()
+        self._deferred = 0
+        self._unordered = False
         self._chatlog = None
+        self._changes = 0
+        self._sender_changes = 0
+        self._column_cache = None
 
 
     def __len__(self):
@@ -16,11 +51,12 @@ class Conversation:
 
 
     @staticmethod
-    def from_json(json):
+    def from_json(json, contacts=None):
         """An alternate constructor. It creates a py:class:`.Conversation` from
         a JSON ``dict``.
 
         :param dict json: The ``dict`` to convert.
+        :param ContactRegistry contacts: The contacts to look senders up in.
         :raises TypeError: if something other than a ``dict`` is given.
         :raises ValueError: if the ``dict`` doesn't have a ``messages`` key.
         :rtype: ``Conversation``"""
@@ -29,25 +65,65 @@ class Conversation:
             raise TypeError("'%s' is not a dict" % str(json))
         if "messages" not in json:
             raise ValueError("Conversation json needs 'messages' key: %s" % str(json))
-        messages = [Message.from_json(m) for m in json["messages"]]
-        messages = _sort_messages(messages)
+        messages = [Message.from_json(m, contacts) for m in json["messages"]]
+        conversation = Conversation()
+        conversation.add_messages(messages)
+        return conversation
+
+
+    @staticmethod
+    def from_columns(columns):
+        """An alternate constructor. It creates a py:class:`.Conversation` from
+        a :py:class:`.MessageColumns` store, creating a py:class:`.Message`
+        for each message in it.
+
+        :param MessageColumns columns: The columns to convert.
+        :rtype: ``Conversation``"""
+
         conversation = Conversation()
-        conversation._messages = messages
+        conversation.add_messages(columns)
         return conversation
 
 
     def __repr__(self):
         return "<Conversation (%i message%s)>" % (
-         len(self._messages), "" if len(self._messages) == 1 else "s"
+         self.length(), "" if self.length() == 1 else "s"
         )
 
 
-    def messages(self):
-        """Returns the :py:class:`.Message` objects in the conversation.
+    def messages(self, copy=False):
+        """Returns the :py:class:`.Message` objects in the conversation, in
+        timestamp order. By default this is a read-only view of the
+        conversation's messages, which reflects later changes to it - if you
+        need a list of your own, ask for a copy.
+
+        As with a ``dict``, adding or removing messages or changing their
+        timestamps while iterating over the view raises ``RuntimeError``. To
+        change messages as you go, iterate over a copy, or change timestamps
+        inside :py:meth:`deferred_ordering`.
+
+        :param bool copy: If ``True``, a new ``list`` is returned.
+        :rtype: ``SequenceView`` of ``Message``"""
+
+        if copy: return list(self._messages)
+        return SequenceView(self._messages, owner=self)
+
 
-        :rtype: ``Message``"""
+    def messages_between(self, start=None, end=None):
+        """Returns the :py:class:`.Message` objects in the conversation that
+        were sent at or after one time and before another, in timestamp order.
+        The messages are found by binary search on their timestamps, and are
+        returned as a view rather than being copied into a new list. Using
+        the view after the conversation has changed raises ``RuntimeError``.
 
-        return list(self._messages)
+        :param datetime start: If given, earlier messages are left out.
+        :param datetime end: If given, messages sent at this time or later are\
+        left out.
+        :raises TypeError: if something other than a ``datetime`` is given.
+        :rtype: ``SequenceView`` of ``Message``"""
+
+        indexes = range(*self._range(start, end))
+        return SequenceView(self._messages, indexes, self)
 
 
     def add_message(self, message):
@@ -62,27 +138,87 @@ class Conversation:
 
         if not isinstance(message, Message):
             raise TypeError("'%s' is not a Message object" % str(message))
-        if message in self._messages:
+        if message in self._message_set:
             raise ValueError(
              "'%s' is already in '%s'" % (str(message), str(self))
             )
-        if self._messages and message.timestamp() < self._messages[0].timestamp():
-            self._messages.insert(0, message)
-        else:
-            self._messages.append(message)
-            if len(self._messages) > 1\
-             and message.timestamp() < self._messages[-2].timestamp():
-                self._messages = sorted(self._messages, key=lambda k: k.timestamp())
+        timestamp = message.timestamp()
+        _insert_message(self._messages, self._timestamps, message, timestamp)
+        self._changes += 1
+        self._modified()
+        self._message_set.add(message)
+        self._index_sender(message, message.sender(), timestamp)
         message._conversation = self
+        self._notify("_add_messages", [message])
+
+
+    def add_messages(self, messages):
+        """Adds several :py:class:`.Message` objects to the conversation at
+        once. This is equivalent to calling :py:meth:`add_message` on each of
+        them, but the messages are validated in one pass and merged into the
+        conversation with a single sort, so it is much faster for large numbers
+        of messages.
+
+        :param messages: an iterable of ``Message`` objects to add.
+        :raises ValueError: if a message is given that is already there, or\
+        is given more than once."""
+
+        messages, seen = list(messages), set()
+        for message in messages:
+            if not isinstance(message, Message):
+                raise TypeError("'%s' is not a Message object" % str(message))
+            if message in self._message_set or message in seen:
+                raise ValueError(
+                 "'%s' is already in '%s'" % (str(message), str(self))
+                )
+            seen.add(message)
+        added = messages
+        timestamps = [message.timestamp() for message in messages]
+        merge = bool(self._timestamps and timestamps\
+         and min(timestamps) < self._timestamps[-1])
+        if merge:
+            # Sorting the existing messages and the new ones together lets the
+            # sort merge the already-ordered runs it finds.
+            messages = self._messages + messages
+            timestamps = self._timestamps + timestamps
+            self._messages.clear()
+            self._timestamps.clear()
+        order = sorted(range(len(messages)), key=timestamps.__getitem__)
+        self._messages.extend([messages[index] for index in order])
+        self._timestamps.extend([timestamps[index] for index in order])
+        self._changes += 1
+        self._modified()
+        self._message_set.update(seen)
+        if merge:
+            self._index_senders()
+        else:
+            for index in order:
+                message = messages[index]
+                self._index_sender(message, message.sender(), timestamps[index])
+        for message in seen:
+            message._conversation = self
+        self._notify("_add_messages", added)
 
 
     def remove_message(self, message):
         """Removes a :py:class:`.Message` from the conversation.
 
-        :param Message message: the ``Message`` to remove."""
+        :param Message message: the ``Message`` to remove.
+        :raises ValueError: if the message is not in the conversation."""
 
-        self._messages.remove(message)
+        if message not in self._message_set:
+            raise ValueError("'%s' is not in '%s'" % (str(message), str(self)))
+        index = _find_message(
+         self._messages, self._timestamps, message, message.timestamp()
+        )
+        del self._messages[index]
+        del self._timestamps[index]
+        self._changes += 1
+        self._modified()
+        self._message_set.remove(message)
+        self._unindex_sender(message, message.sender(), message.timestamp())
         message._conversation = None
+        self._notify("_remove_messages", [message])
 
 
     def length(self):
@@ -103,14 +239,97 @@ class Conversation:
         return self._chatlog
 
 
-    def participants(self):
+    def participants(self, copy=False):
         """Returns all the :py:class:`.Contact` objects who have sent messages
-        in this conversation."""
+        in this conversation. By default this is a read-only view, which
+        reflects later changes to the conversation.
+
+        :param bool copy: If ``True``, a new ``set`` is returned.
+        :returns: ``SetView`` of ``Contact``"""
+
+        if copy: return set(self._participants)
+        return SetView(self._participants.keys())
+
+
+    def messages_by(self, contact, copy=False):
+        """Returns the :py:class:`.Message` objects in the conversation that
+        were sent by a particular :py:class:`.Contact`, in timestamp order.
+        These come from the conversation's index of each participant's
+        messages, so the other participants' messages are never looked at. As
+        with :py:meth:`messages`, this is a read-only view unless a copy is
+        asked for, and changing senders or timestamps while iterating over it
+        raises ``RuntimeError``. The view stays current even while the contact
+        has no messages in the conversation.
+
+        :param Contact contact: The sender to get the messages of.
+        :param bool copy: If ``True``, a new ``list`` is returned.
+        :raises TypeError: if something other than a ``Contact`` is given.
+        :rtype: ``SequenceView`` of ``Message``"""
+
+        if not isinstance(contact, Contact):
+            raise TypeError("contact must be Contact, not '%s'" % str(contact))
+        if self._unordered: self._sort()
+        entry = self._participants.get(contact)
+        if copy: return list(entry[0]) if entry else []
+        messages = entry[0] if entry else self._senders.get(contact)
+        if messages is None:
+            messages = self._senders[contact] = _SenderMessages()
+        return SequenceView(messages, None, self, "_sender_changes")
+
+
+    def sender_counts(self):
+        """Returns the number of messages each participant has sent in this
+        conversation.
+
+        :returns: ``dict`` of ``Contact`` to ``int``"""
+
+        return {
+         sender: len(messages)
+         for sender, (messages, _) in self._participants.items()
+        }
+
+
+    @contextmanager
+    def deferred_ordering(self):
+        """A context manager for editing lots of message timestamps at once.
+        Normally each edit moves the message to its new position straight
+        away, but inside the ``with`` block the conversation is only put back
+        in order once, when the block exits.
+
+            >>> with conversation.deferred_ordering():
+            ...     for message in conversation.messages():
+            ...         message.timestamp(message.timestamp() + offset)
+
+        The messages may be out of order until the block exits."""
+
+        self._deferred += 1
+        try:
+            yield self
+        finally:
+            self._deferred -= 1
+            if not self._deferred and self._unordered:
+                self._sort()
+
+
+    def columns(self, keep=False):
+        """Returns a compact :py:class:`.MessageColumns` copy of the messages
+        in the conversation, in timestamp order. This is a snapshot - it is not
+        updated when the conversation changes.
 
-        participants = set()
-        for message in self.messages():
-            participants.add(message.sender())
-        return participants
+        If ``keep`` is ``True``, the conversation also keeps its own copy of
+        the columns until it next changes. Asking for them again then only
+        costs a copy, and the :py:mod:`pychats.stats` functions use them
+        without building new ones - at the cost of holding the columns in
+        memory alongside the messages.
+
+        :param bool keep: If ``True``, the conversation keeps the columns.
+        :rtype: ``MessageColumns``"""
+
+        columns = self._columns()
+        if keep:
+            self._column_cache = columns
+            return columns.copy()
+        return columns if columns is not self._column_cache else columns.copy()
 
 
     def to_json(self):
@@ -121,6 +340,455 @@ class Conversation:
         return {"messages": [message.to_json() for message in self._messages]}
 
 
+    def _range(self, start, end):
+        # Returns the positions of the first message sent at or after start,
+        # and of the first message sent at or after end.
+        _check_range(start, end)
+        if self._unordered: self._sort()
+        low, high = 0, len(self._timestamps)
+        if start is not None: low = bisect_left(self._timestamps, start)
+        if end is not None: high = bisect_left(self._timestamps, end, low)
+        return low, high
+
+
+    def _columns(self):
+        # Returns the columns the conversation has kept, which must not be
+        # changed, or new columns if it hasn't kept any.
+        if self._unordered: self._sort()
+        if self._column_cache is not None: return self._column_cache
+        return MessageColumns.from_messages(self._messages)
+
+
+    def _sort(self):
+        self._messages[:] = _sort_messages(self._messages)
+        self._timestamps = [message.timestamp() for message in self._messages]
+        self._changes += 1
+        self._modified()
+        self._index_senders()
+        self._unordered = False
+
+
+    def _move_message(self, message, old_timestamp):
+        # Moves a message whose timestamp has changed to its new position. If
+        # ordering is deferred, the stored timestamps are left as they are so
+        # that they stay sorted until the conversation is re-sorted.
+        self._modified()
+        if self._deferred:
+            self._unordered = True
+            return
+        index = _find_message(
+         self._messages, self._timestamps, message, old_timestamp
+        )
+        del self._messages[index]
+        del self._timestamps[index]
+        timestamp = message.timestamp()
+        _insert_message(self._messages, self._timestamps, message, timestamp)
+        self._changes += 1
+        sender = message.sender()
+        self._unindex_sender(message, sender, old_timestamp)
+        self._index_sender(message, sender, timestamp)
+
+
+    def _change_sender(self, message, old_sender):
+        # Moves a message whose sender has changed to its new sender's index.
+        # Messages sent at the same time are put in the order they have in the
+        # conversation, unless it is about to be re-sorted and re-indexed.
+        self._modified()
+        timestamp, sender = message.timestamp(), message.sender()
+        self._unindex_sender(message, old_sender, timestamp)
+        self._index_sender(message, sender, timestamp)
+        if self._unordered: return
+        messages, timestamps = self._participants[sender]
+        low = bisect_left(timestamps, timestamp)
+        high = bisect_right(timestamps, timestamp, low)
+        if high - low > 1:
+            start = bisect_left(self._timestamps, timestamp)
+            end = bisect_right(self._timestamps, timestamp, start)
+            messages[low:high] = [
+             m for m in self._messages[start:end] if m.sender() == sender
+            ]
+
+
+    def _change_text(self, message):
+        # Passes on a change to a message's text.
+        self._modified()
+        self._notify("_update_messages", [message])
+
+
+    def _index_sender(self, message, sender, timestamp):
+        self._sender_changes += 1
+        entry = self._participants.get(sender) or self._add_participant(sender)
+        _insert_message(entry[0], entry[1], message, timestamp)
+
+
+    def _unindex_sender(self, message, sender, timestamp):
+        self._sender_changes += 1
+        messages, timestamps = self._participants[sender]
+        index = _find_message(messages, timestamps, message, timestamp)
+        del messages[index]
+        del timestamps[index]
+        if not messages: del self._participants[sender]
+
+
+    def _index_senders(self):
+        # Rebuilds the index of each participant's messages from the ordered
+        # messages. The existing lists are refilled rather than replaced, so
+        # that views of them stay current.
+        self._sender_changes += 1
+        for messages, timestamps in self._participants.values():
+            messages.clear()
+            timestamps.clear()
+        participants = self._participants
+        self._participants = {}
+        for message, timestamp in zip(self._messages, self._timestamps):
+            sender = message.sender()
+            entry = self._participants.get(sender)
+            if entry is None:
+                entry = participants.get(sender) or self._add_participant(sender)
+                self._participants[sender] = entry
+            entry[0].append(message)
+            entry[1].append(timestamp)
+
+
+    def _add_participant(self, sender):
+        # Each participant's messages are kept with their timestamps. The
+        # list of messages is kept weakly once the sender has none, for as
+        # long as a view of it exists, so that the view stays current without
+        # the conversation keeping every contact it was asked about.
+        messages = self._senders.get(sender)
+        if messages is None:
+            messages = self._senders[sender] = _SenderMessages()
+        entry = self._participants[sender] = (messages, [])
+        return entry
+
+
+    def _modified(self):
+        # Called whenever the messages, or anything about them, change.
+        self._column_cache = None
+        if self._chatlog is not None: self._chatlog._modified(self)
+
+
+    def _message_list(self):
+        # Returns the conversation's list of Message objects, which must not be
+        # changed.
+        return self._messages
+
+
+    def _iter_messages(self):
+        # Iterates over the messages without needing them to be kept.
+        return iter(self._messages)
+
+
+    def _notify(self, name, messages):
+        # Passes changes to messages on to any search indexes of the chatlog.
+        if self._chatlog is not None and self._chatlog._indexes:
+            self._chatlog._notify(name, messages)
+
+
+
+class ColumnConversation(Conversation):
+    """A :py:class:`.Conversation` which keeps its messages in a
+    :py:class:`.MessageColumns` store rather than as :py:class:`.Message`
+    objects, so that it takes a fraction of the memory. These are created by
+    :py:func:`.load_binary`, :py:func:`.from_json` and
+    :py:class:`.ChatLogBuilder`.
+
+    Message objects are created from the columns when they are asked for, and
+    a message is the same object every time it is asked for, for as long as
+    anything refers to it. Reading the conversation - its messages, length,
+    participants, columns and JSON - works from the columns. The first time
+    the conversation or one of its messages is changed, or
+    :py:meth:`messages_by` is used, it creates a ``Message`` for every message
+    and from then on behaves like any other ``Conversation``.
+
+    :param MessageColumns columns: The messages, in timestamp order. These\
+    must not be changed afterwards.
+    :raises TypeError: if something other than ``MessageColumns`` is given.
+    :raises ValueError: if the messages are not in timestamp order."""
+
+    __slots__ = ("_source", "_views", "_source_senders")
+
+    def __init__(self, columns):
+        if not isinstance(columns, MessageColumns):
+            raise TypeError("'%s' is not a MessageColumns object" % str(columns))
+        timestamps = columns.timestamps
+        if any(a > b for a, b in zip(timestamps, timestamps[1:])):
+            raise ValueError("Columns must be in timestamp order")
+        Conversation.__init__(self)
+        self._source, self._views = columns, weakref.WeakValueDictionary()
+        self._source_senders = None
+
+
+    def columns_kept(self):
+        """Returns ``True`` if the messages are still only kept as columns,
+        and ``False`` once the conversation has created a
+        :py:class:`.Message` object for every message.
+
+        :rtype: ``bool``"""
+
+        return self._source is not None
+
+
+    def messages(self, copy=False):
+        if self._source is None: return Conversation.messages(self, copy)
+        if copy: return list(_ColumnMessages(self))
+        return SequenceView(_ColumnMessages(self), owner=self)
+
+    messages.__doc__ = Conversation.messages.__doc__
+
+
+    def messages_between(self, start=None, end=None):
+        if self._source is None:
+            return Conversation.messages_between(self, start, end)
+        indexes = range(*self._range(start, end))
+        return SequenceView(_ColumnMessages(self), indexes, self)
+
+    messages_between.__doc__ = Conversation.messages_between.__doc__
+
+
+    def add_message(self, message):
+        self._keep_messages()
+        Conversation.add_message(self, message)
+
+    add_message.__doc__ = Conversation.add_message.__doc__
+
+
+    def add_messages(self, messages):
+        self._keep_messages()
+        Conversation.add_messages(self, messages)
+
+    add_messages.__doc__ = Conversation.add_messages.__doc__
+
+
+    def remove_message(self, message):
+        self._keep_messages()
+        Conversation.remove_message(self, message)
+
+    remove_message.__doc__ = Conversation.remove_message.__doc__
+
+
+    def length(self):
+        if self._source is None: return Conversation.length(self)
+        return len(self._source)
+
+    length.__doc__ = Conversation.length.__doc__
+
+
+    def participants(self, copy=False):
+        if self._source is None: return Conversation.participants(self, copy)
+        if copy: return set(self._get_source_senders())
+        return SetView(_ColumnParticipants(self))
+
+    participants.__doc__ = Conversation.participants.__doc__
+
+
+    def messages_by(self, contact, copy=False):
+        self._keep_messages()
+        return Conversation.messages_by(self, contact, copy)
+
+    messages_by.__doc__ = Conversation.messages_by.__doc__
+
+
+    def sender_counts(self):
+        if self._source is None: return Conversation.sender_counts(self)
+        contacts = self._source.contacts
+        return {
+         contacts[index]: count
+         for index, count in Counter(self._source.senders).items()
+        }
+
+    sender_counts.__doc__ = Conversation.sender_counts.__doc__
+
+
+    def columns(self, keep=False):
+        if self._source is None: return Conversation.columns(self, keep)
+        return self._source.copy()
+
+    columns.__doc__ = Conversation.columns.__doc__
+
+
+    def to_json(self):
+        if self._source is None: return Conversation.to_json(self)
+        return {"messages": [message.to_json() for message in self._source]}
+
+    to_json.__doc__ = Conversation.to_json.__doc__
+
+
+    def _range(self, start, end):
+        if self._source is None: return Conversation._range(self, start, end)
+        _check_range(start, end)
+        timestamps = self._source.timestamps
+        low, high = 0, len(timestamps)
+        if start is not None:
+            low = bisect_left(timestamps, timestamp_to_epoch(start))
+        if end is not None:
+            high = bisect_left(timestamps, timestamp_to_epoch(end), low)
+        return low, high
+
+
+    def _columns(self):
+        if self._source is None: return Conversation._columns(self)
+        return self._source
+
+
+    def _move_message(self, message, old_timestamp):
+        # The stored timestamps come from the columns, so they are still the
+        # old ones.
+        self._keep_messages()
+        Conversation._move_message(self, message, old_timestamp)
+
+
+    def _change_sender(self, message, old_sender):
+        # The message already has its new sender when the index of each
+        # participant's messages is first made, so there is nothing to move.
+        if self._source is None:
+            Conversation._change_sender(self, message, old_sender)
+        else:
+            self._keep_messages()
+            self._modified()
+
+
+    def _change_text(self, message):
+        self._keep_messages()
+        Conversation._change_text(self, message)
+
+
+    def _message_list(self):
+        self._keep_messages()
+        return self._messages
+
+
+    def _iter_messages(self):
+        if self._source is None: return Conversation._iter_messages(self)
+        return iter(self._source)
+
+
+    def _message(self, index):
+        # Returns the Message for a position, creating it if nothing else
+        # refers to it already.
+        message = self._views.get(index)
+        if message is None:
+            message = self._source[index]
+            message._conversation = self
+            self._views[index] = message
+        return message
+
+
+    def _get_source_senders(self):
+        if self._source_senders is None:
+            contacts = self._source.contacts
+            self._source_senders = frozenset(
+             contacts[index] for index in set(self._source.senders)
+            )
+        return self._source_senders
+
+
+    def _keep_messages(self):
+        # Replaces the columns with a Message object for each message, using
+        # the messages that are already in use.
+        columns = self._source
+        if columns is None: return
+        messages = [self._message(index) for index in range(len(columns))]
+        self._messages.extend(messages)
+        self._timestamps.extend(map(epoch_to_timestamp, columns.timestamps))
+        self._message_set.update(messages)
+        self._source = self._views = self._source_senders = None
+        self._index_senders()
+
+
+
+class _ColumnMessages(Sequence):
+    # The messages of a ColumnConversation, which come from its columns until
+    # it keeps Message objects.
+
+    __slots__ = ("_conversation",)
+
+    def __init__(self, conversation):
+        self._conversation = conversation
+
+
+    def __len__(self):
+        return self._conversation.length()
+
+
+    def __getitem__(self, index):
+        conversation = self._conversation
+        if conversation._source is None: return conversation._messages[index]
+        length = len(conversation._source)
+        if index < 0: index += length
+        if not 0 <= index < length:
+            raise IndexError("Conversation index out of range")
+        return conversation._message(index)
+
+
+    def __contains__(self, item):
+        conversation = self._conversation
+        if conversation._source is None: return item in conversation._messages
+        return isinstance(item, Message) and item._conversation is conversation
+
+
+
+class _ColumnParticipants(Set):
+    # The participants of a ColumnConversation, which come from its columns
+    # until it keeps Message objects.
+
+    __slots__ = ("_conversation",)
+
+    def __init__(self, conversation):
+        self._conversation = conversation
+
+
+    def _senders(self):
+        conversation = self._conversation
+        if conversation._source is None: return conversation._participants
+        return conversation._get_source_senders()
+
+
+    def __len__(self):
+        return len(self._senders())
+
+
+    def __iter__(self):
+        return iter(self._senders())
+
+
+    def __contains__(self, item):
+        return item in self._senders()
+
+
+
+class _SenderMessages(list):
+    # A list of one sender's messages, which can be referred to weakly.
+
+    __slots__ = ("__weakref__",)
+
+
+
+def _check_range(start, end):
+    if start is not None and not isinstance(start, datetime):
+        raise TypeError("start must be datetime, not '%s'" % str(start))
+    if end is not None and not isinstance(end, datetime):
+        raise TypeError("end must be datetime, not '%s'" % str(end))
+
 
 def _sort_messages(messages):
     return sorted(messages, key=lambda k: k.timestamp())
+
+
+def _insert_message(messages, timestamps, message, timestamp):
+    # Inserts a message into a list of messages in timestamp order, after any
+    # messages with the same timestamp.
+    index = bisect_right(timestamps, timestamp)
+    messages.insert(index, message)
+    timestamps.insert(index, timestamp)
+
+
+def _find_message(messages, timestamps, message, timestamp):
+    # Finds the position of a message in a list of messages in timestamp
+    # order, falling back to a linear search if it isn't where its timestamp
+    # says it should be.
+    index = bisect_left(timestamps, timestamp)
+    while index < len(messages) and timestamps[index] == timestamp:
+        if messages[index] is message: return index
+        index += 1
+    return messages.index(message)
@@ -0,0 +1,144 @@
+"""This module contains the tools for reading pychats JSON files incrementally,
+so that a large file never has to be held in memory as one ``dict``."""
+
+import codecs
+import json
+
+_WHITESPACE = " \t\n\r"
+
+class JsonItemReader:
+    """Reads the top-level object of a pychats JSON file from a file handle a
+    chunk at a time. Iterating over it yields ``(key, value)`` pairs for each
+    top-level key, except that the ``conversations`` array is not decoded in
+    one go - instead a ``("conversations", conversation)`` pair is yielded for
+    each of its elements as soon as that element has been read. The keys that
+    have been read so far are available as the ``keys`` attribute, and the
+    position in the file of the conversation most recently yielded as the
+    ``span`` attribute - a ``(start, end)`` pair of byte offsets for binary
+    input, or of character offsets for text input.
+
+    The file can also be a binary file handle or a memory-mapped file, in
+    which case it is decoded as UTF-8 a chunk at a time as it is read.
+
+    :param f: A text or binary file handle (or anything with a ``read``\
+    method).
+    :param int chunk_size: The number of characters (or bytes) to read at a\
+    time."""
+
+    def __init__(self, f, chunk_size=65536):
+        self._file = f
+        self._chunk_size = chunk_size
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+        self._bytes_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._binary = False
+        self._mark_pos, self._mark = 0, 0
+        self.keys = set()
+        self.span = None
+
+
+    def __iter__(self):
+        if self._next_char() != "{":
+            raise TypeError("ChatLog JSON must be an object")
+        self._pos += 1
+        if self._next_char() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self._decode()
+            if not isinstance(key, str):
+                raise ValueError("Expected a key, not '%s'" % str(key))
+            self._expect(":")
+            self.keys.add(key)
+            if key == "conversations" and self._next_char() == "[":
+                self._pos += 1
+                yield from self._iter_array(key)
+            else:
+                yield key, self._decode()
+            if self._expect(",}") == "}":
+                break
+
+
+    def _iter_array(self, key):
+        if self._next_char() == "]":
+            self._pos += 1
+            return
+        while True:
+            self._next_char()
+            start = self._offset(self._pos)
+            value = self._decode()
+            self.span = (start, self._offset(self._pos))
+            yield key, value
+            if self._expect(",]") == "]":
+                break
+
+
+    def _read(self):
+        # Drop what has already been consumed, and read at least as much again
+        # as is being kept so that retrying a long value stays linear.
+        if self._eof: return False
+        self._offset(self._pos)
+        self._mark_pos = 0
+        self._buffer = self._buffer[self._pos:]
+        self._pos = 0
+        chunk = self._file.read(max(self._chunk_size, len(self._buffer)))
+        if not chunk:
+            self._eof = True
+            if not isinstance(chunk, str):
+                self._buffer += self._bytes_decoder.decode(b"", True)
+            return False
+        if not isinstance(chunk, str):
+            self._binary = True
+            chunk = self._bytes_decoder.decode(chunk)
+        self._buffer += chunk
+        return True
+
+
+    def _offset(self, pos):
+        # Works out the position in the file of a position in the buffer,
+        # counting on from the last position asked for.
+        text = self._buffer[self._mark_pos:pos]
+        if self._binary and not text.isascii():
+            self._mark += len(text.encode("utf-8", "surrogatepass"))
+        else:
+            self._mark += len(text)
+        self._mark_pos = pos
+        return self._mark
+
+
+    def _next_char(self):
+        while True:
+            while self._pos < len(self._buffer):
+                if self._buffer[self._pos] not in _WHITESPACE:
+                    return self._buffer[self._pos]
+                self._pos += 1
+            if not self._read():
+                raise ValueError("Unexpected end of JSON file")
+
+
+    def _expect(self, chars):
+        char = self._next_char()
+        if char not in chars:
+            raise ValueError("Expected one of '%s' in JSON, not '%s'" % (
+             chars, char
+            ))
+        self._pos += 1
+        return char
+
+
+    def _decode(self):
+        self._next_char()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._read(): raise
+                continue
+            # A value running to the end of the buffer (such as a number) may
+            # continue in the next chunk.
+            if end == len(self._buffer) and self._read():
+                continue
+            self._pos = end
+            return value
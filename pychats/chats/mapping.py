@@ -0,0 +1,94 @@
+"""This module contains the tools for reading files through memory maps, so
+that large files are paged in by the operating system as they are needed
+rather than being read into memory all at once."""
+
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+
+@contextmanager
+def map_file(path):
+    """Opens the file at the path specified and memory-maps it read-only for
+    the duration of the ``with`` block. The mapped file can be sliced,
+    searched with bytes regular expressions, and read from like a binary file
+    handle. An empty file gives an empty ``bytes`` object that can be read
+    from in the same way, as empty files cannot be mapped.
+
+    :param str path: The location of the file."""
+
+    mapped = open_map(path)
+    try:
+        yield mapped
+    finally:
+        if isinstance(mapped, mmap.mmap): mapped.close()
+
+
+def open_map(path):
+    """Opens the file at the path specified and memory-maps it read-only, as
+    :py:func:`.map_file` does. The map stays open until it is closed or
+    garbage collected, so this is for objects that read from a file lazily.
+
+    :param str path: The location of the file.
+    :rtype: ``mmap``"""
+
+    with open(path, "rb") as f:
+        try:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return _EmptyFile()
+
+
+@contextmanager
+def replace_file(path, mode="w"):
+    """Opens a new temporary file in the same directory as the path given for
+    the duration of the ``with`` block, and then moves it over the path. The
+    file at the path is replaced rather than overwritten, so anything still
+    reading it through a memory map - such as a chatlog that was loaded from
+    it lazily - keeps seeing the old contents. If the block raises an
+    exception, the temporary file is removed and the path is left alone.
+
+    :param str path: The location of the file.
+    :param str mode: The mode to open the temporary file in."""
+
+    directory = os.path.dirname(os.path.abspath(path))
+    handle, temp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with open(handle, mode) as f:
+            yield f
+        _copy_mode(path, temp)
+        os.replace(temp, path)
+    except BaseException:
+        if os.path.exists(temp): os.remove(temp)
+        raise
+
+
+def _copy_mode(path, temp):
+    # Gives the new file the permissions of the file it replaces, or the ones
+    # a newly created file would have had.
+    try:
+        mode = os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
+    os.chmod(temp, mode)
+
+
+def decode_text(data):
+    """Decodes a slice of a mapped file as UTF-8, translating newlines in the
+    same way that opening the file in text mode would.
+
+    :param bytes data: The bytes to decode.
+    :rtype: ``str``"""
+
+    text = str(data, "utf-8")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+class _EmptyFile(bytes):
+
+    def read(self, size=-1):
+        return b""
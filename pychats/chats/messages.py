@@ -1,6 +1,7 @@
 """This module contains the basic Message class."""
 
 from .people import Contact
+from .timestamps import parse_timestamp, format_timestamp
 from datetime import datetime
 
 class Message:
@@ -10,6 +11,8 @@ class Message:
     :param datetime timestamp: The time the message was sent.
     :param Contact sender: The :py:class:`.Contact` who sent the message."""
 
+    __slots__ = ("_text", "_timestamp", "_sender", "_conversation", "__weakref__")
+
     def __init__(self, text, timestamp, sender):
         if not isinstance(text, str):
             raise TypeError("text must be str, not '%s'" % text)
@@ -24,43 +27,34 @@ class Message:
 
 
     @staticmethod
-    def from_json(json):
+    def from_json(json, contacts=None):
         """An alternate constructor. It creates a py:class:`.Message` from a
         JSON ``dict``.
 
-        You must also supply an iterable of zero or more py:class:`.Contact`
-        objects - if the name of sender in the JSON matches one of these people,
-        that object will be set as the sender, and if not a new
-        py:class:`.Contact` will be created. Otherwise a new py:class:`.Contact`
-        would be created for each message.
+        You can also supply a py:class:`.ContactRegistry` - if the name of the
+        sender in the JSON matches one of the contacts in it, that object will
+        be set as the sender, and if not a new py:class:`.Contact` will be
+        created and added to it. If no registry is given, the registry of all
+        contacts is used.
 
         :param dict json: The ``dict`` to convert.
-        :param contacts: An iterable of py:class:`.Contact` objects.
+        :param ContactRegistry contacts: The contacts to look senders up in.
         :raises TypeError: if something other than a ``dict`` is given.
         :raises ValueError: if the ``dict`` doesn't have a ``text`` key.
         :raises ValueError: if the ``dict`` doesn't have a ``timestamp`` key.
         :raises ValueError: if the ``dict`` doesn't have a ``sender`` key.
-        :raises TypeError: if no py:class:`.Contact` objects are given.
         :rtype: ``Message``"""
 
-        if not isinstance(json, dict):
-            raise TypeError("'%s' is not a dict" % str(json))
-        if "text" not in json:
-            raise ValueError("Message json needs 'text' key: %s" % str(json))
-        if "timestamp" not in json:
-            raise ValueError("Message json needs 'timestamp' key: %s" % str(json))
-        if "sender" not in json:
-            raise ValueError("Message json needs 'sender' key: %s" % str(json))
-        sender = None
-        for person in Contact.all_contacts:
-            if person.name() == json["sender"]["name"]:
-                sender = person
-                break
-        else:
+        _check_json(json)
+        if contacts is None:
+            contacts = Contact.all_contacts
+        sender = contacts.find(json["sender"]["name"])
+        if sender is None:
             sender = Contact.from_json(json["sender"])
+            contacts.add(sender)
         return Message(
          json["text"],
-         datetime.strptime(json["timestamp"], "%Y-%m-%d %H:%M:%S"),
+         parse_timestamp(json["timestamp"]),
          sender
         )
 
@@ -82,6 +76,8 @@ class Message:
             if not isinstance(text, str):
                 raise TypeError("text must be str, not '%s'" % str(text))
             self._text = text
+            if self._conversation:
+                self._conversation._change_text(self)
         else:
             return self._text
 
@@ -98,12 +94,9 @@ class Message:
                 raise TypeError(
                  "timestamp must be datetime, not '%s'" % str(datetime)
                 )
-            from .conversations import _sort_messages
-            self._timestamp = timestamp
+            old_timestamp, self._timestamp = self._timestamp, timestamp
             if self._conversation:
-                self._conversation._messages = _sort_messages(
-                 self._conversation._messages
-                )
+                self._conversation._move_message(self, old_timestamp)
         else:
             return self._timestamp
 
@@ -119,7 +112,9 @@ class Message:
                 raise TypeError(
                  "sender must be Contact, not '%s'" % str(sender)
                 )
-            self._sender = sender
+            old_sender, self._sender = self._sender, sender
+            if self._conversation:
+                self._conversation._change_sender(self, old_sender)
         else:
             return self._sender
 
@@ -141,9 +136,9 @@ class Message:
 
         :returns: ``set`` of ``Contact``"""
 
-        if self.conversation():
-            people = set(self.conversation().participants())
-            people.remove(self.sender())
+        if self._conversation:
+            people = self._conversation.participants(copy=True)
+            people.discard(self._sender)
             return people
         else:
             return set()
@@ -156,6 +151,18 @@ class Message:
 
         return {
          "text": self._text,
-         "timestamp": self._timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+         "timestamp": format_timestamp(self._timestamp),
          "sender": self._sender.to_json()
         }
+
+
+
+def _check_json(json):
+    if not isinstance(json, dict):
+        raise TypeError("'%s' is not a dict" % str(json))
+    if "text" not in json:
+        raise ValueError("Message json needs 'text' key: %s" % str(json))
+    if "timestamp" not in json:
+        raise ValueError("Message json needs 'timestamp' key: %s" % str(json))
+    if "sender" not in json:
+        raise ValueError("Message json needs 'sender' key: %s" % str(json))
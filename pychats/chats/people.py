@@ -2,18 +2,191 @@
 
 import weakref
 
+# Contacts store their tags as frozensets, and contacts with the same tags
+# share the same frozenset. The table is cleared when it gets large, as
+# contacts keep the frozensets they already have.
+_NO_TAGS = frozenset()
+_TAG_SETS = {_NO_TAGS: _NO_TAGS}
+
+def _intern_tags(tags):
+    interned = _TAG_SETS.get(tags)
+    if interned is None:
+        if len(_TAG_SETS) >= 10000:
+            _TAG_SETS.clear()
+            _TAG_SETS[_NO_TAGS] = _NO_TAGS
+        _TAG_SETS[tags] = interned = tags
+    return interned
+
+
+
+class ContactRegistry:
+    """A collection of :py:class:`.Contact` objects, indexed by name so that a
+    contact can be looked up without scanning every contact that exists.
+
+    Every contact belongs to at most one registry, and the registry's index
+    is kept up to date when a contact is renamed. The registry only holds weak
+    references to its contacts, so a contact that is no longer used anywhere
+    else is dropped from it automatically."""
+
+    def __init__(self):
+        self._refs = {}
+        self._names = {}
+
+
+    def __repr__(self):
+        return "<ContactRegistry (%i Contact%s)>" % (
+         len(self), "" if len(self) == 1 else "s"
+        )
+
+
+    def __len__(self):
+        return len(self._refs)
+
+
+    def __iter__(self):
+        for ref, name in list(self._refs.values()):
+            contact = ref()
+            if contact is not None:
+                yield contact
+
+
+    def __contains__(self, contact):
+        entry = self._refs.get(id(contact))
+        return entry is not None and entry[0]() is contact
+
+
+    def add(self, contact):
+        """Adds a :py:class:`.Contact` to the registry. If it currently
+        belongs to another registry it will be removed from that one first.
+
+        :param Contact contact: The contact to add."""
+
+        old_registry = contact._registry
+        if old_registry is self: return
+        if old_registry is not None:
+            old_registry.discard(contact)
+        key = id(contact)
+        ref = weakref.ref(contact, lambda ref: self._forget(key, ref))
+        self._refs[key] = (ref, contact.name())
+        self._names.setdefault(contact.name(), set()).add(key)
+        contact._registry = self
+
+
+    def discard(self, contact):
+        """Removes a :py:class:`.Contact` from the registry if it is there.
+
+        :param Contact contact: The contact to remove."""
+
+        if contact in self:
+            self._forget(id(contact), self._refs[id(contact)][0])
+        if contact._registry is self:
+            contact._registry = None
+
+
+    def find(self, name, tags=None):
+        """Returns a :py:class:`.Contact` with the given name, or ``None`` if
+        there isn't one. If tags are given, the contact must also have exactly
+        those tags.
+
+        :param str name: The name to look up.
+        :param tags: If given, an iterable of tags the contact must have.
+        :rtype: ``Contact``"""
+
+        keys = self._names.get(name)
+        if keys:
+            if tags is not None: tags = set(tags)
+            for key in keys:
+                contact = self._refs[key][0]()
+                if contact is not None and (
+                 tags is None or contact.tags() == tags):
+                    return contact
+
+
+    def _rename(self, contact, old_name):
+        key = id(contact)
+        self._unindex(key, old_name)
+        self._refs[key] = (self._refs[key][0], contact.name())
+        self._names.setdefault(contact.name(), set()).add(key)
+
+
+    def _forget(self, key, ref):
+        entry = self._refs.get(key)
+        if entry is not None and entry[0] is ref:
+            del self._refs[key]
+            self._unindex(key, entry[1])
+
+
+    def _unindex(self, key, name):
+        keys = self._names.get(name)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._names[name]
+
+
+
+class ContactScope:
+    """A context manager which bounds contact identity to a block of code.
+    While it is active, new :py:class:`.Contact` objects are added to the
+    scope's own :py:class:`.ContactRegistry` rather than the global one, and
+    senders are looked up in it when messages are created from JSON.
+
+        >>> with pychats.ContactScope() as contacts:
+        ...     harry = pychats.Contact("Harry Potter")
+        >>> contacts.find("Harry Potter")
+        <Contact: Harry Potter>
+
+    Chatlogs loaded while a scope is active, such as with
+    :py:func:`.from_json` or :py:func:`.from_facebook`, also keep their
+    senders in the scope's registry, and use any contact in it with the same
+    name rather than creating a new one. Outside of a scope, each chatlog
+    loaded gets a registry of its own.
+
+    The registry is returned by the ``with`` statement, and is also available
+    as the ``contacts`` attribute."""
+
+    # The registries of the scopes that are active, innermost last.
+    _active = []
+
+    def __init__(self):
+        self.contacts = ContactRegistry()
+        self._previous = []
+
+
+    def __repr__(self):
+        return "<ContactScope (%i Contact%s)>" % (
+         len(self.contacts), "" if len(self.contacts) == 1 else "s"
+        )
+
+
+    def __enter__(self):
+        self._previous.append(Contact.all_contacts)
+        Contact.all_contacts = self.contacts
+        ContactScope._active.append(self.contacts)
+        return self.contacts
+
+
+    def __exit__(self, *args):
+        Contact.all_contacts = self._previous.pop()
+        ContactScope._active.pop()
+
+
+
 class Contact:
     """A person who has sent at least one message.
 
     :param str name: The person's name."""
 
-    all_contacts = set()
+    __slots__ = ("_name", "_tags", "_registry", "__weakref__")
+
+    all_contacts = ContactRegistry()
 
     def __init__(self, name):
         if not isinstance(name, str):
             raise TypeError("name must be str, not '%s'" % name)
         self._name = name
-        self._tags = set()
+        self._tags = _NO_TAGS
+        self._registry = None
         Contact.all_contacts.add(self)
 
 
@@ -44,6 +217,18 @@ class Contact:
         return "<Contact: %s>" % self._name
 
 
+    def __getstate__(self):
+        # The registry only holds weak references, which cannot be pickled.
+        return (self._name, self._tags)
+
+
+    def __setstate__(self, state):
+        # An unpickled contact joins the current registry, as a new one would.
+        self._name, self._tags = state[0], _intern_tags(frozenset(state[1]))
+        self._registry = None
+        Contact.all_contacts.add(self)
+
+
     def name(self, name=None):
         """Returns the contact's name. If a string is provided, the name will be
         updated to that.
@@ -53,18 +238,26 @@ class Contact:
         if name:
             if not isinstance(name, str):
                 raise TypeError("name must be str, not '%s'" % name)
-            self._name = name
+            old_name, self._name = self._name, name
+            if self._registry is not None:
+                self._registry._rename(self, old_name)
         else:
             return self._name
 
 
-    def tags(self):
+    def tags(self, copy=False):
         """Returns any tags associated with the contact. These can be used to
         categorise different contacts, such as by gender or group of friends.
 
-        :rtype: ``set``"""
+        By default this is the contact's own ``frozenset`` of tags, which is
+        shared with other contacts that have the same tags and so cannot be
+        changed. It is replaced rather than changed when tags are added or
+        removed.
+
+        :param bool copy: If ``True``, a new ``set`` is returned.
+        :rtype: ``frozenset``"""
 
-        return set(self._tags)
+        return set(self._tags) if copy else self._tags
 
 
     def add_tag(self, tag):
@@ -75,15 +268,18 @@ class Contact:
 
         if not isinstance(tag, str):
             raise TypeError("tag must be str, not '%s'" % tag)
-        self._tags.add(tag)
+        self._tags = _intern_tags(frozenset(self._tags | {tag}))
 
 
     def remove_tag(self, tag):
         """Removes a tag from the Contact.
 
-        :param str tag: The tag to remove."""
+        :param str tag: The tag to remove.
+        :raises KeyError: if the contact doesn't have the tag."""
 
-        self._tags.remove(tag)
+        if tag not in self._tags:
+            raise KeyError(tag)
+        self._tags = _intern_tags(frozenset(self._tags - {tag}))
 
 
     def to_json(self):
@@ -95,3 +291,11 @@ class Contact:
          "name": self.name(),
          "tags": sorted(list(self._tags))
         }
+
+
+
+def _load_registry():
+    # Returns the registry a chatlog being loaded should keep its senders in -
+    # the active scope's if there is one, or a new registry if not.
+    if ContactScope._active: return ContactScope._active[-1]
+    return ContactRegistry()
@@ -0,0 +1,222 @@
+"""This module contains the functions for writing and reading pychats binary
+snapshot files, which store a chatlog in a compact form that can be loaded
+again without decoding any JSON or creating any objects up front.
+
+A snapshot starts with the magic bytes ``PYCHATSB`` and a version number and
+conversation count. Then comes the chatlog's name and a table of every
+contact, with their tags. Each conversation follows: a header with its message
+and contact counts, the positions in the contact table of the contacts it
+uses, and then its columns - ``int64`` microsecond timestamps, ``uint64``
+character offsets into its text, ``uint32`` sender indexes, and the text of
+every message as one length-prefixed UTF-8 blob. All integers are
+little-endian, and the columns start on eight-byte boundaries so that they can
+be read straight out of a memory-mapped file."""
+
+import struct
+import sys
+from array import array
+from .people import Contact, _load_registry
+from .columns import MessageColumns
+
+MAGIC = b"PYCHATSB"
+VERSION = 1
+_HEADER = struct.Struct("<8sII")
+_CONVERSATION = struct.Struct("<QQII")
+_LENGTH = struct.Struct("<I")
+_SWAP = sys.byteorder == "big"
+
+def write_snapshot(name, conversations, f):
+    """Writes a snapshot to a binary file handle.
+
+    :param str name: The name of the chatlog.
+    :param list conversations: A :py:class:`.MessageColumns` store for each\
+    conversation in the chatlog.
+    :param f: The binary file handle to write to."""
+
+    contacts, indexes = [], {}
+    for columns in conversations:
+        for contact in columns.contacts:
+            if contact not in indexes:
+                indexes[contact] = len(contacts)
+                contacts.append(contact)
+    writer = _Writer(f)
+    writer.write(_HEADER.pack(MAGIC, VERSION, len(conversations)))
+    writer.write_string(name)
+    writer.write(_LENGTH.pack(len(contacts)))
+    for contact in contacts:
+        writer.write_string(contact.name())
+        tags = sorted(contact.tags())
+        writer.write(_LENGTH.pack(len(tags)))
+        for tag in tags: writer.write_string(tag)
+    writer.pad()
+    for columns in conversations:
+        text = columns._join_text().encode("utf-8", "surrogatepass")
+        writer.write(_CONVERSATION.pack(
+         len(columns), len(text), len(columns.contacts), 0
+        ))
+        writer.write_array(array("I", [indexes[c] for c in columns.contacts]))
+        writer.pad()
+        writer.write_array(columns.timestamps)
+        writer.write_array(columns.offsets)
+        writer.write_array(columns.senders)
+        writer.pad()
+        writer.write(text)
+        writer.pad()
+
+
+def read_snapshot(data):
+    """Reads the name and contacts of a snapshot, and finds where each of its
+    conversations is without reading them.
+
+    :param data: The bytes of the snapshot, such as a memory-mapped file.
+    :raises ValueError: if the data isn't a pychats snapshot, or is from an\
+    unsupported version, or is truncated.
+    :returns: The name, a ``list`` of ``Contact`` objects, and a ``list`` of\
+    conversation locations to pass to :py:func:`.read_columns`."""
+
+    try:
+        magic, version, count = _HEADER.unpack_from(data, 0)
+    except struct.error:
+        magic, version, count = None, None, 0
+    if magic != MAGIC:
+        raise ValueError("Not a pychats binary snapshot")
+    if version != VERSION:
+        raise ValueError("Unsupported snapshot version %i" % version)
+    reader = _Reader(data, _HEADER.size)
+    name = reader.read_string()
+    senders = []
+    for _ in range(reader.read_length()):
+        sender = reader.read_string()
+        senders.append((sender, [
+         reader.read_string() for _ in range(reader.read_length())
+        ]))
+    # Senders are only matched with contacts that were there before loading,
+    # which there only are if a ContactScope is active.
+    registry = _load_registry()
+    contacts = [registry.find(sender) for sender, _ in senders]
+    for index, (sender, tags) in enumerate(senders):
+        if contacts[index] is None:
+            contacts[index] = contact = Contact(sender)
+            for tag in tags: contact.add_tag(tag)
+            registry.add(contact)
+    reader.pad()
+    locations = []
+    for _ in range(count):
+        size, text_size, contact_count, _ = reader.read(_CONVERSATION)
+        contact_start = reader.skip(4 * contact_count)
+        reader.pad()
+        columns_start = reader.skip(20 * size + 8)
+        reader.pad()
+        text_start = reader.skip(text_size)
+        reader.pad()
+        locations.append(
+         (size, contact_start, contact_count, columns_start, text_start, text_size)
+        )
+    return name, contacts, locations
+
+
+def read_columns(data, location, contacts):
+    """Reads one conversation of a snapshot into a
+    :py:class:`.MessageColumns` store. The columns are copied straight out of
+    the data, and the text is decoded in one go.
+
+    :param data: The bytes of the snapshot.
+    :param location: The conversation's location, from\
+    :py:func:`.read_snapshot`.
+    :param list contacts: The snapshot's contacts.
+    :rtype: ``MessageColumns``"""
+
+    size, contact_start, contact_count, start, text_start, text_size = location
+    columns = MessageColumns()
+    with memoryview(data) as view:
+        contact_indexes = _read_array("I", view, contact_start, contact_count)
+        columns.timestamps = _read_array("q", view, start, size)
+        start += 8 * size
+        columns.offsets = _read_array("Q", view, start, size + 1)
+        start += 8 * (size + 1)
+        columns.senders = _read_array("I", view, start, size)
+        columns._text = str(
+         view[text_start:text_start + text_size], "utf-8", "surrogatepass"
+        )
+    columns.contacts = [contacts[index] for index in contact_indexes]
+    columns._contact_indexes = {
+     contact: index for index, contact in enumerate(columns.contacts)
+    }
+    return columns
+
+
+def _read_array(typecode, view, start, count):
+    values = array(typecode)
+    values.frombytes(view[start:start + values.itemsize * count])
+    if _SWAP: values.byteswap()
+    return values
+
+
+
+class _Writer:
+
+    def __init__(self, f):
+        self._file = f
+        self._position = 0
+
+
+    def write(self, data):
+        self._file.write(data)
+        self._position += len(data)
+
+
+    def write_string(self, string):
+        data = string.encode("utf-8", "surrogatepass")
+        self.write(_LENGTH.pack(len(data)))
+        self.write(data)
+
+
+    def write_array(self, values):
+        if _SWAP:
+            values = array(values.typecode, values)
+            values.byteswap()
+        with memoryview(values) as view:
+            self.write(view.cast("B"))
+
+
+    def pad(self):
+        if self._position % 8:
+            self.write(bytes(8 - self._position % 8))
+
+
+
+class _Reader:
+
+    def __init__(self, data, position):
+        self._data = data
+        self._position = position
+
+
+    def read(self, layout):
+        try:
+            values = layout.unpack_from(self._data, self._position)
+        except struct.error:
+            raise ValueError("Snapshot is truncated")
+        self._position += layout.size
+        return values
+
+
+    def read_length(self):
+        return self.read(_LENGTH)[0]
+
+
+    def read_string(self):
+        start = self.skip(self.read_length())
+        return str(self._data[start:self._position], "utf-8", "surrogatepass")
+
+
+    def skip(self, size):
+        start = self._position
+        self._position += size
+        if self._position > len(self._data):
+            raise ValueError("Snapshot is truncated")
+        return start
+
+
+    def pad(self):
+        self._position += -self._position % 8
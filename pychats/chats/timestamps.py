@@ -0,0 +1,62 @@
+"""This module contains the functions for converting timestamps to and from the
+fixed ``YYYY-MM-DD HH:MM:SS`` format that pychats uses in JSON, and to and from
+integer epoch times."""
+
+from datetime import datetime, timedelta
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+def parse_timestamp(text):
+    """Turns a timestamp string in the pychats format into a ``datetime``.
+
+    This gives the same result as ``datetime.strptime`` with
+    :py:data:`TIMESTAMP_FORMAT`, and raises the same errors, but strings that
+    are already in the exact fixed-width format are parsed directly.
+
+    :param str text: The timestamp string.
+    :raises ValueError: if the string doesn't match the format.
+    :rtype: ``datetime``"""
+
+    if type(text) is str and len(text) == 19 and text[10] == " "\
+     and text[4] == "-" and text[7] == "-" and text[13] == ":" and text[16] == ":":
+        try:
+            return datetime.fromisoformat(text)
+        except ValueError: pass
+    return datetime.strptime(text, TIMESTAMP_FORMAT)
+
+
+def format_timestamp(timestamp):
+    """Turns a ``datetime`` into a timestamp string in the pychats format.
+
+    This gives the same result as ``datetime.strftime`` with
+    :py:data:`TIMESTAMP_FORMAT`.
+
+    :param datetime timestamp: The timestamp to format.
+    :rtype: ``str``"""
+
+    if timestamp.microsecond or timestamp.tzinfo is not None\
+     or timestamp.year < 1000:
+        return timestamp.strftime(TIMESTAMP_FORMAT)
+    return timestamp.isoformat(" ")
+
+
+def timestamp_to_epoch(timestamp):
+    """Turns a naive ``datetime`` into a number of microseconds since
+    1970-01-01 00:00:00, for storing in integer arrays.
+
+    :param datetime timestamp: The timestamp to convert.
+    :rtype: ``int``"""
+
+    return (timestamp - EPOCH) // MICROSECOND
+
+
+def epoch_to_timestamp(microseconds):
+    """Turns a number of microseconds since 1970-01-01 00:00:00 back into a
+    naive ``datetime``.
+
+    :param int microseconds: The number of microseconds.
+    :rtype: ``datetime``"""
+
+    return EPOCH + timedelta(microseconds=microseconds)
@@ -0,0 +1,158 @@
+"""This module contains read-only views of the collections that pychats objects
+keep their contents in. Accessors return these rather than copies, so that
+reading a conversation's messages or a chatlog's conversations costs nothing
+however large they are."""
+
+from collections.abc import Sequence, Set
+
+class SequenceView(Sequence):
+    """A read-only view of a list. Changes to the list show through the view,
+    but the view cannot be used to change it.
+
+    Slicing a view gives another view of the same list rather than a copy. A
+    sliced view refers to fixed positions in the list, so it should not be
+    used after the list has changed.
+
+    If the view is given an owner, it checks a count of changes that the
+    owner keeps on one of its attributes. Like a ``dict``, iterating over the
+    view raises ``RuntimeError`` if the owner changes part way through, and a
+    sliced view raises it if the owner has changed since the slice was made.
+
+    :param list items: The list to view.
+    :param range indexes: If given, the view only covers these positions.
+    :param owner: If given, the object that changes the list.
+    :param str counter: The attribute of the owner that counts its changes."""
+
+    __slots__ = ("_items", "_indexes", "_owner", "_counter", "_changes")
+
+    def __init__(self, items, indexes=None, owner=None, counter="_changes"):
+        self._items = items
+        self._indexes = indexes
+        self._owner = owner
+        self._counter = counter
+        self._changes = None if owner is None else getattr(owner, counter)
+
+
+    def __repr__(self):
+        return "<SequenceView %s>" % str(self.copy())
+
+
+    def __len__(self):
+        if self._indexes is None: return len(self._items)
+        self._check()
+        return len(self._indexes)
+
+
+    def __getitem__(self, index):
+        if self._indexes is None:
+            if not isinstance(index, slice): return self._items[index]
+            return SequenceView(
+             self._items, range(len(self._items))[index],
+             self._owner, self._counter
+            )
+        self._check()
+        if isinstance(index, slice):
+            return SequenceView(
+             self._items, self._indexes[index], self._owner, self._counter
+            )
+        return self._items[self._indexes[index]]
+
+
+    def __iter__(self):
+        if self._owner is None:
+            if self._indexes is None: return iter(self._items)
+            return map(self._items.__getitem__, self._indexes)
+        self._check()
+        return self._iterate()
+
+
+    def __contains__(self, item):
+        if self._indexes is None: return item in self._items
+        return Sequence.__contains__(self, item)
+
+
+    def __eq__(self, other):
+        if isinstance(other, SequenceView): other = other.copy()
+        if not isinstance(other, list): return NotImplemented
+        return self.copy() == other
+
+
+    def copy(self):
+        """Returns the items in the view as a new ``list``.
+
+        :rtype: ``list``"""
+
+        if self._indexes is None: return list(self._items)
+        self._check()
+        return list(map(self._items.__getitem__, self._indexes))
+
+
+    def _iterate(self):
+        owner, counter, items = self._owner, self._counter, self._items
+        changes = getattr(owner, counter)
+        indexes = range(len(items)) if self._indexes is None else self._indexes
+        for index in indexes:
+            if getattr(owner, counter) != changes:
+                raise RuntimeError(
+                 "%s changed during iteration" % type(owner).__name__.lower()
+                )
+            yield items[index]
+
+
+    def _check(self):
+        # Positions of a sliced view are only valid until the owner changes.
+        if self._indexes is not None and self._owner is not None\
+         and getattr(self._owner, self._counter) != self._changes:
+            raise RuntimeError("%s changed after the view was made" % (
+             type(self._owner).__name__.lower()
+            ))
+
+
+
+class SetView(Set):
+    """A read-only view of a set, or of the keys of a ``dict``. Changes to the
+    set show through the view, but the view cannot be used to change it.
+    Operators such as ``&`` and ``|`` work as they do on sets, and give new
+    ``set`` objects.
+
+    :param items: The set to view."""
+
+    __slots__ = ("_items",)
+
+    def __init__(self, items):
+        self._items = items
+
+
+    def __repr__(self):
+        return "<SetView %s>" % str(self.copy())
+
+
+    def __len__(self):
+        return len(self._items)
+
+
+    def __iter__(self):
+        return iter(self._items)
+
+
+    def __contains__(self, item):
+        return item in self._items
+
+
+    def __eq__(self, other):
+        if isinstance(other, SetView): other = other._items
+        if not isinstance(other, Set): return NotImplemented
+        return self._items == other
+
+
+    @classmethod
+    def _from_iterable(cls, iterable):
+        return set(iterable)
+
+
+    def copy(self):
+        """Returns the items in the view as a new ``set``.
+
+        :rtype: ``set``"""
+
+        return set(self._items)
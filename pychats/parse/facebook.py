@@ -1,10 +1,30 @@
 """This module provides the functions for parsing Facebook backup
 messages.htm files."""
 
+import calendar
+import re
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
 from bs4 import BeautifulSoup
 from bs4.element import Tag
 from datetime import datetime
-from ..chats.chatlogs import ChatLog
+from ..chats.chatlogs import ChatLogBuilder
+from ..chats.timestamps import format_timestamp
+from ..chats.mapping import map_file, decode_text
+
+# Matches the start of a div with "thread" among its classes, however the class
+# attribute is quoted.
+THREAD_START = re.compile(
+ r'<(?i:div)\b[^>]*?\s(?i:class)\s*=\s*(?:"(?:[^"]*\s)?thread(?=[\s"])'
+ r"|'(?:[^']*\s)?thread(?=[\s'])|thread(?=[\s/>]))"
+)
+THREAD_START_BYTES = re.compile(THREAD_START.pattern.encode())
+META_FORMAT = "%A, %d %B %Y at %H:%M"
+WEEKDAYS = set(name.lower() for name in calendar.day_name)
+MONTHS = {
+ calendar.month_name[month].lower(): month for month in range(1, 13)
+}
+_DATES = {}
 
 def html_to_threads(html):
     """Takes the html string of a file and gets the thread divs from it as
@@ -21,6 +41,26 @@ def html_to_threads(html):
     return threads
 
 
+def iter_threads(html):
+    """Takes the html string of a file and yields its thread divs one at a time
+    as ``BeautifulSoup`` Tag objects. Each thread is removed from the document
+    and destroyed when the next one is requested, so that only one thread's
+    tree is held at a time once the document has been parsed.
+
+    :param str html: The HTML string.
+    :raises TypeError: if non-string HTML is given."""
+
+    if not isinstance(html, str):
+        raise TypeError("HTML must be provided as a string")
+    soup = BeautifulSoup(html, "html.parser")
+    thread = soup.find("div", {"class" : "thread"})
+    while thread is not None:
+        next_thread = thread.find_next("div", {"class" : "thread"})
+        yield thread
+        thread.decompose()
+        thread = next_thread
+
+
 def thread_to_json(thread):
     """Takes a Thread div and turns it into the JSON of a
     pychats :py:class:`.Conversation` object.
@@ -28,6 +68,10 @@ def thread_to_json(thread):
     :param Tag thread: The ``BeautifulSoup`` Tag of a Facebook thread.
     :rtype: ``list``"""
 
+    return _thread_json(_read_thread(thread))
+
+
+def _read_thread(thread):
     if not isinstance(thread, Tag):
         raise TypeError("Need a BeautifulSoup tag, not {}".format(thread))
     messages = thread.find_all("div", {"class" : "message"})
@@ -37,14 +81,293 @@ def thread_to_json(thread):
     for message, paragraph in messages:
         name = message.find_all("span", {"class" : "user"})[0].text.strip()
         meta = message.find_all("span", {"class" : "meta"})[0].text.strip()
-        date_text = " ".join(meta.split(" ")[:-1])
-        date = datetime.strptime(date_text, "%A, %d %B %Y at %H:%M")
-        json.append({
-         "text": paragraph.text,
-         "sender": {"tags": [], "name": name},
-         "timestamp": date.strftime("%Y-%m-%d %H:%M:%S")
-        })
-    return {"messages": json, "members": list(thread.children)[0].strip().split(", ")}
+        json.append(_read_message(name, meta, paragraph.text))
+    members = list(thread.children)[0].strip().split(", ")
+    return {"messages": json, "members": members}
+
+
+class ThreadParser(HTMLParser):
+    """An event-driven parser for Facebook messages.htm files. Rather than
+    building a tree of the document, it picks out the members, users, meta
+    lines and paragraphs of each thread as the HTML is fed to it.
+
+    HTML can be fed to it in pieces with ``feed``, and the threads completed
+    so far collected with :py:meth:`pop_threads`. Each thread is a ``dict``
+    with a ``members`` list and a ``messages`` list of ``(name, timestamp,
+    text)`` tuples, where the timestamp is already a ``datetime`` - see
+    :py:func:`.iter_thread_json` for the equivalent JSON."""
+
+    VOID_TAGS = set([
+     "area", "base", "br", "col", "embed", "hr", "img", "input", "link",
+     "meta", "param", "source", "track", "wbr"
+    ])
+
+    def __init__(self):
+        HTMLParser.__init__(self, convert_charrefs=True)
+        self._threads = []
+        self._stack = []
+        self._thread = None
+        self._message = None
+        self._capture = None
+
+
+    def pop_threads(self):
+        """Returns the threads completed since this was last called.
+
+        :rtype: ``list``"""
+
+        threads, self._threads = self._threads, []
+        return threads
+
+
+    def handle_starttag(self, tag, attrs):
+        self._end_members()
+        if tag in self.VOID_TAGS: return
+        self._stack.append(tag)
+        if tag not in ("div", "span", "p"): return
+        classes = []
+        for name, value in attrs:
+            if name == "class" and value: classes = value.split()
+        if self._thread is None:
+            if tag == "div" and "thread" in classes:
+                self._thread = {
+                 "depth": len(self._stack), "members": [],
+                 "reading_members": True, "messages": [], "paragraphs": []
+                }
+        elif tag == "div" and "message" in classes and self._message is None:
+            self._message = {"depth": len(self._stack), "user": None, "meta": None}
+            self._thread["messages"].append(self._message)
+        elif tag == "span" and self._message is not None\
+         and self._capture is None:
+            for key in ("user", "meta"):
+                if key in classes and self._message[key] is None:
+                    self._message[key] = []
+                    self._capture = (len(self._stack), self._message[key])
+                    break
+        elif tag == "p":
+            self._thread["paragraphs"].append([])
+            if self._capture is None:
+                self._capture = (
+                 len(self._stack), self._thread["paragraphs"][-1]
+                )
+
+
+    def handle_startendtag(self, tag, attrs):
+        self._end_members()
+
+
+    def handle_endtag(self, tag):
+        self._end_members()
+        if tag not in self._stack: return
+        while self._stack:
+            depth = len(self._stack)
+            if self._capture is not None and self._capture[0] == depth:
+                self._capture = None
+            if self._message is not None and self._message["depth"] == depth:
+                self._message = None
+            if self._thread is not None and self._thread["depth"] == depth:
+                self._end_thread()
+            if self._stack.pop() == tag: break
+
+
+    def handle_data(self, data):
+        if self._thread is not None:
+            if self._thread["reading_members"]:
+                self._thread["members"].append(data)
+            if self._capture is not None:
+                self._capture[1].append(data)
+
+
+    def handle_comment(self, data):
+        self._end_members()
+
+
+    def _end_members(self):
+        if self._thread is not None:
+            self._thread["reading_members"] = False
+
+
+    def _end_thread(self):
+        json = []
+        for message, paragraph in zip(
+         self._thread["messages"], self._thread["paragraphs"]):
+            if message["user"] is None or message["meta"] is None:
+                raise ValueError("Facebook message is missing a user or meta")
+            json.append(_read_message(
+             "".join(message["user"]).strip(),
+             "".join(message["meta"]).strip(),
+             "".join(paragraph)
+            ))
+        members = "".join(self._thread["members"]).strip().split(", ")
+        self._threads.append({"messages": json, "members": members})
+        self._thread, self._message, self._capture = None, None, None
+
+
+def parse_meta(meta):
+    """Takes the meta line of a Facebook message, such as ``Friday, 19 August
+    2016 at 13:13 UTC+01``, and returns the time it gives as a ``datetime``.
+    The timezone at the end is ignored.
+
+    This gives the same result as ``datetime.strptime`` with
+    :py:data:`META_FORMAT`, and raises the same errors, but weekday and month
+    names are looked up in tables built once from the ``calendar`` module, and
+    the date part of each line is only parsed the first time it is seen.
+
+    :param str meta: The meta line.
+    :raises ValueError: if the line doesn't match the format.
+    :rtype: ``datetime``"""
+
+    date_text = meta[:max(meta.rfind(" "), 0)]
+    prefix, at, clock = date_text.rpartition(" at ")
+    date = _DATES.get(prefix)
+    if date is None and at:
+        date = _parse_date_prefix(prefix)
+    if date is not None and len(clock) == 5 and clock[2] == ":"\
+     and "00" <= clock[:2] < "24" and "00" <= clock[3:] < "60"\
+     and "0" <= clock[1] <= "9" and "0" <= clock[4] <= "9":
+        return datetime(
+         date[0], date[1], date[2], int(clock[:2]), int(clock[3:])
+        )
+    return datetime.strptime(date_text, META_FORMAT)
+
+
+def _parse_date_prefix(prefix):
+    # Returns None for anything that isn't in the usual form, so that strptime
+    # can deal with it and raise its usual errors.
+    weekday, comma, rest = prefix.partition(", ")
+    parts = rest.split(" ")
+    if not comma or weekday.lower() not in WEEKDAYS or len(parts) != 3:
+        return None
+    day, month, year = parts
+    month = MONTHS.get(month.lower())
+    if month is None or not (day.isdigit() and day.isascii() and len(day) < 3)\
+     or not (year.isdigit() and year.isascii() and len(year) == 4):
+        return None
+    try:
+        date = datetime(int(year), month, int(day))
+    except ValueError:
+        return None
+    if len(_DATES) >= 10000: _DATES.clear()
+    _DATES[prefix] = date = (date.year, date.month, date.day)
+    return date
+
+
+def _read_message(name, meta, text):
+    return (name, parse_meta(meta), text)
+
+
+def _thread_json(thread):
+    return {"messages": [{
+     "text": text,
+     "sender": {"tags": [], "name": name},
+     "timestamp": format_timestamp(timestamp)
+    } for name, timestamp, text in thread["messages"]], "members": thread["members"]}
+
+
+def iter_thread_json(html, backend="events"):
+    """Takes the html string of a file and yields the JSON of each of its
+    threads, as produced by :py:func:`.thread_to_json`, one at a time.
+
+    The ``"events"`` backend feeds the HTML to a :py:class:`.ThreadParser` a
+    piece at a time without building a document tree. The ``"soup"`` backend
+    uses ``BeautifulSoup`` and is kept as the reference implementation.
+
+    :param str html: The HTML string.
+    :param str backend: The parser backend to use - ``"events"`` or\
+    ``"soup"``.
+    :raises TypeError: if non-string HTML is given.
+    :raises ValueError: if an unknown backend is given."""
+
+    _check_input(html, backend)
+    return (_thread_json(thread) for thread in BACKENDS[backend](html))
+
+
+def _check_input(html, backend):
+    if backend not in BACKENDS:
+        raise ValueError("Unknown Facebook parser backend '%s'" % backend)
+    if not isinstance(html, str):
+        raise TypeError("HTML must be provided as a string")
+
+
+def _iter_soup_threads(html):
+    for thread in iter_threads(html):
+        yield _read_thread(thread)
+
+
+def _iter_event_threads(html, chunk_size=65536):
+    parser = ThreadParser()
+    for start in range(0, len(html), chunk_size):
+        parser.feed(html[start:start + chunk_size])
+        yield from parser.pop_threads()
+    parser.close()
+    yield from parser.pop_threads()
+
+
+BACKENDS = {"events": _iter_event_threads, "soup": _iter_soup_threads}
+
+
+def split_threads(html, parts=None):
+    """Finds where the threads in a Facebook messages.htm file begin, and
+    divides the document into at most ``parts`` ranges of whole threads,
+    without parsing it. Each range runs from the start of a thread to the
+    start of the first thread in the next range, or to the end of the
+    document, so the ranges can be parsed independently and in any order. If
+    ``parts`` is not given, every thread gets its own range.
+
+    The document can be a string, or the bytes of a file - including a
+    memory-mapped file - in which case the ranges are byte offsets.
+
+    :param html: The HTML string or bytes.
+    :param int parts: The maximum number of ranges to return.
+    :returns: ``list`` of ``(start, end)`` index pairs"""
+
+    pattern = THREAD_START if isinstance(html, str) else THREAD_START_BYTES
+    starts = [match.start() for match in pattern.finditer(html)]
+    if not starts: return []
+    if parts is not None:
+        parts = min(parts, len(starts))
+        starts = [starts[len(starts) * part // parts] for part in range(parts)]
+    return list(zip(starts, starts[1:] + [len(html)]))
+
+
+def _iter_mapped_threads(html, backend):
+    # Only the threads themselves are ever decoded, one at a time.
+    for start, end in split_threads(html):
+        yield from BACKENDS[backend](decode_text(html[start:end]))
+
+
+def _parse_threads(html, backend):
+    # Runs in a worker process - the threads are sent back as plain tuples,
+    # which are much cheaper to pickle than dicts.
+    return [
+     (tuple(thread["members"]), tuple(thread["messages"]))
+     for thread in BACKENDS[backend](html)
+    ]
+
+
+def _parse_file_threads(path, span, backend):
+    # Runs in a worker process, which maps the file itself so that only the
+    # offsets need to be sent to it.
+    with map_file(path) as html:
+        return _parse_threads(decode_text(html[span[0]:span[1]]), backend)
+
+
+def _iter_parallel_threads(html, backend, workers, path=None):
+    ranges = split_threads(html, workers * 4)
+    with ProcessPoolExecutor(workers) as executor:
+        if path is None:
+            results = executor.map(
+             _parse_threads, [html[start:end] for start, end in ranges],
+             [backend] * len(ranges)
+            )
+        else:
+            results = executor.map(
+             _parse_file_threads, [path] * len(ranges), ranges,
+             [backend] * len(ranges)
+            )
+        for threads in results:
+            for members, messages in threads:
+                yield {"messages": list(messages), "members": list(members)}
 
 
 def consolidate_threads(threads):
@@ -54,44 +377,96 @@ def consolidate_threads(threads):
 
     It will also reverse the messages order in each thread.
 
-    :param list threads: The threads to consolidate."""
+    The threads are grouped by their members in a single pass, and can be
+    given as any iterable. Each group's messages are joined once, at the end.
 
+    :param list threads: The threads to consolidate.
+    :rtype: ``list``"""
+
+    groups, consolidated = {}, []
     for thread in threads:
-        thread["members"] = sorted(thread["members"])
-    for thread in threads:
-        if thread["messages"] and len(thread["members"]) == 2:
-            matching_threads = [t for t in threads
-             if t["members"] == thread["members"] and thread is not t]
-            for matching_thread in matching_threads:
-                thread["messages"] += matching_thread["messages"]
-                matching_thread["messages"] = []
-    threads = [thread for thread in threads if thread["messages"]]
-    for thread in threads:
-        del thread["members"]
-        thread["messages"].reverse()
-    return threads
+        if not thread["messages"]: continue
+        if len(thread["members"]) == 2:
+            key = tuple(sorted(thread["members"]))
+            parts = groups.get(key)
+            if parts is not None:
+                parts.append(thread["messages"])
+                continue
+            parts = groups[key] = [thread["messages"]]
+        else:
+            parts = [thread["messages"]]
+        consolidated.append(parts)
+    return [{"messages": [
+     message for part in reversed(parts) for message in reversed(part)
+    ]} for parts in consolidated]
 
 
-def html_to_chatlog(html):
+def html_to_chatlog(html, backend="events", workers=1):
     """Produces a pychats :py:class:`.ChatLog` from the HTML of a Facebook
-    messages.htm filestring
+    messages.htm filestring.
+
+    Each thread's messages are read as they are parsed, and once the threads
+    have been consolidated they are passed to a :py:class:`.ChatLogBuilder`,
+    without creating any JSON.
+
+    If more than one worker is requested, the document is divided into ranges
+    of threads with :py:func:`.split_threads`, and the ranges are parsed in
+    that many worker processes. The threads are then consolidated in this
+    process, giving the same result as parsing in one process.
 
     :param str html: The HTML string.
+    :param str backend: The parser backend to use - ``"events"`` or\
+    ``"soup"``.
+    :param int workers: The number of processes to parse the threads in.
+    :raises TypeError: if the number of workers is not an integer.
+    :raises ValueError: if fewer than one worker is requested.
     :rtype: ``ChatLog``"""
 
-    threads = html_to_threads(html)
-    convs = [thread_to_json(thread) for thread in threads]
-    convs = consolidate_threads(convs)
-    return ChatLog.from_json({"name": "Facebook", "conversations": convs})
+    _check_workers(workers)
+    _check_input(html, backend)
+    if workers == 1:
+        threads = BACKENDS[backend](html)
+    else:
+        threads = _iter_parallel_threads(html, backend, workers)
+    return _threads_to_chatlog(threads)
 
 
-def from_facebook(path):
+def _check_workers(workers):
+    if not isinstance(workers, int):
+        raise TypeError("workers must be int, not '%s'" % str(workers))
+    if workers < 1:
+        raise ValueError("Need at least one worker, not %i" % workers)
+
+
+def _threads_to_chatlog(threads):
+    builder = ChatLogBuilder("Facebook")
+    for index, thread in enumerate(consolidate_threads(threads)):
+        for name, timestamp, text in thread["messages"]:
+            builder.add(index, name, timestamp, text)
+    return builder.build()
+
+
+def from_facebook(path, backend="events", workers=1):
     """Opens a HTML file at the path specified and produces a pychats
     :py:class:`.ChatLog` from it.
 
+    The file is memory-mapped rather than read, and its threads are found by
+    scanning the mapped bytes with :py:func:`.split_threads`. Only the
+    threads themselves are decoded, one at a time - or, if more than one
+    worker is requested, each worker process maps the file and decodes its
+    own ranges of threads.
+
     :param str path: The location of the HTML file.
+    :param str backend: The parser backend to use - ``"events"`` or\
+    ``"soup"``.
+    :param int workers: The number of processes to parse the threads in.
     :rtype: ``ChatLog``"""
 
-    with open(path) as f:
-        html = f.read()
-    return html_to_chatlog(html)
+    _check_workers(workers)
+    _check_input("", backend)
+    with map_file(path) as html:
+        if workers == 1:
+            threads = _iter_mapped_threads(html, backend)
+        else:
+            threads = _iter_parallel_threads(html, backend, workers, path)
+        return _threads_to_chatlog(threads)
@@ -0,0 +1,440 @@
+"""This module provides full-text search over the messages of a chatlog.
+
+A :py:class:`SearchIndex` breaks the text of every message into lowercase
+terms, and keeps an inverted index of which messages each term appears in, so
+that a query only has to look at the messages that contain its terms rather
+than at every message in the chatlog.
+
+    >>> index = SearchIndex(log)
+    >>> index.search('"see you" tomorrow break*')
+    [<Message from Bob Loblaw at 2017-08-21 09:00>]
+
+The index keeps itself up to date as messages and conversations are added to
+and removed from the chatlog, and as the text of messages is edited. It can be
+saved to a file and loaded again, which is much faster than indexing a large
+chatlog from scratch."""
+
+import hashlib
+import re
+import struct
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+from .chats.chatlogs import ChatLog
+from .chats.conversations import _find_message
+from .chats.mapping import map_file, replace_file
+from .chats.snapshots import _Writer, _read_array
+
+MAGIC = b"PYCHATSI"
+VERSION = 1
+_HEADER = struct.Struct("<8sIIII")
+_LENGTH = struct.Struct("<I")
+_DIGEST_SIZE = 16
+_TOKEN = re.compile(r"\w+")
+_QUERY = re.compile(r'"([^"]*)"?|(\S+)')
+_WIDTHS = {1: "B", 2: "H", 4: "I", 8: "Q"}
+
+def tokenize(text):
+    """Breaks text into the terms that are indexed - runs of letters, digits
+    and underscores, case-folded so that searches ignore case.
+
+    :param str text: The text to break up.
+    :returns: ``list`` of ``str``"""
+
+    return _TOKEN.findall(text.casefold())
+
+
+
+class SearchIndex:
+    """An inverted index of the terms in the messages of a
+    :py:class:`.ChatLog`.
+
+    Every indexed message is given a document number, and each term maps to
+    an array of the numbers of the messages it appears in, in ascending
+    order. Queries look up the array for each of their terms and intersect
+    them, galloping through the longer arrays rather than stepping through
+    them one number at a time. Removed messages are only marked as gone, and
+    the arrays are compacted once more than half of the messages they refer
+    to have been removed.
+
+    Creating an index of a :py:class:`.LazyChatLog` decodes and keeps all of
+    its conversations.
+
+    :param ChatLog chatlog: The chatlog to index.
+    :raises TypeError: if something other than a ``ChatLog`` is given."""
+
+    def __init__(self, chatlog):
+        self._attach(chatlog)
+        self._add_conversations(chatlog.conversations())
+
+
+    def __repr__(self):
+        return "<SearchIndex (%i message%s)>" % (
+         len(self), "" if len(self) == 1 else "s"
+        )
+
+
+    def __len__(self):
+        return len(self._numbers)
+
+
+    @staticmethod
+    def load(path, chatlog):
+        """An alternate constructor. It loads an index of a chatlog from a file
+        created with :py:meth:`save`.
+
+        The saved conversations are matched to the chatlog's conversations by
+        their text, so the chatlog does not need to have been loaded in the
+        same way or in the same order. Any conversations that have changed or
+        been added since the index was saved are indexed again.
+
+        :param str path: The file to load from.
+        :param ChatLog chatlog: The chatlog that the index is of.
+        :raises TypeError: if something other than a ``ChatLog`` is given.
+        :raises ValueError: if the file isn't a pychats search index, or is\
+        from an unsupported version, or is truncated.
+        :rtype: ``SearchIndex``"""
+
+        index = SearchIndex.__new__(SearchIndex)
+        index._attach(chatlog)
+        conversations = chatlog.conversations()
+        with map_file(path) as data:
+            digests, documents, postings = _read_index(data)
+        available = {}
+        for conversation in conversations:
+            available.setdefault(_digest(conversation), []).append(conversation)
+        matched = []
+        for digest in digests:
+            matches = available.get(digest)
+            matched.append(matches.pop() if matches else None)
+        for conversation in matched:
+            if conversation is not None: index._conversations[conversation] = None
+        for number, position in zip(*documents):
+            conversation = matched[number]
+            if conversation is None:
+                index._documents.append(None)
+                index._removed += 1
+            else:
+                message = conversation._message_list()[position]
+                index._numbers[message] = len(index._documents)
+                index._documents.append(message)
+        index._postings = postings
+        if index._removed: index._compact()
+        index._add_conversations(
+         [c for c in conversations if c not in index._conversations]
+        )
+        return index
+
+
+    def search(self, query):
+        """Returns the messages that match every part of a query. A part can
+        be a word, which matches messages containing that term, a word ending
+        in ``*``, which matches messages containing any term starting with it,
+        or some words in double quotes, which match messages containing those
+        terms next to each other in that order.
+
+            >>> index.search('"happy birthday" part*')
+
+        Words that break up into more than one term, such as ``don't``, are
+        searched for as a phrase.
+
+        :param str query: The query to run.
+        :returns: ``list`` of ``Message``, in the order they were indexed."""
+
+        terms, prefixes, phrases = [], [], []
+        for quoted, word in _QUERY.findall(query):
+            tokens = tokenize(quoted or word)
+            if word.endswith("*") and tokens:
+                prefixes.append(tokens.pop())
+            terms += tokens
+            if len(tokens) > 1: phrases.append(tokens)
+        return self._find(terms, prefixes, phrases)
+
+
+    def term(self, term):
+        """Returns the messages that contain a term.
+
+        :param str term: The term to look for. It is case-folded, but should\
+        otherwise be a single term as produced by :py:func:`tokenize`.
+        :returns: ``list`` of ``Message``, in the order they were indexed."""
+
+        return self._find([term.casefold()], [], [])
+
+
+    def phrase(self, text):
+        """Returns the messages that contain the terms of some text next to
+        each other and in the same order.
+
+        :param str text: The phrase to look for.
+        :returns: ``list`` of ``Message``, in the order they were indexed."""
+
+        tokens = tokenize(text)
+        return self._find(tokens, [], [tokens] if len(tokens) > 1 else [])
+
+
+    def prefix(self, prefix):
+        """Returns the messages that contain a term starting with a prefix.
+
+        :param str prefix: The start of the terms to look for.
+        :returns: ``list`` of ``Message``, in the order they were indexed."""
+
+        return self._find([], [prefix.casefold()], [])
+
+
+    def save(self, path):
+        """Saves the index to a binary file, which can be loaded again with
+        :py:meth:`load`. The document numbers in each term's array are stored
+        as the differences between them, in the smallest integer type that
+        will hold that term's differences.
+
+        :param str path: The file to save it to."""
+
+        conversations = {
+         conversation: number
+         for number, conversation in enumerate(self._conversations)
+        }
+        renumbered, numbers, positions = [], array("I"), array("I")
+        for message in self._documents:
+            conversation = message and message._conversation
+            if conversation in conversations:
+                renumbered.append(len(numbers))
+                numbers.append(conversations[conversation])
+                positions.append(_find_message(
+                 conversation._message_list(), conversation._timestamps,
+                 message, message.timestamp()
+                ))
+            else:
+                renumbered.append(-1)
+        terms, lengths, widths, deltas = [], array("I"), bytearray(), []
+        unchanged = len(numbers) == len(renumbered)
+        for term, postings in self._postings.items():
+            if not unchanged:
+                postings = [renumbered[n] for n in postings if renumbered[n] >= 0]
+                if not postings: continue
+            differences = array("Q", [postings[0]])
+            differences.extend(map(int.__sub__, postings[1:], postings))
+            width = 1
+            while max(differences) >> (8 * width): width *= 2
+            terms.append(term)
+            lengths.append(len(postings))
+            widths.append(width)
+            deltas.append(array(_WIDTHS[width], differences))
+        with replace_file(path, "wb") as f:
+            writer = _Writer(f)
+            writer.write(_HEADER.pack(
+             MAGIC, VERSION, len(conversations), len(numbers), len(terms)
+            ))
+            for conversation in conversations:
+                writer.write(_digest(conversation))
+            writer.write_array(numbers)
+            writer.write_array(positions)
+            writer.pad()
+            writer.write_string("\n".join(terms))
+            writer.pad()
+            writer.write_array(lengths)
+            writer.write(widths)
+            writer.pad()
+            for differences in deltas:
+                writer.write_array(differences)
+
+
+    def _attach(self, chatlog):
+        if not isinstance(chatlog, ChatLog):
+            raise TypeError("Can only index ChatLog objects, not '%s'" % chatlog)
+        self._conversations, self._documents, self._numbers = {}, [], {}
+        self._postings, self._terms, self._removed = {}, None, 0
+        chatlog._indexes.add(self)
+
+
+    def _find(self, terms, prefixes, phrases):
+        # Intersects the postings of the terms and prefixes, shortest first,
+        # and checks the phrases against the text of the messages that remain.
+        lists = []
+        for term in set(terms):
+            postings = self._postings.get(term)
+            if postings is None: return []
+            lists.append(postings)
+        for prefix in set(prefixes):
+            postings = self._prefix_postings(prefix)
+            if not postings: return []
+            lists.append(postings)
+        if not lists: return []
+        lists.sort(key=len)
+        numbers = lists[0]
+        for postings in lists[1:]:
+            if not numbers: break
+            numbers = _intersect(numbers, postings)
+        messages = [self._documents[number] for number in numbers]
+        if self._removed:
+            messages = [message for message in messages if message is not None]
+        for phrase in phrases:
+            messages = [message for message in messages
+             if _contains(tokenize(message._text), phrase)]
+        return messages
+
+
+    def _prefix_postings(self, prefix):
+        if self._terms is None: self._terms = sorted(self._postings)
+        lists, index = [], bisect_left(self._terms, prefix)
+        while index < len(self._terms) and self._terms[index].startswith(prefix):
+            lists.append(self._postings[self._terms[index]])
+            index += 1
+        if len(lists) < 2: return lists[0] if lists else None
+        return array("q", sorted(set().union(*lists)))
+
+
+    def _add_conversations(self, conversations):
+        for conversation in conversations:
+            if conversation not in self._conversations:
+                self._conversations[conversation] = None
+                self._add_messages(conversation._message_list())
+
+
+    def _remove_conversations(self, conversations):
+        for conversation in conversations:
+            if conversation in self._conversations:
+                del self._conversations[conversation]
+                self._remove_messages(conversation._message_list())
+
+
+    def _add_messages(self, messages):
+        # Gives each message the next document number, so that every array of
+        # postings stays in ascending order as the number is appended to it.
+        postings, documents = self._postings, self._documents
+        for message in messages:
+            if message in self._numbers\
+             or message._conversation not in self._conversations:
+                continue
+            number = len(documents)
+            self._numbers[message] = number
+            documents.append(message)
+            for term in set(tokenize(message._text)):
+                term_postings = postings.get(term)
+                if term_postings is None:
+                    postings[term] = array("q", [number])
+                    self._terms = None
+                else:
+                    term_postings.append(number)
+
+
+    def _remove_messages(self, messages):
+        for message in messages:
+            number = self._numbers.pop(message, None)
+            if number is not None:
+                self._documents[number] = None
+                self._removed += 1
+        if self._removed * 2 > len(self._documents): self._compact()
+
+
+    def _update_messages(self, messages):
+        messages = [message for message in messages if message in self._numbers]
+        self._remove_messages(messages)
+        self._add_messages(messages)
+
+
+    def _compact(self):
+        # Renumbers the remaining messages from zero, and removes the numbers
+        # of removed messages from the postings.
+        renumbered, documents = [], []
+        for message in self._documents:
+            if message is None:
+                renumbered.append(-1)
+            else:
+                renumbered.append(len(documents))
+                documents.append(message)
+        for term, postings in list(self._postings.items()):
+            postings = [renumbered[n] for n in postings if renumbered[n] >= 0]
+            if postings:
+                self._postings[term] = array("q", postings)
+            else:
+                del self._postings[term]
+                self._terms = None
+        self._documents, self._removed = documents, 0
+        self._numbers = {
+         message: number for number, message in enumerate(documents)
+        }
+
+
+
+def _intersect(first, second):
+    # Finds the numbers in both of two ascending arrays by going through the
+    # shorter one and galloping ahead in the longer one.
+    if len(first) > len(second): first, second = second, first
+    result, position, size = array("q"), 0, len(second)
+    for number in first:
+        position = _gallop(second, number, position)
+        if position == size: break
+        if second[position] == number: result.append(number)
+    return result
+
+
+def _gallop(postings, number, low):
+    # Returns the position of the first value from low onwards that is at
+    # least the number given, taking doubling steps and then bisecting.
+    high, step, size = low, 1, len(postings)
+    while high < size and postings[high] < number:
+        low, high, step = high + 1, high + step, step * 2
+    return bisect_left(postings, number, low, min(high, size))
+
+
+def _contains(tokens, phrase):
+    first, size = phrase[0], len(phrase)
+    for index, token in enumerate(tokens):
+        if token == first and tokens[index:index + size] == phrase: return True
+    return False
+
+
+def _digest(conversation):
+    # Identifies a conversation by a hash of its messages' text.
+    digest = hashlib.blake2b(digest_size=_DIGEST_SIZE)
+    digest.update(_LENGTH.pack(conversation.length()))
+    digest.update("\0".join(
+     [message._text for message in conversation._iter_messages()]
+    ).encode("utf-8", "surrogatepass"))
+    return digest.digest()
+
+
+def _read_index(data):
+    # Reads the conversation digests, the conversation number and position of
+    # each document, and the postings of each term from a saved index.
+    try:
+        magic, version, conversations, documents, terms = _HEADER.unpack_from(data)
+    except struct.error:
+        magic, version = None, None
+    if magic != MAGIC:
+        raise ValueError("Not a pychats search index")
+    if version != VERSION:
+        raise ValueError("Unsupported search index version %i" % version)
+    with memoryview(data) as view:
+        position = _check_size(view, _HEADER.size, _DIGEST_SIZE * conversations)
+        digests = [bytes(view[start:start + _DIGEST_SIZE]) for start in range(
+         _HEADER.size, position, _DIGEST_SIZE
+        )]
+        _check_size(view, position, 8 * documents)
+        numbers = _read_array("I", view, position, documents)
+        positions = _read_array("I", view, position + 4 * documents, documents)
+        position += 8 * documents
+        start = _check_size(view, position, _LENGTH.size)
+        position = _check_size(view, start, _LENGTH.unpack_from(view, position)[0])
+        names = str(view[start:position], "utf-8", "surrogatepass")
+        start = position + -position % 8
+        position = _check_size(view, start, 5 * terms)
+        lengths = _read_array("I", view, start, terms)
+        widths = bytes(view[start + 4 * terms:position])
+        position += -position % 8
+        postings = {}
+        for term, count, width in zip(
+         names.split("\n") if terms else [], lengths, widths
+        ):
+            start = position
+            position = _check_size(view, position, count * width)
+            postings[term] = array(
+             "q", accumulate(_read_array(_WIDTHS[width], view, start, count))
+            )
+    return digests, (numbers, positions), postings
+
+
+def _check_size(view, position, size):
+    if position + size > len(view):
+        raise ValueError("Search index is truncated")
+    return position + size
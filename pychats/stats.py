@@ -0,0 +1,178 @@
+"""This module provides functions for calculating statistics about chatlogs.
+
+Each function takes a :py:class:`.ChatLog`, a :py:class:`.Conversation` or a
+:py:class:`.MessageColumns` store, and works on batched arrays of timestamps
+and senders rather than on individual :py:class:`.Message` objects. If NumPy
+is installed the calculations are vectorised with it - otherwise they fall
+back to pure Python, which gives the same results more slowly.
+
+For the fastest results on very large logs, pass :py:class:`.MessageColumns`
+objects directly, as converting a conversation to columns requires visiting
+every message once."""
+
+from array import array
+from collections import Counter
+from datetime import date, timedelta
+from .chats.chatlogs import ChatLog
+from .chats.conversations import Conversation
+from .chats.columns import MessageColumns
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+HOUR = 3600 * 10 ** 6
+DAY = 24 * HOUR
+EPOCH_DATE = date(1970, 1, 1)
+EPOCH_WEEKDAY = EPOCH_DATE.weekday()
+
+def message_counts(source):
+    """Returns the number of messages sent by each person.
+
+    :param source: A ``ChatLog``, ``Conversation`` or ``MessageColumns``.
+    :returns: ``dict`` of ``Contact`` to ``int``"""
+
+    counts = Counter()
+    for columns in _get_columns(source):
+        if numpy is not None:
+            senders = numpy.bincount(
+             _numpy_array(columns.senders), minlength=len(columns.contacts)
+            )
+            for index, count in enumerate(senders.tolist()):
+                if count: counts[columns.contacts[index]] += count
+        else:
+            for index, count in Counter(columns.senders).items():
+                counts[columns.contacts[index]] += count
+    return dict(counts)
+
+
+def histogram(source, by="hour"):
+    """Counts messages by when they were sent.
+
+    If ``by`` is ``"hour"`` a list of 24 counts is returned, one for each hour
+    of the day. If it is ``"weekday"`` a list of 7 counts is returned, one for
+    each day of the week starting with Monday. If it is ``"day"`` or
+    ``"week"``, a ``dict`` is returned mapping each day (or the Monday of each
+    week) that has messages to the number of messages sent.
+
+    :param source: A ``ChatLog``, ``Conversation`` or ``MessageColumns``.
+    :param str by: ``"hour"``, ``"weekday"``, ``"day"`` or ``"week"``.
+    :raises ValueError: if an unknown ``by`` is given.
+    :rtype: ``list`` or ``dict``"""
+
+    if by not in ("hour", "weekday", "day", "week"):
+        raise ValueError("Cannot make histogram by '%s'" % by)
+    counts = Counter()
+    for columns in _get_columns(source):
+        if numpy is not None:
+            timestamps = _numpy_array(columns.timestamps)
+            if by == "hour":
+                bins = (timestamps // HOUR) % 24
+            elif by == "weekday":
+                bins = (timestamps // DAY + EPOCH_WEEKDAY) % 7
+            elif by == "day":
+                bins = timestamps // DAY
+            else:
+                bins = (timestamps // DAY + EPOCH_WEEKDAY) // 7
+            values, value_counts = numpy.unique(bins, return_counts=True)
+            counts.update(dict(zip(values.tolist(), value_counts.tolist())))
+        else:
+            if by == "hour":
+                counts.update((t // HOUR) % 24 for t in columns.timestamps)
+            elif by == "weekday":
+                counts.update(
+                 (t // DAY + EPOCH_WEEKDAY) % 7 for t in columns.timestamps
+                )
+            elif by == "day":
+                counts.update(t // DAY for t in columns.timestamps)
+            else:
+                counts.update(
+                 (t // DAY + EPOCH_WEEKDAY) // 7 for t in columns.timestamps
+                )
+    if by == "hour":
+        return [counts[hour] for hour in range(24)]
+    if by == "weekday":
+        return [counts[day] for day in range(7)]
+    if by == "day":
+        return {
+         EPOCH_DATE + timedelta(days=day): count
+         for day, count in sorted(counts.items())
+        }
+    return {
+     EPOCH_DATE + timedelta(days=week * 7 - EPOCH_WEEKDAY): count
+     for week, count in sorted(counts.items())
+    }
+
+
+def response_times(source):
+    """Returns the time between each message and the message before it, for
+    every message whose sender is different to the previous message's sender
+    in the same conversation - that is, how long people took to reply.
+
+    :param source: A ``ChatLog``, ``Conversation`` or ``MessageColumns``.
+    :returns: ``array`` of response times in microseconds"""
+
+    times = array("q")
+    for columns in _get_columns(source):
+        if numpy is not None:
+            timestamps = _numpy_array(columns.timestamps)
+            senders = _numpy_array(columns.senders)
+            changes = senders[1:] != senders[:-1]
+            times.frombytes(
+             (timestamps[1:] - timestamps[:-1])[changes].astype("q").tobytes()
+            )
+        else:
+            timestamps, senders = columns.timestamps, columns.senders
+            times.extend([
+             timestamps[i] - timestamps[i - 1] for i in range(1, len(senders))
+             if senders[i] != senders[i - 1]
+            ])
+    return times
+
+
+def streaks(source):
+    """Returns the lengths, in days, of every run of consecutive days on which
+    at least one message was sent, in chronological order.
+
+    :param source: A ``ChatLog``, ``Conversation`` or ``MessageColumns``.
+    :returns: ``list`` of ``int``"""
+
+    if numpy is not None:
+        days = [
+         numpy.unique(_numpy_array(columns.timestamps) // DAY)
+         for columns in _get_columns(source)
+        ]
+        if not days: return []
+        days = numpy.unique(numpy.concatenate(days))
+        if not len(days): return []
+        breaks = numpy.flatnonzero(days[1:] - days[:-1] != 1) + 1
+        edges = numpy.concatenate(([0], breaks, [len(days)]))
+        return (edges[1:] - edges[:-1]).tolist()
+    days = set()
+    for columns in _get_columns(source):
+        days.update(t // DAY for t in columns.timestamps)
+    lengths, previous = [], None
+    for day in sorted(days):
+        if previous is not None and day == previous + 1:
+            lengths[-1] += 1
+        else:
+            lengths.append(1)
+        previous = day
+    return lengths
+
+
+def _get_columns(source):
+    if isinstance(source, MessageColumns):
+        return [source]
+    if isinstance(source, Conversation):
+        return [source._columns()]
+    if isinstance(source, ChatLog):
+        return source._columns()
+    raise TypeError(
+     "Need a ChatLog, Conversation or MessageColumns, not '%s'" % str(source)
+    )
+
+
+def _numpy_array(column):
+    return numpy.frombuffer(column, dtype=column.typecode)
@@ -13,12 +13,12 @@ setup(name="pychats",
                    "License :: OSI Approved :: MIT License",
                    "Topic :: Communications",
                    "Programming Language :: Python :: 3",
-                   "Programming Language :: Python :: 3.0",
-                   "Programming Language :: Python :: 3.1",
-                   "Programming Language :: Python :: 3.2",
-                   "Programming Language :: Python :: 3.3",
-                   "Programming Language :: Python :: 3.4",
-                   "Programming Language :: Python :: 3.5",
-                   "Programming Language :: Python :: 3.6"],
+                   "Programming Language :: Python :: 3.7",
+                   "Programming Language :: Python :: 3.8",
+                   "Programming Language :: Python :: 3.9",
+                   "Programming Language :: Python :: 3.10",
+                   "Programming Language :: Python :: 3.11"],
+      python_requires=">=3.7",
       packages=["pychats", "pychats.chats", "pychats.parse"],
-      install_requires=["beautifulsoup4"])
+      install_requires=["beautifulsoup4"],
+      extras_require={"stats": ["numpy"]})
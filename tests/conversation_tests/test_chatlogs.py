@@ -1,7 +1,18 @@
+import gc
+import json
+import os
+import weakref
+from tempfile import mkstemp
+from datetime import datetime
+from io import StringIO, BytesIO
 from unittest import TestCase
 from unittest.mock import Mock, patch, MagicMock
 from pychats.chats.conversations import Conversation
-from pychats.chats.chatlogs import ChatLog, from_json
+from pychats.chats.people import Contact, ContactRegistry, ContactScope
+from pychats.chats.messages import Message
+from pychats.chats.chatlogs import ChatLog, ChatLogBuilder, from_json, iter_json
+from pychats.chats.chatlogs import LazyChatLog, load_binary, _write_json
+from pychats.chats.views import SetView
 
 class ChatlogTest(TestCase):
 
@@ -30,19 +41,23 @@ class ChatlogFromJsonTests(ChatlogTest):
 
     @patch("pychats.chats.chatlogs.Conversation.from_json")
     def test_can_create_conversation_from_json(self, mock_conversation):
-        conv1, conv2, conv3 = Mock(), Mock(), Mock()
+        conv1, conv2, conv3 = [Mock(Conversation) for _ in range(3)]
         mock_conversation.side_effect = [conv1, conv2, conv3]
         json = {
          "name": "Log Name",
          "conversations": ["conv1", "conv2", "conv3"]
         }
         log = ChatLog.from_json(json)
-        mock_conversation.assert_any_call("conv1")
-        mock_conversation.assert_any_call("conv2")
-        mock_conversation.assert_any_call("conv3")
+        contacts = mock_conversation.call_args_list[0][0][1]
+        self.assertIsInstance(contacts, ContactRegistry)
+        mock_conversation.assert_any_call("conv1", contacts)
+        mock_conversation.assert_any_call("conv2", contacts)
+        mock_conversation.assert_any_call("conv3", contacts)
         self.assertIsInstance(log, ChatLog)
         self.assertEqual(log._name, "Log Name")
-        self.assertEqual(log._conversations, [conv1, conv2, conv3])
+        self.assertEqual(log._conversations, set([conv1, conv2, conv3]))
+        for conversation in (conv1, conv2, conv3):
+            self.assertIs(conversation._chatlog, log)
 
 
     def test_json_to_chatlog_requires_dict(self):
@@ -112,6 +127,24 @@ class ChatLogConversationsTests(ChatlogTest):
         self.assertIsNot(chatlog._conversations, chatlog.conversations())
 
 
+    def test_conversations_are_a_read_only_view(self):
+        chatlog = ChatLog("Facebook")
+        conversations = chatlog.conversations()
+        self.assertIsInstance(conversations, SetView)
+        chatlog.add_conversation(self.conversation1)
+        self.assertEqual(conversations, set([self.conversation1]))
+        self.assertFalse(hasattr(conversations, "add"))
+
+
+    def test_can_get_copy_of_conversations(self):
+        chatlog = ChatLog("Facebook")
+        chatlog.add_conversation(self.conversation1)
+        conversations = chatlog.conversations(copy=True)
+        self.assertIsInstance(conversations, set)
+        conversations.add(self.conversation2)
+        self.assertEqual(chatlog._conversations, set([self.conversation1]))
+
+
 
 class ChatlogConversationAdditionTests(ChatlogTest):
 
@@ -151,6 +184,37 @@ class ChatlogConversationAdditionTests(ChatlogTest):
 
 
 
+class ChatlogBulkConversationAdditionTests(ChatlogTest):
+
+    def test_can_add_conversations_in_bulk(self):
+        chatlog = ChatLog("Facebook")
+        chatlog.add_conversations([self.conversation1, self.conversation2])
+        chatlog.add_conversations(iter([self.conversation3]))
+        self.assertEqual(chatlog._conversations, set(
+         [self.conversation1, self.conversation2, self.conversation3]
+        ))
+        for conversation in chatlog._conversations:
+            self.assertIs(conversation._chatlog, chatlog)
+
+
+    def test_can_only_add_conversations_in_bulk(self):
+        chatlog = ChatLog("Facebook")
+        with self.assertRaises(TypeError):
+            chatlog.add_conversations([self.conversation1, "Conv"])
+        self.assertEqual(chatlog._conversations, set())
+
+
+    def test_cannot_add_existing_conversations_in_bulk(self):
+        chatlog = ChatLog("Facebook")
+        chatlog.add_conversation(self.conversation1)
+        with self.assertRaises(ValueError):
+            chatlog.add_conversations([self.conversation2, self.conversation1])
+        with self.assertRaises(ValueError):
+            chatlog.add_conversations([self.conversation2, self.conversation2])
+        self.assertEqual(chatlog._conversations, set([self.conversation1]))
+
+
+
 class ChatlogConversationRemovalTests(ChatlogTest):
 
     def test_can_remove_conversations(self):
@@ -166,6 +230,42 @@ class ChatlogConversationRemovalTests(ChatlogTest):
 
 
 
+class ChatLogTimeRangeTests(TestCase):
+
+    def setUp(self):
+        self.sam, self.bob = Contact("Sam"), Contact("Bob")
+        self.messages = [
+         Message(str(day), datetime(2017, 1, day), self.sam if day % 2 else self.bob)
+         for day in range(1, 10)
+        ]
+        self.log = ChatLog("Test")
+        for messages in (self.messages[::3], self.messages[1::3], self.messages[2::3]):
+            conversation = Conversation()
+            conversation.add_messages(messages)
+            self.log.add_conversation(conversation)
+
+
+    def test_can_get_messages_between_times(self):
+        messages = self.log.messages_between(
+         datetime(2017, 1, 2), datetime(2017, 1, 8)
+        )
+        self.assertNotIsInstance(messages, list)
+        self.assertEqual(list(messages), self.messages[1:7])
+        self.assertEqual(list(self.log.messages_between()), self.messages)
+        self.assertEqual(
+         list(self.log.messages_between(end=datetime(2017, 1, 1))), []
+        )
+        self.assertEqual(list(self.log.messages_between(
+         start=datetime(2017, 1, 8, 12)
+        )), self.messages[8:])
+
+
+    def test_range_must_be_datetimes(self):
+        with self.assertRaises(TypeError):
+            ChatLog("Empty").messages_between(1)
+
+
+
 class ChatLogToJsonTests(ChatlogTest):
 
     def test_can_get_json_from_chatlog(self):
@@ -183,39 +283,458 @@ class ChatLogToJsonTests(ChatlogTest):
 
 class JsonFileLoadingTests(ChatlogTest):
 
-    @patch("pychats.chats.chatlogs.ChatLog.from_json")
-    @patch("json.load")
-    @patch("builtins.open")
-    def test_loading_from_json_file(self, mock_open, mock_load, mock_json):
+    def setUp(self):
+        ChatlogTest.setUp(self)
+        self.patcher = patch("pychats.chats.chatlogs.map_file")
+        self.mock_open = self.patcher.start()
+
+
+    def tearDown(self):
+        self.patcher.stop()
+
+
+    def set_file(self, text):
         open_return = MagicMock()
-        mock_file = Mock()
-        open_return.__enter__.return_value = mock_file
-        mock_file.read.return_value = '{"a": "b"}'
-        mock_open.return_value = open_return
-        mock_load.return_value = {"a": "b"}
-        mock_json.return_value = "log object"
+        open_return.__enter__.return_value = BytesIO(text.encode())
+        self.mock_open.return_value = open_return
+
+
+    def test_loading_from_json_file(self):
+        sam = '{"name": "Sam", "tags": ["me"]}'
+        self.set_file(
+         '{"conversations": [{"messages": [{"text": "B", "sender": %s,'
+         ' "timestamp": "2017-01-01 10:00:00"}, {"text": "A", "sender": %s,'
+         ' "timestamp": "2017-01-01 09:00:00"}]}, {"messages": [{"text": "C",'
+         ' "sender": {"name": "Sam"}, "timestamp": "2017-01-02 09:00:00"}]},'
+         ' {"messages": []}], "name": "Log"}' % (sam, sam)
+        )
         log = from_json("path/to/file")
-        mock_open.assert_called_with("path/to/file")
-        mock_load.assert_called_with(mock_file)
-        mock_json.assert_called_with({"a": "b"})
-        self.assertEqual(log, "log object")
+        self.mock_open.assert_called_with("path/to/file")
+        self.assertIsInstance(log, ChatLog)
+        self.assertEqual(log._name, "Log")
+        conv1, conv2, conv3 = sorted(
+         log._conversations, key=lambda c: -len(c.messages())
+        )
+        self.assertEqual([m.text() for m in conv1.messages()], ["A", "B"])
+        self.assertEqual(conv1.messages()[0].timestamp(), datetime(2017, 1, 1, 9))
+        sam = conv1.messages()[0].sender()
+        self.assertEqual(sam.name(), "Sam")
+        self.assertEqual(sam.tags(), set(["me"]))
+        self.assertIs(conv1.messages()[1].sender(), sam)
+        self.assertIs(conv2.messages()[0].sender(), sam)
+        self.assertIsInstance(sam._registry, ContactRegistry)
+        self.assertEqual(conv3.messages(), [])
+
+
+    def test_loading_from_json_file_checks_conversations(self):
+        self.set_file('{"name": "Log", "conversations": [{"a": 1}]}')
+        with self.assertRaises(ValueError):
+            from_json("path/to/file")
+        self.set_file('{"name": "Log", "conversations": [{"messages": [{}]}]}')
+        with self.assertRaises(ValueError):
+            from_json("path/to/file")
+        self.set_file('{"name": "Log", "conversations": [1]}')
+        with self.assertRaises(TypeError):
+            from_json("path/to/file")
+
+
+    def test_loading_from_json_file_requires_str_name(self):
+        self.set_file('{"name": 0, "conversations": []}')
+        with self.assertRaises(TypeError):
+            from_json("path/to/file")
+
+
+    def test_loading_from_json_file_requires_name(self):
+        self.set_file('{"conversations": []}')
+        with self.assertRaises(ValueError):
+            from_json("path/to/file")
+
+
+    def test_loading_from_json_file_requires_conversations(self):
+        self.set_file('{"name": "Log"}')
+        with self.assertRaises(ValueError):
+            from_json("path/to/file")
+
+
+    @patch("pychats.chats.chatlogs.Conversation.from_json")
+    def test_can_iterate_over_json_file(self, mock_conversation):
+        self.set_file('{"conversations": [{"a": 1}, {"b": 2}], "name": "Log"}')
+        mock_conversation.side_effect = [self.conversation1, self.conversation2]
+        conversations = iter_json("path/to/file")
+        self.assertIs(next(conversations), self.conversation1)
+        self.assertEqual(mock_conversation.call_count, 1)
+        self.assertIs(next(conversations), self.conversation2)
+        with self.assertRaises(StopIteration):
+            next(conversations)
+
+
+
+class BinarySnapshotTests(ChatlogTest):
+
+    def setUp(self):
+        ChatlogTest.setUp(self)
+        handle, self.path = mkstemp()
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+        self.log = ChatLog("Log")
+        sam, bob = Contact("Sam"), Contact("Bob")
+        bob.add_tag("friend")
+        for size in (3, 1):
+            conversation = Conversation()
+            conversation.add_messages([Message(
+             "Message %i" % i, datetime(2017, 1, 1, 9, i, 0, i), [sam, bob][i % 2]
+            ) for i in range(size)])
+            self.log.add_conversation(conversation)
+
+
+    def test_can_save_and_load_binary(self):
+        self.log.save_binary(self.path)
+        log = load_binary(self.path)
+        self.assertIsInstance(log, ChatLog)
+        self.assertEqual(log.name(), "Log")
+        self.assertEqual(log.to_json(), self.log.to_json())
+        conv1, conv2 = sorted(log.conversations(), key=len, reverse=True)
+        self.assertEqual(
+         conv1.messages()[1].timestamp(), datetime(2017, 1, 1, 9, 1, 0, 1)
+        )
+        self.assertIs(conv1.chatlog(), log)
+        self.assertIs(conv1.messages()[0].sender(), conv2.messages()[0].sender())
+
+
+    @patch("pychats.chats.chatlogs.ColumnConversation")
+    def test_binary_conversations_are_created_lazily(self, mock_from_columns):
+        mock_from_columns.side_effect = lambda columns: Conversation()
+        self.log.save_binary(self.path)
+        log = load_binary(self.path)
+        self.assertEqual(repr(log), "<'Log' ChatLog (2 Conversations)>")
+        self.assertEqual([len(c) for c in log._columns()], [3, 1])
+        self.assertFalse(mock_from_columns.called)
+        self.assertEqual(len(log.conversations()), 2)
+        self.assertEqual(mock_from_columns.call_count, 2)
+        log.conversations()
+        self.assertEqual(mock_from_columns.call_count, 2)
+
+
+    def test_loaded_binary_chatlog_can_be_changed(self):
+        self.log.save_binary(self.path)
+        log = load_binary(self.path)
+        log.add_conversation(Conversation())
+        self.assertEqual(len(log.conversations()), 3)
+        log.save_binary(self.path)
+        self.assertEqual(len(load_binary(self.path).conversations()), 3)
+
+
+    def test_unchanged_binary_chatlog_can_be_saved_over_its_file(self):
+        self.log.save_binary(self.path)
+        load_binary(self.path).save_binary(self.path)
+        self.assertEqual(load_binary(self.path).to_json(), self.log.to_json())
+
+
+    def test_changed_binary_chatlog_can_be_saved_over_its_file(self):
+        self.log.save_binary(self.path)
+        log = load_binary(self.path, cache_size=0)
+        other = load_binary(self.path, cache_size=0)
+        log.name("Renamed")
+        log.save_binary(self.path)
+        self.assertEqual(sorted(len(c) for c in log), [1, 3])
+        self.assertEqual(sorted(len(c) for c in other), [1, 3])
+        self.assertEqual(
+         other.to_json()["conversations"], self.log.to_json()["conversations"]
+        )
+        lazy = load_binary(self.path, cache_size=0)
+        conversation = max(lazy, key=len)
+        conversation.add_message(Message(
+         "A much longer message than the others", datetime(2018, 1, 1),
+         conversation.messages()[0].sender()
+        ))
+        lazy.save_binary(self.path)
+        self.assertFalse(lazy.loaded())
+        self.assertEqual(sorted(len(c) for c in lazy), [1, 4])
+        saved = load_binary(self.path)
+        self.assertEqual(saved.name(), "Renamed")
+        self.assertEqual(sorted(len(c) for c in saved), [1, 4])
+
+
+    def test_loading_binary_requires_snapshot(self):
+        with open(self.path, "w") as f:
+            f.write('{"name": "Log", "conversations": []}')
+        with self.assertRaises(ValueError):
+            load_binary(self.path)
+
+
+
+class LazyChatLogTests(ChatlogTest):
+
+    def setUp(self):
+        BinarySnapshotTests.setUp(self)
+        self.json_path = self.path + ".json"
+        self.addCleanup(os.remove, self.json_path)
+        self.log.save(self.json_path)
+        self.log.save_binary(self.path)
+
+
+    def load_both(self, cache_size=128):
+        return [
+         from_json(self.json_path, lazy=True, cache_size=cache_size),
+         load_binary(self.path, cache_size)
+        ]
+
+
+    def test_lazy_chatlogs_only_read_positions(self):
+        for log in self.load_both():
+            self.assertIsInstance(log, LazyChatLog)
+            self.assertEqual(log.name(), "Log")
+            self.assertEqual(len(log), 2)
+            self.assertEqual(repr(log), "<'Log' ChatLog (2 Conversations)>")
+            self.assertFalse(log.loaded())
+            self.assertEqual(len(log._live), 0)
+
+
+    def test_iterating_decodes_conversations(self):
+        for log in self.load_both():
+            conversations = list(log)
+            self.assertEqual(sorted(len(c) for c in conversations), [1, 3])
+            for conversation in conversations:
+                self.assertIs(conversation.chatlog(), log)
+            self.assertIs(list(log)[0], conversations[0])
+            self.assertFalse(log.loaded())
+            self.assertEqual(sorted(
+             [m.to_json() for m in c.messages()] for c in conversations
+            ), sorted(
+             [m.to_json() for m in c.messages()] for c in self.log.conversations()
+            ))
+
+
+    def test_decoded_conversations_are_cached_up_to_a_limit(self):
+        for log in self.load_both(cache_size=1):
+            first = weakref.ref(next(iter(log)))
+            self.assertEqual(len(log._cache), 1)
+            for conversation in log: pass
+            del conversation
+            self.assertEqual(len(log._cache), 1)
+            gc.collect()
+            self.assertIsNone(first())
+            self.assertEqual(len(next(iter(log))), 3)
+
+
+    def test_referenced_conversations_keep_identity(self):
+        for log in self.load_both(cache_size=0):
+            first = next(iter(log))
+            list(log)
+            self.assertEqual(len(log._cache), 0)
+            self.assertIs(next(iter(log)), first)
+
+
+    def test_changed_conversations_are_not_dropped(self):
+        for log in self.load_both(cache_size=0):
+            for conversation in log:
+                conversation.add_message(Message(
+                 "New", datetime(2018, 1, 1),
+                 conversation.messages()[0].sender()
+                ))
+            del conversation
+            gc.collect()
+            self.assertEqual(len(log._live), 2)
+            self.assertEqual(sorted(len(c) for c in log.conversations()), [2, 4])
+        for log in self.load_both(cache_size=0):
+            message = max(log, key=len).messages()[0]
+            message.text("Edited")
+            del message
+            gc.collect()
+            self.assertIn("Edited", [
+             m.text() for c in log.conversations() for m in c.messages()
+            ])
+
+
+    def test_unchanged_conversations_can_be_dropped(self):
+        for log in self.load_both(cache_size=0):
+            for conversation in log: conversation.messages()
+            del conversation
+            gc.collect()
+            self.assertEqual(len(log._live), 0)
+
+
+    def test_needing_every_conversation_loads_lazy_chatlog(self):
+        for log in self.load_both(cache_size=1):
+            first = next(iter(log))
+            conversations = log.conversations()
+            self.assertTrue(log.loaded())
+            self.assertIn(first, conversations)
+            self.assertEqual(len(conversations), 2)
+            self.assertEqual(set(log), conversations)
+            log.add_conversation(Conversation())
+            self.assertEqual(len(log), 3)
+            self.assertEqual(log.to_json()["name"], "Log")
+
+
+    def test_lazy_json_chatlog_can_be_saved_over_its_file(self):
+        log = from_json(self.json_path, lazy=True, cache_size=0)
+        other = from_json(self.json_path, lazy=True, cache_size=0)
+        log.name("Renamed")
+        log.save(self.json_path)
+        self.assertEqual(sorted(len(c) for c in log), [1, 3])
+        self.assertFalse(other.loaded())
+        self.assertEqual(sorted(len(c) for c in other), [1, 3])
+        conversation = max(log, key=len)
+        conversation.add_message(
+         Message("New", datetime(2018, 1, 1), conversation.messages()[0].sender())
+        )
+        log.save(self.json_path)
+        self.assertEqual(sorted(len(c) for c in log), [1, 4])
+        saved = from_json(self.json_path)
+        self.assertEqual(saved.to_json(), log.to_json())
+        self.assertEqual(saved.name(), "Renamed")
+
+
+    def test_lazy_chatlog_cache_size_is_checked(self):
+        with self.assertRaises(TypeError):
+            load_binary(self.path, "10")
+        with self.assertRaises(ValueError):
+            from_json(self.json_path, lazy=True, cache_size=-1)
+
+
+    def test_lazy_json_needs_name_and_conversations(self):
+        with open(self.json_path, "w") as f:
+            f.write('{"conversations": []}')
+        with self.assertRaises(ValueError):
+            from_json(self.json_path, lazy=True)
+        with open(self.json_path, "w") as f:
+            f.write('{"name": "Log", "conversations": [{"messages": [{}]}]}')
+        log = from_json(self.json_path, lazy=True)
+        with self.assertRaises(ValueError):
+            list(log)
+
+
+    def test_chatlogs_have_length_and_iterate(self):
+        log = ChatLog("Log")
+        log.add_conversations([self.conversation1, self.conversation2])
+        self.assertEqual(len(log), 2)
+        self.assertEqual(set(log), set([self.conversation1, self.conversation2]))
+
+
+
+class ChatLogBuilderTests(ChatlogTest):
+
+    def test_can_build_chatlog(self):
+        builder = ChatLogBuilder("Log")
+        builder.add("a", "Sam", datetime(2017, 1, 1, 10), "B")
+        builder.add(("b", 1), "Bob", datetime(2017, 1, 1, 8), "C")
+        builder.add("a", "Bob", datetime(2017, 1, 1, 9), "A")
+        builder.add("a", "Sam", datetime(2017, 1, 1, 9), "A2")
+        self.assertEqual(len(builder), 4)
+        log = builder.build()
+        self.assertIsInstance(log, ChatLog)
+        self.assertEqual(log.name(), "Log")
+        conv1, conv2 = sorted(log.conversations(), key=len)
+        self.assertEqual([m.text() for m in conv2.messages()], ["A", "A2", "B"])
+        bob = conv2.messages()[0].sender()
+        self.assertIs(conv1.messages()[0].sender(), bob)
+        self.assertEqual(conv2.participants(), set([bob, builder.find("Sam")]))
+        self.assertEqual(len(builder), 0)
+
+
+    def test_builder_interns_contacts(self):
+        contacts = ContactRegistry()
+        builder = ChatLogBuilder("Log", contacts)
+        self.assertIsNone(builder.find("Sam"))
+        builder.add(1, "Sam", datetime(2017, 1, 1), "A")
+        sam = builder.find("Sam")
+        self.assertIsInstance(sam, Contact)
+        self.assertIn(sam, contacts)
+        builder.add(2, "Sam", datetime(2017, 1, 1), "B")
+        self.assertIs(builder.find("Sam"), sam)
+
+
+    def test_builder_uses_contacts_already_in_registry(self):
+        contacts = ContactRegistry()
+        sam = Contact("Sam")
+        contacts.add(sam)
+        builder = ChatLogBuilder("Log", contacts)
+        self.assertIs(builder.find("Sam"), sam)
+        builder.add(1, "Sam", datetime(2017, 1, 1), "A")
+        log = builder.build()
+        self.assertIs(list(log.conversations())[0].messages()[0].sender(), sam)
+        self.assertEqual(len(contacts), 1)
+
+
+    def test_builder_uses_active_contact_scope(self):
+        with ContactScope() as contacts:
+            builder = ChatLogBuilder("Log")
+        builder.add(1, "Sam", datetime(2017, 1, 1), "A")
+        self.assertIn(builder.find("Sam"), contacts)
+
+
+    def test_can_add_contacts_to_builder(self):
+        builder = ChatLogBuilder("Log")
+        contact = Contact("Sam")
+        builder.add_contact(contact)
+        builder.add(1, "Sam", datetime(2017, 1, 1), "A")
+        log = builder.build()
+        self.assertIs(list(log.conversations())[0].messages()[0].sender(), contact)
+        with self.assertRaises(ValueError):
+            builder.add_contact(Contact("Sam"))
+        with self.assertRaises(TypeError):
+            builder.add_contact("Sam")
+
+
+    def test_can_add_empty_conversations(self):
+        builder = ChatLogBuilder("Log")
+        builder.add_conversation(1)
+        builder.add(1, "Sam", datetime(2017, 1, 1), "A")
+        builder.add_conversation(1)
+        builder.add_conversation(2)
+        log = builder.build()
+        self.assertEqual(sorted(len(c) for c in log.conversations()), [0, 1])
+
+
+    def test_builder_checks_values(self):
+        builder = ChatLogBuilder("Log")
+        with self.assertRaises(TypeError):
+            ChatLogBuilder(100)
+        with self.assertRaises(TypeError):
+            builder.add(1, "Sam", "2017-01-01", "A")
+        with self.assertRaises(TypeError):
+            builder.add(1, "Sam", datetime(2017, 1, 1), 100)
+        with self.assertRaises(TypeError):
+            builder.add(1, 100, datetime(2017, 1, 1), "A")
 
 
 
 class JsonFileSavingTests(ChatlogTest):
 
-    @patch("pychats.chats.chatlogs.ChatLog.to_json")
-    @patch("json.dump")
-    @patch("builtins.open")
-    def test_loading_from_json_file(self, mock_open, mock_dump, mock_json):
+    def make_log(self, sizes):
+        log = ChatLog("Test \u2603 \"log\"")
+        marvin = Contact("Marvin Goodwright")
+        marvin.add_tag("zzz")
+        marvin.add_tag("aaa")
+        mildred = Contact("Mildred \u00e9")
+        for size in sizes:
+            conversation = Conversation()
+            for index in range(size):
+                conversation.add_message(Message(
+                 "Message \\ %i\n\u2603" % index,
+                 datetime(2009, 5, 23, 12, 0, index % 60),
+                 marvin if index % 3 else mildred
+                ))
+            log.add_conversation(conversation)
+        return log
+
+
+    @patch("pychats.chats.chatlogs.replace_file")
+    def test_saving_to_json_file(self, mock_replace):
         open_return = MagicMock()
-        mock_file = Mock()
-        mock_write = MagicMock()
-        mock_file.write = mock_write
-        open_return.__enter__.return_value = mock_file
-        mock_open.return_value = open_return
-        log = ChatLog("Test")
-        mock_json.return_value = {"a": [{}]}
+        f = StringIO()
+        open_return.__enter__.return_value = f
+        mock_replace.return_value = open_return
+        log = self.make_log([2, 5])
         log.save("path/to/file")
-        mock_open.assert_called_once_with("path/to/file", "w")
-        mock_dump.assert_called_with({"a": [{}]}, mock_file)
+        mock_replace.assert_called_once_with("path/to/file", "w")
+        self.assertEqual(f.getvalue(), json.dumps(log.to_json()))
+
+
+    def test_saved_json_matches_json_dump_across_chunks(self):
+        for sizes in ([], [0], [1], [3, 0, 7], [10, 9, 1]):
+            log = self.make_log(sizes)
+            f = StringIO()
+            _write_json(log, f, chunk_size=3)
+            self.assertEqual(f.getvalue(), json.dumps(log.to_json()))
@@ -0,0 +1,313 @@
+import gc
+import os
+import tracemalloc
+from datetime import datetime
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from pychats.chats.people import Contact
+from pychats.chats.messages import Message
+from pychats.chats.conversations import Conversation, ColumnConversation
+from pychats.chats.columns import MessageColumns
+from pychats.chats.chatlogs import ChatLog, ChatLogBuilder, load_binary
+from pychats import stats
+
+class ColumnsTest(TestCase):
+
+    def setUp(self):
+        self.contact1 = Contact("Marvin Goodwright")
+        self.contact2 = Contact("Mildred Mayhew")
+        self.messages = [
+         Message("Hello", datetime(2009, 5, 23, 12, 0, 0), self.contact1),
+         Message("Hi ☃", datetime(2009, 5, 23, 12, 0, 1, 500), self.contact2),
+         Message("", datetime(1950, 5, 23, 12, 0, 2), self.contact1)
+        ]
+
+
+
+class ColumnsCreationTests(ColumnsTest):
+
+    def test_can_create_empty_columns(self):
+        columns = MessageColumns()
+        self.assertEqual(len(columns), 0)
+        self.assertEqual(list(columns), [])
+        self.assertEqual(str(columns), "<MessageColumns (0 messages)>")
+
+
+    def test_can_create_columns_from_messages(self):
+        columns = MessageColumns.from_messages(self.messages)
+        self.assertEqual(len(columns), 3)
+        self.assertEqual(list(columns.timestamps), [
+         1243080000000000, 1243080001000500, -618839998000000
+        ])
+        self.assertEqual(list(columns.senders), [0, 1, 0])
+        self.assertEqual(columns.contacts, [self.contact1, self.contact2])
+        self.assertEqual(str(columns), "<MessageColumns (3 messages)>")
+
+
+
+class ColumnsAccessTests(ColumnsTest):
+
+    def test_can_get_fields_without_messages(self):
+        columns = MessageColumns.from_messages(self.messages)
+        for index, message in enumerate(self.messages):
+            self.assertEqual(columns.text(index), message.text() or "")
+            self.assertEqual(columns.timestamp(index), message.timestamp())
+            self.assertIs(columns.sender(index), message.sender())
+
+
+    def test_indexing_creates_messages(self):
+        columns = MessageColumns.from_messages(self.messages)
+        message = columns[-2]
+        self.assertIsInstance(message, Message)
+        self.assertEqual(message._text, "Hi ☃")
+        self.assertEqual(message._timestamp, datetime(2009, 5, 23, 12, 0, 1, 500))
+        self.assertIs(message._sender, self.contact2)
+        self.assertIsNone(message._conversation)
+        self.assertEqual(
+         [m._text for m in columns[1:]], ["Hi ☃", ""]
+        )
+        with self.assertRaises(IndexError):
+            columns[3]
+
+
+    def test_can_append_after_reading(self):
+        columns = MessageColumns.from_messages(self.messages[:2])
+        self.assertEqual(columns.text(1), "Hi ☃")
+        columns.append("Bye", datetime(2009, 5, 24), self.contact2)
+        self.assertEqual(columns.text(1), "Hi ☃")
+        self.assertEqual(columns.text(2), "Bye")
+        self.assertEqual(list(columns.senders), [0, 1, 1])
+
+
+    def test_copies_are_independent(self):
+        columns = MessageColumns.from_messages(self.messages)
+        copy = columns.copy()
+        copy.append("Bye", datetime(2009, 5, 24), self.contact2)
+        self.assertEqual(len(columns), 3)
+        self.assertEqual(len(copy), 4)
+        self.assertEqual(copy.text(1), "Hi ☃")
+        self.assertEqual(copy.text(3), "Bye")
+        self.assertEqual(list(copy.senders), [0, 1, 0, 1])
+
+
+
+class ConversationColumnsTests(ColumnsTest):
+
+    def test_can_get_columns_from_conversation(self):
+        conversation = Conversation()
+        conversation.add_messages(self.messages)
+        columns = conversation.columns()
+        self.assertEqual(
+         [columns.timestamp(i) for i in range(3)],
+         [m.timestamp() for m in conversation.messages()]
+        )
+
+
+    def test_can_create_conversation_from_columns(self):
+        columns = MessageColumns.from_messages(self.messages)
+        conversation = Conversation.from_columns(columns)
+        self.assertEqual(conversation.length(), 3)
+        self.assertEqual(
+         [m.text() or "" for m in conversation.messages()], ["", "Hello", "Hi ☃"]
+        )
+        self.assertEqual(
+         conversation.participants(), set([self.contact1, self.contact2])
+        )
+
+
+    def test_conversation_only_keeps_columns_if_asked(self):
+        conversation = Conversation()
+        conversation.add_messages(self.messages)
+        conversation.columns()
+        self.assertIsNone(conversation._column_cache)
+        self.assertIsNot(conversation._columns(), conversation._columns())
+        columns = conversation.columns(keep=True)
+        self.assertIsNotNone(conversation._column_cache)
+        self.assertIs(conversation._columns(), conversation._columns())
+        columns.append("Bye", datetime(2009, 5, 24), self.contact2)
+        self.assertEqual(len(conversation.columns()), 3)
+        self.assertIsNot(conversation.columns(), conversation._column_cache)
+
+
+    def test_conversation_columns_follow_changes(self):
+        conversation = Conversation()
+        conversation.add_messages(self.messages)
+        conversation.columns(keep=True)
+        self.messages[0].text("Goodbye")
+        self.assertEqual(conversation.columns(keep=True).text(1), "Goodbye")
+        self.messages[1].sender(self.contact1)
+        self.assertEqual(conversation.columns(keep=True).sender(2), self.contact1)
+        self.messages[2].timestamp(datetime(2010, 1, 1))
+        self.assertEqual(
+         [m.text() or "" for m in conversation.columns(keep=True)],
+         ["Goodbye", "Hi ☃", ""]
+        )
+        with conversation.deferred_ordering():
+            self.messages[2].timestamp(datetime(1950, 1, 1))
+        self.assertEqual(
+         conversation.columns(keep=True).timestamp(0), datetime(1950, 1, 1)
+        )
+        conversation.remove_message(self.messages[0])
+        self.assertEqual(len(conversation.columns(keep=True)), 2)
+        conversation.add_message(
+         Message("Bye", datetime(2009, 5, 24), self.contact2)
+        )
+        self.assertEqual(conversation.columns().text(2), "Bye")
+
+
+    def test_using_columns_internally_keeps_nothing(self):
+        conversation = Conversation()
+        conversation.add_messages(self.messages)
+        log = ChatLog("Log")
+        log.add_conversation(conversation)
+        stats.message_counts(log)
+        with TemporaryDirectory() as directory:
+            log.save_binary(os.path.join(directory, "log.bin"))
+        self.assertIsNone(conversation._column_cache)
+
+
+
+class ColumnConversationTests(ColumnsTest):
+
+    def setUp(self):
+        ColumnsTest.setUp(self)
+        self.columns = MessageColumns.from_messages(
+         sorted(self.messages, key=lambda m: m.timestamp())
+        )
+        self.conversation = ColumnConversation(self.columns)
+
+
+    def test_column_conversation_needs_ordered_columns(self):
+        with self.assertRaises(TypeError):
+            ColumnConversation(self.messages)
+        with self.assertRaises(ValueError):
+            ColumnConversation(MessageColumns.from_messages(self.messages))
+
+
+    def test_can_read_without_creating_messages(self):
+        conversation = self.conversation
+        self.assertEqual(str(conversation), "<Conversation (3 messages)>")
+        self.assertEqual(len(conversation), 3)
+        self.assertEqual(
+         conversation.participants(), set([self.contact1, self.contact2])
+        )
+        self.assertEqual(
+         conversation.sender_counts(), {self.contact1: 2, self.contact2: 1}
+        )
+        self.assertEqual(
+         [m.text() or "" for m in conversation.messages()], ["", "Hello", "Hi ☃"]
+        )
+        self.assertEqual(
+         [m.text() for m in conversation.messages_between(
+          datetime(2000, 1, 1), datetime(2009, 5, 23, 12, 0, 1)
+         )], ["Hello"]
+        )
+        self.assertEqual(conversation.to_json()["messages"][1]["text"], "Hello")
+        self.assertEqual(list(conversation.columns().timestamps), list(
+         self.columns.timestamps
+        ))
+        self.assertIsNot(conversation.columns(), self.columns)
+        self.assertTrue(conversation.columns_kept())
+
+
+    def test_messages_are_created_once(self):
+        message = self.conversation.messages()[1]
+        self.assertIs(self.conversation.messages()[1], message)
+        self.assertIs(self.conversation.messages()[-2], message)
+        self.assertIs(message.conversation(), self.conversation)
+        self.assertIn(message, self.conversation.messages())
+        self.assertNotIn(self.messages[0], self.conversation.messages())
+        with self.assertRaises(IndexError):
+            self.conversation.messages()[3]
+        del message
+        gc.collect()
+        self.assertEqual(len(self.conversation._views), 0)
+
+
+    def test_changes_create_every_message(self):
+        message = self.conversation.messages()[1]
+        message.text("Goodbye")
+        self.assertFalse(self.conversation.columns_kept())
+        self.assertIs(self.conversation.messages()[1], message)
+        self.assertEqual(self.conversation.columns().text(1), "Goodbye")
+        self.assertEqual(self.conversation._timestamps, [
+         m.timestamp() for m in self.conversation.messages()
+        ])
+        self.assertEqual(len(self.columns), 3)
+        self.assertEqual(self.columns.text(1), "Hello")
+
+
+    def test_timestamp_changes_move_messages(self):
+        message = self.conversation.messages()[0]
+        message.timestamp(datetime(2010, 1, 1))
+        self.assertIs(self.conversation.messages()[2], message)
+        self.assertEqual(
+         self.conversation.messages_by(self.contact1, copy=True)[1], message
+        )
+
+
+    def test_sender_changes_move_messages(self):
+        message = self.conversation.messages()[2]
+        message.sender(self.contact1)
+        self.assertEqual(self.conversation.participants(), set([self.contact1]))
+        self.assertEqual(
+         self.conversation.messages_by(self.contact1, copy=True)[2], message
+        )
+
+
+    def test_can_add_and_remove_messages(self):
+        conversation = self.conversation
+        message = Message("Bye", datetime(2009, 5, 24), self.contact2)
+        conversation.add_message(message)
+        self.assertIs(conversation.messages()[3], message)
+        conversation.remove_message(conversation.messages()[0])
+        self.assertEqual(
+         [m.text() for m in conversation.messages()], ["Hello", "Hi ☃", "Bye"]
+        )
+
+
+    def test_loaders_create_column_conversations(self):
+        builder = ChatLogBuilder("Log")
+        for message in self.messages:
+            builder.add(
+             1, message.sender().name(), message.timestamp(),
+             message.text() or ""
+            )
+        log = builder.build()
+        conversation, = log.conversations()
+        self.assertIsInstance(conversation, ColumnConversation)
+        self.assertEqual(
+         [m.text() or "" for m in conversation.messages()], ["", "Hello", "Hi ☃"]
+        )
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, "log.bin")
+            log.save_binary(path)
+            log = load_binary(path)
+            self.assertIsInstance(
+             log.conversations(copy=True).pop(), ColumnConversation
+            )
+            del log
+
+
+    def test_column_conversations_use_much_less_memory(self):
+        contacts = [Contact(str(n)) for n in range(5)]
+        messages = [Message(
+         "Message %i" % n, datetime(2009, 1, 1, n // 3600, n // 60 % 60, n % 60),
+         contacts[n % 5]
+        ) for n in range(10000)]
+        columns = MessageColumns.from_messages(messages)
+        del messages
+        gc.collect()
+        tracemalloc.start()
+        try:
+            start = tracemalloc.get_traced_memory()[0]
+            conversation = Conversation.from_columns(columns)
+            full = tracemalloc.get_traced_memory()[0] - start
+            del conversation
+            gc.collect()
+            start = tracemalloc.get_traced_memory()[0]
+            conversation = ColumnConversation(columns.copy())
+            compact = tracemalloc.get_traced_memory()[0] - start
+        finally:
+            tracemalloc.stop()
+        self.assertLess(compact * 10, full)
@@ -1,5 +1,10 @@
+import gc
+import pickle
+from datetime import datetime
 from unittest import TestCase
-from pychats.chats.people import Contact
+from pychats.chats import people
+from pychats.chats.people import Contact, ContactRegistry, ContactScope
+from pychats.chats.messages import Message
 
 class ContactCreationTests(TestCase):
 
@@ -9,17 +14,103 @@ class ContactCreationTests(TestCase):
         self.assertEqual(contact._tags, set())
 
 
+    def test_contact_has_no_instance_dict(self):
+        contact = Contact("Marvin Goodwright")
+        with self.assertRaises(AttributeError):
+            contact.__dict__
+
+
     def test_contact_name_must_be_str(self):
         with self.assertRaises(TypeError):
             Contact(111)
 
 
     def test_creating_contact_updates_registry(self):
-        while Contact.all_contacts: Contact.all_contacts = set()
+        Contact.all_contacts = ContactRegistry()
         contact1 = Contact("Marvin Goodwright")
-        self.assertEqual(Contact.all_contacts, set([contact1]))
+        self.assertEqual(set(Contact.all_contacts), set([contact1]))
+        self.assertIs(contact1._registry, Contact.all_contacts)
         contact2 = Contact("Marvin Goodwright II")
-        self.assertEqual(Contact.all_contacts, set([contact1, contact2]))
+        self.assertEqual(set(Contact.all_contacts), set([contact1, contact2]))
+
+
+
+class ContactRegistryTests(TestCase):
+
+    def setUp(self):
+        self.registry = ContactRegistry()
+        self.contact1 = Contact("Marvin Goodwright")
+        self.contact2 = Contact("Mildred Mayhew")
+
+
+    def test_can_add_contacts_to_registry(self):
+        self.registry.add(self.contact1)
+        self.registry.add(self.contact2)
+        self.assertEqual(len(self.registry), 2)
+        self.assertIn(self.contact1, self.registry)
+        self.assertIs(self.contact1._registry, self.registry)
+        self.assertNotIn(self.contact1, Contact.all_contacts)
+
+
+    def test_can_find_contacts_by_name(self):
+        self.registry.add(self.contact1)
+        self.registry.add(self.contact2)
+        self.assertIs(self.registry.find("Mildred Mayhew"), self.contact2)
+        self.assertIsNone(self.registry.find("Spencer Splendidboots"))
+
+
+    def test_can_find_contacts_by_name_and_tags(self):
+        self.contact1.add_tag("aaa")
+        self.registry.add(self.contact1)
+        self.assertIs(self.registry.find("Marvin Goodwright", ["aaa"]), self.contact1)
+        self.assertIsNone(self.registry.find("Marvin Goodwright", []))
+
+
+    def test_renaming_contact_updates_registry(self):
+        self.registry.add(self.contact1)
+        self.contact1.name("Albus Dumbledore")
+        self.assertIsNone(self.registry.find("Marvin Goodwright"))
+        self.assertIs(self.registry.find("Albus Dumbledore"), self.contact1)
+
+
+    def test_can_remove_contacts_from_registry(self):
+        self.registry.add(self.contact1)
+        self.registry.discard(self.contact1)
+        self.assertEqual(len(self.registry), 0)
+        self.assertIsNone(self.contact1._registry)
+
+
+    def test_registry_does_not_keep_contacts_alive(self):
+        self.registry.add(self.contact1)
+        self.registry.add(self.contact2)
+        del self.contact1
+        gc.collect()
+        self.assertEqual(list(self.registry), [self.contact2])
+        self.assertIsNone(self.registry.find("Marvin Goodwright"))
+        self.assertNotIn("Marvin Goodwright", self.registry._names)
+
+
+
+class ContactScopeTests(TestCase):
+
+    def test_contacts_in_scope_go_to_scope_registry(self):
+        outer = Contact.all_contacts
+        with ContactScope() as contacts:
+            self.assertIs(Contact.all_contacts, contacts)
+            contact = Contact("Marvin Goodwright")
+        self.assertIs(Contact.all_contacts, outer)
+        self.assertIn(contact, contacts)
+        self.assertNotIn(contact, outer)
+
+
+    def test_contact_scopes_can_be_nested(self):
+        outer = Contact.all_contacts
+        scope1, scope2 = ContactScope(), ContactScope()
+        with scope1:
+            with scope2:
+                self.assertIs(Contact.all_contacts, scope2.contacts)
+            self.assertIs(Contact.all_contacts, scope1.contacts)
+        self.assertIs(Contact.all_contacts, outer)
 
 
 
@@ -81,9 +172,18 @@ class ContactTagsTests(TestCase):
 
     def test_can_get_tags(self):
         contact = Contact("Marvin Goodwright")
-        contact._tags = set(["aaa", "bbb"])
-        self.assertEqual(contact._tags, contact.tags())
-        self.assertIsNot(contact._tags, contact.tags())
+        contact._tags = frozenset(["aaa", "bbb"])
+        self.assertIs(contact._tags, contact.tags())
+
+
+    def test_can_get_copy_of_tags(self):
+        contact = Contact("Marvin Goodwright")
+        contact._tags = frozenset(["aaa", "bbb"])
+        tags = contact.tags(copy=True)
+        self.assertEqual(tags, set(["aaa", "bbb"]))
+        self.assertIsInstance(tags, set)
+        tags.add("ccc")
+        self.assertEqual(contact._tags, set(["aaa", "bbb"]))
 
 
 
@@ -97,6 +197,28 @@ class ContactTagAdditionTests(TestCase):
         self.assertEqual(contact._tags, set(["111", "222"]))
 
 
+    def test_contacts_with_same_tags_share_them(self):
+        contact1 = Contact("Marvin Goodwright")
+        contact2 = Contact("Mildred Mayhew")
+        self.assertIs(contact1._tags, contact2._tags)
+        contact1.add_tag("111")
+        contact1.add_tag("222")
+        contact2.add_tag("222")
+        contact2.add_tag("111")
+        self.assertIsInstance(contact1._tags, frozenset)
+        self.assertIs(contact1._tags, contact2._tags)
+
+
+    def test_shared_tag_sets_are_limited(self):
+        contact = Contact("Marvin Goodwright")
+        for index in range(10500):
+            contact.add_tag(str(index))
+            contact.remove_tag(str(index))
+        self.assertLessEqual(len(people._TAG_SETS), 10000)
+        self.assertIn(frozenset(), people._TAG_SETS)
+        self.assertEqual(contact.tags(), set())
+
+
     def test_tags_must_be_str(self):
         contact = Contact("Marvin Goodwright")
         with self.assertRaises(TypeError):
@@ -113,6 +235,14 @@ class ContactTagRemovalTests(TestCase):
         self.assertEqual(contact._tags, set(["bbb"]))
 
 
+    def test_cannot_remove_missing_tag(self):
+        contact = Contact("Marvin Goodwright")
+        contact.add_tag("aaa")
+        with self.assertRaises(KeyError):
+            contact.remove_tag("bbb")
+        self.assertEqual(contact._tags, set(["aaa"]))
+
+
 
 class ContactToJsonTests(TestCase):
 
@@ -139,3 +269,28 @@ class ContactToJsonTests(TestCase):
         self.assertEqual(json, {
          "name": "Lord Asriel", "tags": ["aaa", "ddd", "zzz"]
         })
+
+
+
+class ContactPicklingTests(TestCase):
+
+    def test_can_pickle_contact(self):
+        contact = Contact("Marvin Goodwright")
+        contact.add_tag("111")
+        with ContactScope() as contacts:
+            copy = pickle.loads(pickle.dumps(contact))
+        self.assertIsNot(copy, contact)
+        self.assertEqual(copy.to_json(), contact.to_json())
+        self.assertIs(copy.tags(), contact.tags())
+        self.assertIn(copy, contacts)
+        self.assertIs(contacts.find("Marvin Goodwright"), copy)
+        self.assertIn(contact, Contact.all_contacts)
+
+
+    def test_can_pickle_message(self):
+        message = Message(
+         "Hello", datetime(2009, 5, 23, 12, 0), Contact("Marvin Goodwright")
+        )
+        copy = pickle.loads(pickle.dumps(message))
+        self.assertEqual(copy.to_json(), message.to_json())
+        self.assertIn(copy.sender(), Contact.all_contacts)
@@ -1,9 +1,10 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from unittest import TestCase
 from unittest.mock import Mock, patch
 from pychats.chats.conversations import Conversation, _sort_messages
 from pychats.chats.people import Contact
 from pychats.chats.messages import Message
+from pychats.chats.views import SequenceView, SetView
 
 class ConversationTest(TestCase):
 
@@ -22,28 +23,37 @@ class ConversationCreationTests(ConversationTest):
     def test_can_create_conversation(self):
         conversation = Conversation()
         self.assertEqual(conversation._messages, [])
+        self.assertEqual(conversation._timestamps, [])
+        self.assertEqual(conversation._message_set, set())
         self.assertEqual(conversation._chatlog, None)
 
 
 
 class ConversationFromJsonTests(TestCase):
 
-    @patch("pychats.chats.conversations._sort_messages")
     @patch("pychats.chats.conversations.Message.from_json")
-    def test_can_create_conversation_from_json(self, mock_message, mock_sort):
-        message1, message2, message3 = Mock(), Mock(), Mock()
+    def test_can_create_conversation_from_json(self, mock_message):
+        message1, message2, message3 = [Mock(Message) for _ in range(3)]
+        for day, message in zip([3, 1, 2], [message1, message2, message3]):
+            message.timestamp.return_value = datetime(2009, 5, day)
         mock_message.side_effect = [message1, message2, message3]
         json = {
          "messages": ["message1", "message2", "message3"]
         }
-        mock_sort.side_effect = lambda k: k
         conversation = Conversation.from_json(json)
-        mock_message.assert_any_call("message1")
-        mock_message.assert_any_call("message2")
-        mock_message.assert_any_call("message3")
+        mock_message.assert_any_call("message1", None)
+        mock_message.assert_any_call("message2", None)
+        mock_message.assert_any_call("message3", None)
         self.assertIsInstance(conversation, Conversation)
-        self.assertEqual(conversation._messages, [message1, message2, message3])
-        mock_sort.assert_called_with([message1, message2, message3])
+        self.assertEqual(conversation._messages, [message2, message3, message1])
+        self.assertEqual(conversation._timestamps, [
+         datetime(2009, 5, 1), datetime(2009, 5, 2), datetime(2009, 5, 3)
+        ])
+        self.assertEqual(
+         conversation._message_set, set([message1, message2, message3])
+        )
+        for message in (message1, message2, message3):
+            self.assertIs(message._conversation, conversation)
 
 
     def test_json_to_conversation_requires_dict(self):
@@ -100,6 +110,28 @@ class ConversationMessagesTests(ConversationTest):
         self.assertIsNot(conversation._messages, conversation.messages())
 
 
+    def test_messages_are_a_read_only_view(self):
+        conversation = Conversation()
+        conversation.add_messages(self.messages[:3])
+        messages = conversation.messages()
+        self.assertIsInstance(messages, SequenceView)
+        self.assertIs(messages._items, conversation._messages)
+        conversation.add_messages(self.messages[3:])
+        self.assertEqual(messages, self.messages)
+        with self.assertRaises(TypeError):
+            messages[0] = self.messages[1]
+
+
+    def test_can_get_copy_of_messages(self):
+        conversation = Conversation()
+        conversation.add_messages(self.messages)
+        messages = conversation.messages(copy=True)
+        self.assertIsInstance(messages, list)
+        self.assertEqual(messages, self.messages)
+        messages.pop()
+        self.assertEqual(conversation.length(), 5)
+
+
 
 class ConversationMessageAdditionTests(ConversationTest):
 
@@ -143,6 +175,91 @@ class ConversationMessageAdditionTests(ConversationTest):
         self.assertEqual(conversation._messages, self.messages[:3] + [self.messages[-1]])
         conversation.add_message(self.messages[3])
         self.assertEqual(conversation._messages, self.messages)
+        self.assertEqual(
+         conversation._timestamps, [m.timestamp() for m in self.messages]
+        )
+        self.assertEqual(conversation._message_set, set(self.messages))
+
+
+    def test_messages_with_same_timestamp_keep_order_added(self):
+        conversation = Conversation()
+        for message in self.messages:
+            message.timestamp.return_value = datetime(2009, 5, 1)
+        for message in self.messages[::-1]:
+            conversation.add_message(message)
+        self.assertEqual(conversation._messages, self.messages[::-1])
+
+
+
+class ConversationBulkMessageAdditionTests(ConversationTest):
+
+    def test_can_add_messages_in_bulk(self):
+        conversation = Conversation()
+        conversation.add_messages(self.messages[::-1])
+        self.assertEqual(conversation._messages, self.messages)
+        self.assertEqual(
+         conversation._timestamps, [m.timestamp() for m in self.messages]
+        )
+        self.assertEqual(conversation._message_set, set(self.messages))
+        for message in self.messages:
+            self.assertIs(message._conversation, conversation)
+
+
+    def test_bulk_messages_are_merged_with_existing_messages(self):
+        conversation = Conversation()
+        conversation.add_messages([self.messages[0], self.messages[3]])
+        conversation.add_messages(iter([self.messages[4], self.messages[1]]))
+        conversation.add_message(self.messages[2])
+        self.assertEqual(conversation._messages, self.messages)
+
+
+    def test_bulk_messages_are_appended_after_existing_messages(self):
+        conversation = Conversation()
+        conversation.add_messages(self.messages[:2])
+        conversation.add_messages(self.messages[2:])
+        self.assertEqual(conversation._messages, self.messages)
+
+
+    @patch("pychats.chats.conversations.Conversation._index_senders")
+    def test_bulk_messages_are_only_reindexed_when_merged(self, mock_index):
+        conversation = Conversation()
+        conversation.add_messages(self.messages[1:3])
+        conversation.add_messages(self.messages[3:])
+        self.assertFalse(mock_index.called)
+        self.assertEqual(
+         conversation.messages_by(self.senders[0], copy=True), [self.messages[3]]
+        )
+        conversation.add_messages(self.messages[:1])
+        self.assertEqual(mock_index.call_count, 1)
+
+
+    def test_bulk_messages_with_same_timestamp_come_after_existing(self):
+        conversation = Conversation()
+        for message in self.messages:
+            message.timestamp.return_value = datetime(2009, 5, 1)
+        conversation.add_messages(self.messages[2:4])
+        conversation.add_messages([self.messages[4]] + self.messages[:2])
+        self.assertEqual(
+         conversation._messages,
+         self.messages[2:4] + [self.messages[4]] + self.messages[:2]
+        )
+
+
+    def test_can_only_add_messages_in_bulk(self):
+        conversation = Conversation()
+        with self.assertRaises(TypeError):
+            conversation.add_messages([self.messages[0], "Some message"])
+        self.assertEqual(conversation._messages, [])
+
+
+    def test_cannot_add_messages_already_present_in_bulk(self):
+        conversation = Conversation()
+        conversation.add_message(self.messages[0])
+        with self.assertRaises(ValueError):
+            conversation.add_messages(self.messages[:2])
+        with self.assertRaises(ValueError):
+            conversation.add_messages([self.messages[1], self.messages[1]])
+        self.assertEqual(conversation._messages, [self.messages[0]])
 
 
 
@@ -163,6 +280,26 @@ class ConversationMessageRemovalTests(ConversationTest):
         )
 
 
+    def test_can_remove_messages_with_same_timestamp(self):
+        conversation = Conversation()
+        for message in self.messages:
+            message.timestamp.return_value = datetime(2009, 5, 1)
+            conversation.add_message(message)
+        conversation.remove_message(self.messages[2])
+        self.assertEqual(
+         conversation._messages, self.messages[:2] + self.messages[3:]
+        )
+        self.assertEqual(len(conversation._timestamps), 4)
+        self.assertNotIn(self.messages[2], conversation._message_set)
+
+
+    def test_cannot_remove_message_not_in_conversation(self):
+        conversation = Conversation()
+        conversation.add_message(self.messages[0])
+        with self.assertRaises(ValueError):
+            conversation.remove_message(self.messages[1])
+
+
     def test_removing_messages_resets_message_conversation_to_none(self):
         conversation = Conversation()
         conversation.add_message(self.messages[0])
@@ -224,6 +361,401 @@ class ConversationParticipantTests(ConversationTest):
 
 
 
+    def test_participants_are_updated_when_messages_removed(self):
+        conversation = Conversation()
+        conversation.add_messages(self.messages)
+        conversation.remove_message(self.messages[1])
+        self.assertEqual(conversation.participants(), set(self.senders[0:3]))
+        conversation.remove_message(self.messages[4])
+        self.assertEqual(
+         conversation.participants(), set([self.senders[0], self.senders[2]])
+        )
+
+
+    def test_participants_are_not_the_index(self):
+        conversation = Conversation()
+        conversation.add_message(self.messages[0])
+        self.assertIsNot(conversation.participants(), conversation._participants)
+
+
+    def test_participants_are_a_read_only_view(self):
+        conversation = Conversation()
+        participants = conversation.participants()
+        self.assertIsInstance(participants, SetView)
+        conversation.add_message(self.messages[0])
+        self.assertEqual(participants, set([self.senders[0]]))
+        copy = conversation.participants(copy=True)
+        self.assertIsInstance(copy, set)
+        copy.add(self.senders[1])
+        self.assertEqual(participants, set([self.senders[0]]))
+
+
+
+class ConversationSenderCountTests(ConversationTest):
+
+    def test_can_get_sender_counts(self):
+        conversation = Conversation()
+        self.assertEqual(conversation.sender_counts(), {})
+        conversation.add_messages(self.messages[:4])
+        conversation.add_message(self.messages[4])
+        self.assertEqual(conversation.sender_counts(), {
+         self.senders[0]: 2, self.senders[1]: 2, self.senders[2]: 1
+        })
+        conversation.remove_message(self.messages[0])
+        self.assertEqual(conversation.sender_counts(), {
+         self.senders[0]: 1, self.senders[1]: 2, self.senders[2]: 1
+        })
+
+
+
+class ConversationSenderIndexTests(ConversationTest):
+
+    def setUp(self):
+        ConversationTest.setUp(self)
+        self.conversation = Conversation()
+
+
+    def check_index(self):
+        for sender, (messages, timestamps) in self.conversation._participants.items():
+            self.assertEqual(messages, [
+             m for m in self.conversation._messages if m.sender() is sender
+            ])
+            self.assertEqual(timestamps, [m.timestamp() for m in messages])
+
+
+    def test_can_get_messages_by_sender(self):
+        self.conversation.add_messages(self.messages[2:])
+        self.conversation.add_message(self.messages[0])
+        messages = self.conversation.messages_by(self.senders[0])
+        self.assertIsInstance(messages, SequenceView)
+        self.assertEqual(messages, [self.messages[0], self.messages[3]])
+        self.assertEqual(
+         self.conversation.messages_by(self.senders[2]), [self.messages[2]]
+        )
+        self.assertEqual(self.conversation.messages_by(self.senders[4]), [])
+        self.conversation.add_messages(self.messages[1:2])
+        self.assertEqual(
+         messages, [self.messages[0], self.messages[3]]
+        )
+        self.check_index()
+
+
+    def test_can_get_copy_of_messages_by_sender(self):
+        self.conversation.add_messages(self.messages)
+        messages = self.conversation.messages_by(self.senders[1], copy=True)
+        self.assertEqual(messages, [self.messages[1], self.messages[4]])
+        messages.pop()
+        self.assertEqual(len(self.conversation.messages_by(self.senders[1])), 2)
+
+
+    def test_index_is_updated_when_messages_removed(self):
+        self.conversation.add_messages(self.messages)
+        self.conversation.remove_message(self.messages[3])
+        self.assertEqual(
+         self.conversation.messages_by(self.senders[0]), [self.messages[0]]
+        )
+        self.conversation.remove_message(self.messages[2])
+        self.assertNotIn(self.senders[2], self.conversation._participants)
+        self.check_index()
+
+
+    def test_index_is_updated_when_timestamps_change(self):
+        self.conversation.add_messages(self.messages)
+        old = self.messages[0].timestamp.return_value
+        self.messages[0].timestamp.return_value = datetime(2009, 5, 10)
+        self.conversation._move_message(self.messages[0], old)
+        self.assertEqual(
+         self.conversation.messages_by(self.senders[0]),
+         [self.messages[3], self.messages[0]]
+        )
+        self.check_index()
+
+
+    def test_index_is_updated_when_sender_changes(self):
+        self.conversation.add_messages(self.messages)
+        self.messages[1].sender.return_value = self.senders[0]
+        self.conversation._change_sender(self.messages[1], self.senders[1])
+        self.assertEqual(self.conversation.messages_by(self.senders[0]), [
+         self.messages[0], self.messages[1], self.messages[3]
+        ])
+        self.assertEqual(
+         self.conversation.messages_by(self.senders[1]), [self.messages[4]]
+        )
+        self.check_index()
+
+
+    def test_index_is_rebuilt_after_deferred_ordering(self):
+        self.conversation.add_messages(self.messages)
+        messages = self.conversation.messages_by(self.senders[0])
+        with self.conversation.deferred_ordering():
+            for index in (0, 3):
+                old = self.messages[index].timestamp.return_value
+                self.messages[index].timestamp.return_value = datetime(
+                 2009, 5, 10 - index
+                )
+                self.conversation._move_message(self.messages[index], old)
+            self.assertEqual(
+             self.conversation.messages_by(self.senders[0]),
+             [self.messages[3], self.messages[0]]
+            )
+        self.assertEqual(messages, [self.messages[3], self.messages[0]])
+        self.check_index()
+
+
+    def test_index_keeps_conversation_order_for_ties(self):
+        alice, bob = Contact("Alice"), Contact("Bob")
+        time = datetime(2009, 5, 23)
+        messages = [Message(str(i), time, alice) for i in range(4)]
+        self.conversation.add_messages(messages)
+        for message, sender in zip(messages, (bob, alice, bob, alice)):
+            message.sender(sender)
+        self.check_index()
+        messages[0].sender(alice)
+        messages[3].sender(bob)
+        self.check_index()
+        messages[1].timestamp(time - timedelta(hours=1))
+        messages[1].timestamp(time)
+        messages[0].sender(bob)
+        self.check_index()
+        self.assertEqual(
+         self.conversation.messages_by(bob),
+         [m for m in self.conversation.messages() if m.sender() is bob]
+        )
+
+
+    def test_views_of_senders_without_messages_stay_current(self):
+        alice = Contact("Alice")
+        message = Message("Hello", datetime(2009, 5, 23), alice)
+        later = self.conversation.messages_by(alice)
+        self.conversation.add_message(message)
+        self.assertEqual(later, [message])
+        self.conversation.remove_message(message)
+        self.assertEqual(later, [])
+        self.assertNotIn(alice, self.conversation.participants())
+        self.conversation.add_message(message)
+        self.assertEqual(later, [message])
+        self.assertEqual(self.conversation.participants(), {alice})
+        self.assertEqual(self.conversation.sender_counts(), {alice: 1})
+
+
+    def test_senders_without_messages_are_only_kept_for_views(self):
+        alice, bob = Contact("Alice"), Contact("Bob")
+        message = Message("Hello", datetime(2009, 5, 23), alice)
+        self.assertEqual(self.conversation.messages_by(bob), [])
+        self.assertNotIn(bob, self.conversation._senders)
+        self.conversation.add_message(message)
+        message.sender(bob)
+        view = self.conversation.messages_by(alice)
+        self.assertIn(alice, self.conversation._senders)
+        del view
+        self.assertNotIn(alice, self.conversation._senders)
+        self.assertEqual(self.conversation.messages_by(bob), [message])
+
+
+    def test_can_only_get_messages_by_contacts(self):
+        with self.assertRaises(TypeError):
+            self.conversation.messages_by("Alice")
+        with self.assertRaises(TypeError):
+            self.conversation.messages_by(None, copy=True)
+
+
+
+class ConversationMessageMovingTests(ConversationTest):
+
+    def setUp(self):
+        ConversationTest.setUp(self)
+        self.conversation = Conversation()
+        self.conversation.add_messages(self.messages)
+
+
+    def move(self, index, day):
+        old = self.messages[index].timestamp.return_value
+        self.messages[index].timestamp.return_value = datetime(2009, 5, day, 12)
+        self.conversation._move_message(self.messages[index], old)
+
+
+    def test_can_move_message_to_new_position(self):
+        self.move(4, 2)
+        self.assertEqual(self.conversation._messages, [
+         self.messages[0], self.messages[1], self.messages[4],
+         self.messages[2], self.messages[3]
+        ])
+        self.assertEqual(self.conversation._timestamps, [
+         m.timestamp() for m in self.conversation._messages
+        ])
+        self.move(1, 30)
+        self.assertEqual(self.conversation._messages[-1], self.messages[1])
+
+
+    @patch("pychats.chats.conversations._sort_messages")
+    def test_moving_message_does_not_resort(self, mock_sort):
+        self.move(0, 10)
+        mock_sort.assert_not_called()
+
+
+    def test_ordering_can_be_deferred(self):
+        with self.conversation.deferred_ordering():
+            self.move(0, 10)
+            self.move(1, 9)
+            self.assertEqual(self.conversation._messages, self.messages)
+            with self.conversation.deferred_ordering():
+                self.move(2, 8)
+            self.assertEqual(self.conversation._messages, self.messages)
+            self.conversation.remove_message(self.messages[3])
+        self.assertEqual(self.conversation._messages, [
+         self.messages[4], self.messages[2], self.messages[1], self.messages[0]
+        ])
+        self.assertEqual(self.conversation._timestamps, [
+         m.timestamp() for m in self.conversation._messages
+        ])
+        self.move(4, 30)
+        self.assertEqual(self.conversation._messages[-1], self.messages[4])
+
+
+
+class ConversationTimeRangeTests(ConversationTest):
+
+    def setUp(self):
+        ConversationTest.setUp(self)
+        self.conversation = Conversation()
+        self.conversation.add_messages(self.messages)
+
+
+    def test_can_get_messages_between_times(self):
+        messages = self.conversation.messages_between(
+         datetime(2009, 5, 2, 12), datetime(2009, 5, 4, 12)
+        )
+        self.assertIsInstance(messages, SequenceView)
+        self.assertIs(messages._items, self.conversation._messages)
+        self.assertEqual(list(messages), self.messages[1:3])
+        self.assertEqual(list(self.conversation.messages_between(
+         datetime(2009, 5, 2), datetime(2009, 5, 4, 13)
+        )), self.messages[1:4])
+        self.assertEqual(list(self.conversation.messages_between(
+         datetime(2009, 5, 4), datetime(2009, 5, 2)
+        )), [])
+
+
+    def test_range_can_be_open_ended(self):
+        self.assertEqual(
+         list(self.conversation.messages_between()), self.messages
+        )
+        self.assertEqual(list(self.conversation.messages_between(
+         start=datetime(2009, 5, 3, 12)
+        )), self.messages[2:])
+        self.assertEqual(list(self.conversation.messages_between(
+         end=datetime(2009, 5, 3, 12)
+        )), self.messages[:2])
+
+
+    def test_range_works_while_ordering_is_deferred(self):
+        with self.conversation.deferred_ordering():
+            old = self.messages[0].timestamp.return_value
+            self.messages[0].timestamp.return_value = datetime(2009, 5, 10)
+            self.conversation._move_message(self.messages[0], old)
+            self.assertEqual(list(self.conversation.messages_between(
+             datetime(2009, 5, 4, 12)
+            )), [self.messages[3], self.messages[4], self.messages[0]])
+
+
+    def test_range_must_be_datetimes(self):
+        with self.assertRaises(TypeError):
+            self.conversation.messages_between("2009-05-01")
+        with self.assertRaises(TypeError):
+            Conversation().messages_between(end=1)
+
+
+
+class ConversationViewChangeTests(TestCase):
+
+    def setUp(self):
+        self.sam, self.bob = Contact("Sam"), Contact("Bob")
+        self.messages = [Message(
+         str(i), datetime(2009, 5, 1, i), self.sam if i % 2 else self.bob
+        ) for i in range(10)]
+        self.conversation = Conversation()
+        self.conversation.add_messages(self.messages)
+
+
+    def test_changing_timestamps_while_iterating_raises(self):
+        with self.assertRaises(RuntimeError):
+            for message in self.conversation.messages():
+                message.timestamp(message.timestamp() + timedelta(hours=1))
+        self.assertEqual(
+         [m.timestamp().hour for m in self.conversation.messages()],
+         [1, 1, 2, 3, 4, 5, 6, 7, 8, 9]
+        )
+
+
+    def test_removing_messages_while_iterating_raises(self):
+        with self.assertRaises(RuntimeError):
+            for message in self.conversation.messages():
+                self.conversation.remove_message(message)
+        self.assertEqual(self.conversation.length(), 9)
+
+
+    def test_changing_senders_while_iterating_raises(self):
+        with self.assertRaises(RuntimeError):
+            for message in self.conversation.messages_by(self.sam):
+                message.sender(self.bob)
+        self.assertEqual(len(self.conversation.messages_by(self.sam)), 4)
+
+
+    def test_changing_messages_through_a_copy_is_safe(self):
+        for message in self.conversation.messages(copy=True):
+            message.timestamp(message.timestamp() + timedelta(hours=1))
+        self.assertEqual(
+         [m.text() for m in self.conversation.messages()],
+         [str(i) for i in range(10)]
+        )
+        self.assertEqual(
+         [m.timestamp().hour for m in self.conversation.messages()],
+         list(range(1, 11))
+        )
+        for message in self.conversation.messages_by(self.sam, copy=True):
+            message.sender(self.bob)
+        self.assertEqual(self.conversation.messages_by(self.sam), [])
+        for message in self.conversation.messages(copy=True):
+            self.conversation.remove_message(message)
+        self.assertEqual(self.conversation.length(), 0)
+
+
+    def test_changing_timestamps_with_deferred_ordering_is_safe(self):
+        with self.conversation.deferred_ordering():
+            for message in self.conversation.messages():
+                message.timestamp(message.timestamp() + timedelta(hours=1))
+        self.assertEqual(
+         [m.timestamp().hour for m in self.conversation.messages()],
+         list(range(1, 11))
+        )
+
+
+    def test_changing_other_things_while_iterating_is_safe(self):
+        for message in self.conversation.messages():
+            message.sender(self.sam)
+            message.text("new " + message.text())
+        self.assertEqual(self.conversation.participants(), set([self.sam]))
+
+
+    def test_range_views_check_for_changes(self):
+        messages = self.conversation.messages_between(
+         datetime(2009, 5, 1, 2), datetime(2009, 5, 1, 5)
+        )
+        self.assertEqual(len(messages), 3)
+        self.conversation.remove_message(self.messages[0])
+        for use in (len, list, lambda m: m[0], lambda m: m[1:]):
+            with self.assertRaises(RuntimeError):
+                use(messages)
+        whole = self.conversation.messages()
+        part = whole[2:4]
+        self.assertEqual(len(whole), 9)
+        self.conversation.add_message(self.messages[0])
+        self.assertEqual(len(whole), 10)
+        with self.assertRaises(RuntimeError):
+            list(part)
+
+
+
 class SortMessagesTests(ConversationTest):
 
     def test_can_sort_messages(self):
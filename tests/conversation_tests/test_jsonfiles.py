@@ -0,0 +1,89 @@
+from io import StringIO, BytesIO
+from unittest import TestCase
+from pychats.chats.jsonfiles import JsonItemReader
+
+class JsonItemReaderTests(TestCase):
+
+    def read(self, text, chunk_size=65536):
+        reader = JsonItemReader(StringIO(text), chunk_size=chunk_size)
+        return list(reader), reader
+
+
+    def test_can_read_top_level_items(self):
+        items, reader = self.read('{"name": "Log", "count": 12345, "a": [1, 2]}')
+        self.assertEqual(items, [("name", "Log"), ("count", 12345), ("a", [1, 2])])
+        self.assertEqual(reader.keys, set(["name", "count", "a"]))
+
+
+    def test_conversations_are_yielded_individually(self):
+        items, reader = self.read(
+         '{"name": "Log", "conversations": [{"messages": []}, {"messages": [1]}]}'
+        )
+        self.assertEqual(items, [
+         ("name", "Log"),
+         ("conversations", {"messages": []}),
+         ("conversations", {"messages": [1]})
+        ])
+
+
+    def test_empty_conversations_are_still_recorded(self):
+        items, reader = self.read('{"conversations": [ ], "name": "Log"}')
+        self.assertEqual(items, [("name", "Log")])
+        self.assertIn("conversations", reader.keys)
+
+
+    def test_values_can_span_chunks(self):
+        text = ('{"name": "A long name", "number": 1234567890, "conversations": '
+         '[{"messages": ["aaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaa"]},\n {"x": "y"}]}')
+        for chunk_size in (1, 2, 3, 7, 16):
+            items, reader = self.read(text, chunk_size)
+            self.assertEqual(items, [
+             ("name", "A long name"),
+             ("number", 1234567890),
+             ("conversations", {"messages": ["aaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaa"]}),
+             ("conversations", {"x": "y"})
+            ])
+
+
+    def test_empty_object(self):
+        self.assertEqual(self.read(" {} ")[0], [])
+
+
+    def test_top_level_must_be_object(self):
+        with self.assertRaises(TypeError):
+            self.read('[1, 2, 3]')
+
+
+    def test_truncated_json_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            self.read('{"name": "Log", "conversations": [{"messages": [')
+        with self.assertRaises(ValueError):
+            self.read('{"name": "Log" "conversations": []}')
+
+
+    def test_can_read_bytes_in_any_chunks(self):
+        text = '{"name": "Log \u2603", "conversations": [{"a": "\u00e9\u2603"}]}'
+        for chunk_size in (1, 2, 3, 7, 65536):
+            reader = JsonItemReader(BytesIO(text.encode()), chunk_size)
+            self.assertEqual(list(reader), [
+             ("name", "Log \u2603"), ("conversations", {"a": "\u00e9\u2603"})
+            ])
+
+
+    def test_truncated_bytes_are_an_error(self):
+        with self.assertRaises(ValueError):
+            list(JsonItemReader(BytesIO('{"name": "\u2603'.encode()[:-1])))
+
+
+    def test_conversation_spans_are_recorded(self):
+        text = '{"name": "☃", "conversations": [ {"a": "é"} ,\n{"b": [1]}]}'
+        expected = ['{"a": "é"}', '{"b": [1]}']
+        for source, f in ((text, StringIO), (text.encode(), BytesIO)):
+            for chunk_size in (1, 3, 65536):
+                reader, spans = JsonItemReader(f(source), chunk_size), []
+                for key, value in reader:
+                    if key == "conversations": spans.append(reader.span)
+                slices = [source[start:end] for start, end in spans]
+                if isinstance(source, bytes):
+                    slices = [s.decode() for s in slices]
+                self.assertEqual(slices, expected)
@@ -0,0 +1,65 @@
+import os
+from tempfile import mkstemp
+from unittest import TestCase
+from pychats.chats.mapping import map_file, decode_text, replace_file
+
+class FileMappingTests(TestCase):
+
+    def make_file(self, data):
+        handle, path = mkstemp()
+        os.write(handle, data)
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        return path
+
+
+    def test_can_map_file(self):
+        path = self.make_file(b"<div>\xe2\x98\x83</div>")
+        with map_file(path) as mapped:
+            self.assertEqual(mapped[5:8], b"\xe2\x98\x83")
+            self.assertEqual(mapped.find(b"</div>"), 8)
+            self.assertEqual(mapped.read(5), b"<div>")
+        with self.assertRaises(ValueError):
+            mapped[0:1]
+
+
+    def test_can_map_empty_file(self):
+        path = self.make_file(b"")
+        with map_file(path) as mapped:
+            self.assertEqual(mapped, b"")
+            self.assertEqual(mapped.read(100), b"")
+
+
+    def test_can_replace_file(self):
+        path = self.make_file(b"old")
+        os.chmod(path, 0o640)
+        with map_file(path) as mapped:
+            with replace_file(path, "wb") as f:
+                f.write(b"new")
+            self.assertEqual(mapped[:], b"old")
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b"new")
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o640)
+        self.assertEqual(os.listdir(os.path.dirname(path)).count(
+         os.path.basename(path)
+        ), 1)
+
+
+    def test_failed_replacement_leaves_file_alone(self):
+        path = self.make_file(b"old")
+        before = set(os.listdir(os.path.dirname(path)))
+        with self.assertRaises(KeyError):
+            with replace_file(path) as f:
+                f.write("new")
+                raise KeyError
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b"old")
+        self.assertEqual(set(os.listdir(os.path.dirname(path))), before)
+
+
+    def test_can_decode_text(self):
+        self.assertEqual(decode_text(b"\xe2\x98\x83"), "☃")
+
+
+    def test_decoding_translates_newlines(self):
+        self.assertEqual(decode_text(b"a\r\nb\rc\n"), "a\nb\nc\n")
@@ -1,7 +1,7 @@
 from datetime import datetime
 from unittest import TestCase
 from unittest.mock import Mock, patch
-from pychats.chats.people import Contact
+from pychats.chats.people import Contact, ContactRegistry
 from pychats.chats.messages import Message
 from pychats.chats.conversations import Conversation
 
@@ -27,6 +27,14 @@ class MessageCreationTests(MessageTest):
         self.assertEqual(message._conversation, None)
 
 
+    def test_message_has_no_instance_dict(self):
+        message = Message(
+         "memento mori", datetime(2011, 3, 1, 12, 34, 32), self.contact1
+        )
+        with self.assertRaises(AttributeError):
+            message.__dict__
+
+
     def test_text_must_be_str(self):
         with self.assertRaises(TypeError):
             message = Message(
@@ -61,8 +69,11 @@ class MessageFromJsonTests(TestCase):
          "timestamp": "2009-05-23 12:12:01",
          "sender": {"name": "Justin Powers", "tags": ["tag1", "tag2"]}
         }
-        Contact.all_contacts = set([contact1, contact2])
-        message = Message.from_json(json)
+        contacts = ContactRegistry()
+        for contact in (contact1, contact2):
+            contact._registry = None
+            contacts.add(contact)
+        message = Message.from_json(json, contacts)
         self.assertEqual(message._text, "message text")
         self.assertEqual(message._timestamp, datetime(2009, 5, 23, 12, 12, 1))
         self.assertIs(message._sender, contact1)
@@ -75,20 +86,37 @@ class MessageFromJsonTests(TestCase):
         contact2 = Mock(Contact)
         contact2.name.return_value = "Lydia Powers"
         contact3 = Mock(Contact)
+        contact3.name.return_value = "Marvin Powers"
         mock_contact.return_value = contact3
         json = {
          "text": "message text",
          "timestamp": "2009-05-23 12:12:01",
          "sender": {"name": "Marvin Powers", "tags": ["tag1", "tag2"]}
         }
-        Contact.all_contacts = set([contact1, contact2])
-        message = Message.from_json(json)
+        contacts = ContactRegistry()
+        for contact in (contact1, contact2, contact3):
+            contact._registry = None
+        contacts.add(contact1)
+        contacts.add(contact2)
+        message = Message.from_json(json, contacts)
         mock_contact.assert_called()
+        self.assertIs(contacts.find("Marvin Powers"), contact3)
         self.assertEqual(message._text, "message text")
         self.assertEqual(message._timestamp, datetime(2009, 5, 23, 12, 12, 1))
         self.assertIs(message._sender, contact3)
 
 
+    def test_message_from_json_uses_all_contacts_by_default(self):
+        contact = Contact("Unique Justin Powers")
+        json = {
+         "text": "message text",
+         "timestamp": "2009-05-23 12:12:01",
+         "sender": {"name": "Unique Justin Powers", "tags": []}
+        }
+        message = Message.from_json(json)
+        self.assertIs(message._sender, contact)
+
+
     def test_json_to_message_requires_dict(self):
         with self.assertRaises(TypeError):
             Message.from_json("some string")
@@ -176,15 +204,15 @@ class MessageTimestampTests(MessageTest):
             message.timestamp(datetime(2012, 1, 19, 9, 23, 56).date())
 
 
-    @patch("pychats.chats.conversations._sort_messages")
-    def test_updating_timestamp_will_make_message_rearrange_in_conversation(self, mock_sort):
+    def test_updating_timestamp_will_make_message_rearrange_in_conversation(self):
         message = Message(
          "memento mori", datetime(2011, 3, 1, 12, 34, 32), self.contact1
         )
         message._conversation = Mock(Conversation)
-        message._conversation._messages = [message]
         message.timestamp(datetime(2012, 1, 19, 9, 23, 56))
-        mock_sort.assert_called_with([message])
+        message._conversation._move_message.assert_called_with(
+         message, datetime(2011, 3, 1, 12, 34, 32)
+        )
 
 
 
@@ -206,6 +234,17 @@ class MessageSenderTests(MessageTest):
         self.assertEqual(message._sender, self.contact2)
 
 
+    def test_updating_sender_updates_conversation_participants(self):
+        message = Message(
+         "memento mori", datetime(2011, 3, 1, 12, 34, 32), self.contact1
+        )
+        message._conversation = Mock(Conversation)
+        message.sender(self.contact2)
+        message._conversation._change_sender.assert_called_with(
+         message, self.contact1
+        )
+
+
     def test_new_sender_must_be_contact(self):
         message = Message(
          "memento mori", datetime(2011, 3, 1, 12, 34, 32), self.contact1
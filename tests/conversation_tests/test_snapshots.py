@@ -0,0 +1,77 @@
+import struct
+from datetime import datetime
+from io import BytesIO
+from unittest import TestCase
+from pychats.chats.people import Contact
+from pychats.chats.columns import MessageColumns
+from pychats.chats.snapshots import write_snapshot, read_snapshot, read_columns
+
+class SnapshotTests(TestCase):
+
+    def setUp(self):
+        self.sam, self.bob = Contact("Sam ☃"), Contact("Bob")
+        self.sam.add_tag("me")
+        self.sam.add_tag("a")
+        self.columns1 = MessageColumns()
+        self.columns1.append("Hello é", datetime(2017, 1, 1, 9, 0, 0, 5), self.sam)
+        self.columns1.append("", datetime(1942, 1, 1), self.bob)
+        self.columns1.append("\ud800 x", datetime(2017, 1, 2), self.sam)
+        self.columns2 = MessageColumns()
+        self.columns2.append("Hi", datetime(2018, 1, 1), self.bob)
+
+
+    def write(self, name, conversations):
+        f = BytesIO()
+        write_snapshot(name, conversations, f)
+        return f.getvalue()
+
+
+    def test_can_write_and_read_snapshot(self):
+        data = self.write("Log", [self.columns1, self.columns2, MessageColumns()])
+        self.assertEqual(data[:8], b"PYCHATSB")
+        self.assertEqual(len(data) % 8, 0)
+        name, contacts, locations = read_snapshot(data)
+        self.assertEqual(name, "Log")
+        self.assertEqual([c.name() for c in contacts], ["Sam ☃", "Bob"])
+        self.assertEqual(contacts[0].tags(), set(["me", "a"]))
+        self.assertIs(contacts[0]._registry, contacts[1]._registry)
+        self.assertEqual(len(locations), 3)
+        columns = read_columns(data, locations[0], contacts)
+        self.assertEqual(
+         [(m.text(), m.timestamp(), m.sender().name()) for m in columns],
+         [(m.text(), m.timestamp(), m.sender().name()) for m in self.columns1]
+        )
+        self.assertEqual(columns.senders, self.columns1.senders)
+        columns.append("New", datetime(2019, 1, 1), contacts[1])
+        self.assertEqual(columns.senders[-1], 1)
+        columns = read_columns(data, locations[1], contacts)
+        self.assertEqual(columns.contacts, [contacts[1]])
+        self.assertEqual(columns.text(0), "Hi")
+        self.assertEqual(len(read_columns(data, locations[2], contacts)), 0)
+
+
+    def test_columns_are_aligned(self):
+        data = self.write("Logé", [self.columns2, self.columns1])
+        locations = read_snapshot(data)[2]
+        for location in locations:
+            self.assertEqual(location[3] % 8, 0)
+
+
+    def test_snapshot_must_have_magic_bytes(self):
+        for data in (b"", b"PYCHATS", b"NOTCHATS" + bytes(100)):
+            with self.assertRaises(ValueError):
+                read_snapshot(data)
+
+
+    def test_snapshot_must_be_supported_version(self):
+        data = bytearray(self.write("Log", [self.columns1]))
+        struct.pack_into("<I", data, 8, 99)
+        with self.assertRaises(ValueError):
+            read_snapshot(bytes(data))
+
+
+    def test_truncated_snapshot_is_an_error(self):
+        data = self.write("Log", [self.columns1, self.columns2])
+        for end in (20, 40, len(data) - 50):
+            with self.assertRaises(ValueError):
+                read_snapshot(data[:end])
@@ -0,0 +1,78 @@
+from datetime import datetime, timezone, timedelta
+from unittest import TestCase
+from pychats.chats.timestamps import parse_timestamp, format_timestamp
+from pychats.chats.timestamps import timestamp_to_epoch, epoch_to_timestamp
+
+class TimestampParsingTests(TestCase):
+
+    def test_can_parse_timestamp(self):
+        self.assertEqual(
+         parse_timestamp("2009-05-23 12:12:01"), datetime(2009, 5, 23, 12, 12, 1)
+        )
+        self.assertEqual(
+         parse_timestamp("0942-01-02 03:04:05"), datetime(942, 1, 2, 3, 4, 5)
+        )
+
+
+    def test_can_parse_unpadded_timestamp(self):
+        self.assertEqual(
+         parse_timestamp("2009-5-3 2:12:01"), datetime(2009, 5, 3, 2, 12, 1)
+        )
+
+
+    def test_parsing_errors_match_strptime(self):
+        for text in ["2009-05-23T12:12:01", "2009-05-32 12:12:01",
+         "2009-05-23 12:12:0x", "2009-05-23", "", "2009-05-23 12:12:01+00:00",
+         "2009-05-23 12:12:01.000", "١٩٩٩-05-23 12:12:01"]:
+            try:
+                expected = datetime.strptime(text, "%Y-%m-%d %H:%M:%S")
+            except ValueError as e:
+                with self.assertRaises(ValueError) as cm:
+                    parse_timestamp(text)
+                self.assertEqual(str(cm.exception), str(e))
+            else:
+                self.assertEqual(parse_timestamp(text), expected)
+
+
+    def test_parsing_non_string_raises_type_error(self):
+        with self.assertRaises(TypeError):
+            parse_timestamp(20090523)
+
+
+
+class TimestampFormattingTests(TestCase):
+
+    def test_can_format_timestamp(self):
+        self.assertEqual(
+         format_timestamp(datetime(2009, 5, 23, 12, 12, 1)), "2009-05-23 12:12:01"
+        )
+
+
+    def test_formatting_matches_strftime(self):
+        for timestamp in [datetime(2009, 5, 23, 12, 12, 1, 500),
+         datetime(942, 1, 2, 3, 4, 5),
+         datetime(2009, 5, 23, tzinfo=timezone(timedelta(hours=1)))]:
+            self.assertEqual(
+             format_timestamp(timestamp),
+             timestamp.strftime("%Y-%m-%d %H:%M:%S")
+            )
+
+
+
+class EpochConversionTests(TestCase):
+
+    def test_can_convert_timestamps_to_epoch(self):
+        self.assertEqual(timestamp_to_epoch(datetime(1970, 1, 1)), 0)
+        self.assertEqual(
+         timestamp_to_epoch(datetime(2009, 5, 23, 12, 0, 1, 500)),
+         1243080001000500
+        )
+        self.assertEqual(timestamp_to_epoch(datetime(1969, 12, 31, 23, 59, 59)), -1000000)
+
+
+    def test_can_convert_epoch_to_timestamps(self):
+        for timestamp in [datetime(1970, 1, 1), datetime(1, 1, 1),
+         datetime(2009, 5, 23, 12, 0, 1, 500), datetime(9999, 12, 31, 23, 59)]:
+            self.assertEqual(
+             epoch_to_timestamp(timestamp_to_epoch(timestamp)), timestamp
+            )
@@ -0,0 +1,167 @@
+from unittest import TestCase
+from pychats.chats.views import SequenceView, SetView
+
+class SequenceViewTests(TestCase):
+
+    def setUp(self):
+        self.items = [1, 2, 3, 4, 5]
+        self.view = SequenceView(self.items)
+
+
+    def test_can_read_list_through_view(self):
+        self.assertEqual(len(self.view), 5)
+        self.assertEqual(self.view[0], 1)
+        self.assertEqual(self.view[-1], 5)
+        self.assertEqual(list(self.view), self.items)
+        self.assertIn(3, self.view)
+        self.assertNotIn(6, self.view)
+        self.assertEqual(self.view.index(4), 3)
+        self.assertEqual(list(reversed(self.view)), [5, 4, 3, 2, 1])
+        self.assertEqual(repr(self.view), "<SequenceView [1, 2, 3, 4, 5]>")
+        with self.assertRaises(IndexError):
+            self.view[5]
+
+
+    def test_view_reflects_changes(self):
+        self.items.append(6)
+        self.assertEqual(len(self.view), 6)
+        self.assertEqual(self.view[-1], 6)
+
+
+    def test_view_cannot_change_list(self):
+        with self.assertRaises(TypeError):
+            self.view[0] = 10
+        with self.assertRaises(TypeError):
+            del self.view[0]
+        self.assertFalse(hasattr(self.view, "append"))
+
+
+    def test_can_slice_view(self):
+        view = self.view[1:4]
+        self.assertIsInstance(view, SequenceView)
+        self.assertIs(view._items, self.items)
+        self.assertEqual(list(view), [2, 3, 4])
+        self.assertEqual(len(view), 3)
+        self.assertEqual(view[-1], 4)
+        self.assertEqual(list(view[::2]), [2, 4])
+        self.assertIn(3, view)
+        self.assertNotIn(5, view)
+        self.assertEqual(list(self.view[::-1]), [5, 4, 3, 2, 1])
+        self.assertEqual(list(SequenceView(self.items, range(2, 2))), [])
+
+
+    def test_views_equal_lists(self):
+        self.assertEqual(self.view, [1, 2, 3, 4, 5])
+        self.assertEqual([2, 3], self.view[1:3])
+        self.assertEqual(self.view[1:3], SequenceView([2, 3]))
+        self.assertNotEqual(self.view, [1, 2])
+        self.assertNotEqual(self.view, (1, 2, 3, 4, 5))
+
+
+    def test_can_copy_view(self):
+        copy = self.view.copy()
+        self.assertIsInstance(copy, list)
+        self.assertEqual(copy, self.items)
+        self.assertIsNot(copy, self.items)
+        self.assertEqual(self.view[3:].copy(), [4, 5])
+
+
+
+class OwnedSequenceViewTests(TestCase):
+
+    class Owner:
+        def __init__(self):
+            self.items, self._changes = [1, 2, 3, 4, 5], 0
+
+
+    def setUp(self):
+        self.owner = self.Owner()
+        self.view = SequenceView(self.owner.items, owner=self.owner)
+
+
+    def test_owned_view_reads_list(self):
+        self.assertEqual(list(self.view), [1, 2, 3, 4, 5])
+        self.assertEqual(list(self.view[1:3]), [2, 3])
+        self.assertIn(4, self.view[2:])
+
+
+    def test_changing_owner_during_iteration_raises(self):
+        with self.assertRaises(RuntimeError) as error:
+            for item in self.view:
+                self.owner.items.append(item)
+                self.owner._changes += 1
+        self.assertEqual(str(error.exception), "owner changed during iteration")
+        for item in self.view: pass
+
+
+    def test_sliced_view_raises_after_owner_changes(self):
+        view = self.view[1:3]
+        self.owner._changes += 1
+        for use in (len, list, lambda v: v[0], lambda v: v.copy()):
+            with self.assertRaises(RuntimeError):
+                use(view)
+        self.assertEqual(len(self.view), 5)
+        self.assertEqual(self.view[0], 1)
+
+
+    def test_view_can_use_other_counter(self):
+        self.owner.other = 0
+        view = SequenceView(self.owner.items, owner=self.owner, counter="other")
+        iterator = iter(view)
+        next(iterator)
+        self.owner._changes += 1
+        next(iterator)
+        self.owner.other += 1
+        with self.assertRaises(RuntimeError):
+            next(iterator)
+
+
+
+class SetViewTests(TestCase):
+
+    def setUp(self):
+        self.items = set([1, 2, 3])
+        self.view = SetView(self.items)
+
+
+    def test_can_read_set_through_view(self):
+        self.assertEqual(len(self.view), 3)
+        self.assertIn(2, self.view)
+        self.assertNotIn(4, self.view)
+        self.assertEqual(sorted(self.view), [1, 2, 3])
+        self.assertEqual(repr(self.view), "<SetView {1, 2, 3}>")
+
+
+    def test_view_reflects_changes(self):
+        self.items.add(4)
+        self.assertIn(4, self.view)
+        self.assertEqual(len(self.view), 4)
+
+
+    def test_view_cannot_change_set(self):
+        for method in ("add", "discard", "remove", "update"):
+            self.assertFalse(hasattr(self.view, method))
+
+
+    def test_views_equal_sets(self):
+        self.assertEqual(self.view, set([1, 2, 3]))
+        self.assertEqual(set([1, 2, 3]), self.view)
+        self.assertEqual(self.view, frozenset([1, 2, 3]))
+        self.assertEqual(self.view, SetView({1: "a", 2: "b", 3: "c"}.keys()))
+        self.assertNotEqual(self.view, set([1, 2]))
+        self.assertNotEqual(self.view, [1, 2, 3])
+
+
+    def test_set_operators_give_sets(self):
+        self.assertEqual(self.view & set([2, 3, 4]), set([2, 3]))
+        self.assertIsInstance(self.view & set([2]), set)
+        self.assertEqual(self.view | set([4]), set([1, 2, 3, 4]))
+        self.assertEqual(self.view - set([1]), set([2, 3]))
+        self.assertTrue(self.view <= set([1, 2, 3, 4]))
+
+
+    def test_can_copy_view(self):
+        copy = self.view.copy()
+        self.assertIsInstance(copy, set)
+        self.assertEqual(copy, self.items)
+        self.assertIsNot(copy, self.items)
@@ -1,8 +1,14 @@
+import os
+from random import Random
+from tempfile import TemporaryDirectory
 from unittest import TestCase
 from unittest.mock import Mock, patch, MagicMock
 import pychats.parse.facebook as fb
 from bs4 import BeautifulSoup
 from bs4.element import Tag
+from pychats.chats.chatlogs import ChatLog
+from pychats.chats.people import ContactRegistry
+from datetime import datetime
 
 class HtmlToThreadsTests(TestCase):
 
@@ -75,46 +81,332 @@ class ThreadConsolidationTests(TestCase):
 
 
 
+    def test_consolidation_matches_pairwise_merging(self):
+        def reference(threads):
+            for thread in threads:
+                thread["members"] = sorted(thread["members"])
+            for thread in threads:
+                if thread["messages"] and len(thread["members"]) == 2:
+                    matching_threads = [t for t in threads
+                     if t["members"] == thread["members"] and thread is not t]
+                    for matching_thread in matching_threads:
+                        thread["messages"] += matching_thread["messages"]
+                        matching_thread["messages"] = []
+            threads = [thread for thread in threads if thread["messages"]]
+            for thread in threads:
+                del thread["members"]
+                thread["messages"].reverse()
+            return threads
+        random = Random(1)
+        for _ in range(50):
+            threads = [{
+             "messages": list(range(i * 10, i * 10 + random.randrange(4))),
+             "members": random.sample("abcd", random.choice([1, 2, 2, 2, 3]))
+            } for i in range(random.randrange(30))]
+            copies = [
+             {"messages": list(t["messages"]), "members": list(t["members"])}
+             for t in threads
+            ]
+            self.assertEqual(
+             fb.consolidate_threads(iter(threads)), reference(copies)
+            )
+
+
+
+class IterThreadsTests(TestCase):
+
+    def test_can_iterate_over_threads(self):
+        html = """<html><body><div class="contents"><div>
+        <div class="thread">Thread1<p>A</p></div><div class="thread">Thread2</div>
+        </div><div><div class="thread">Thread3</div></div></body></html>"""
+        threads = fb.iter_threads(html)
+        thread1 = next(threads)
+        self.assertIsInstance(thread1, Tag)
+        self.assertEqual(thread1.text, "Thread1A")
+        thread2 = next(threads)
+        self.assertEqual(thread2.text, "Thread2")
+        self.assertIsNone(thread2.find_previous("div", {"class": "thread"}))
+        self.assertEqual(next(threads).text, "Thread3")
+        with self.assertRaises(StopIteration):
+            next(threads)
+
+
+    def test_iter_threads_requires_string(self):
+        with self.assertRaises(TypeError):
+            next(fb.iter_threads(100))
+
+
+
+class ThreadParserTests(TestCase):
+
+    def setUp(self):
+        with open("itests/test_files/messages.htm") as f:
+            self.html = f.read()
+
+
+    def test_events_backend_matches_soup_backend(self):
+        self.assertEqual(
+         list(fb.iter_thread_json(self.html, "events")),
+         list(fb.iter_thread_json(self.html, "soup"))
+        )
+
+
+    def test_events_backend_handles_any_chunk_boundaries(self):
+        expected = list(fb._iter_soup_threads(self.html))
+        for chunk_size in (1, 7, 100):
+            self.assertEqual(list(
+             fb._iter_event_threads(self.html, chunk_size)
+            ), expected)
+
+
+    def test_events_backend_handles_entities_and_nested_tags(self):
+        html = """<div class="contents"><div class="thread">1@f.com, 2&amp;3
+        <div class="message"><div class="message_header"><br/><img src="x">
+        <span class="user">A &lt;B&gt;</span>
+        <span class="meta">Friday, 19 August 2016 at 13:13 UTC+01</span>
+        </div></div><p>Tom &amp; <b>Jerry</b></p></div></div>"""
+        self.assertEqual(
+         list(fb.iter_thread_json(html, "events")),
+         list(fb.iter_thread_json(html, "soup"))
+        )
+
+
+    def test_parser_yields_threads_as_they_close(self):
+        parser = fb.ThreadParser()
+        parser.feed('<div class="thread">1@f.com</div><div class="thread">')
+        self.assertEqual(
+         parser.pop_threads(), [{"messages": [], "members": ["1@f.com"]}]
+        )
+        self.assertEqual(parser.pop_threads(), [])
+
+
+    def test_iter_thread_json_requires_string(self):
+        with self.assertRaises(TypeError):
+            fb.iter_thread_json(100)
+
+
+    def test_iter_thread_json_requires_known_backend(self):
+        with self.assertRaises(ValueError):
+            fb.iter_thread_json("<html>", "lxml")
+
+
+
+class ParallelParsingTests(TestCase):
+
+    def setUp(self):
+        with open("itests/test_files/messages.htm") as f:
+            self.html = f.read()
+
+
+    def test_can_split_document_into_thread_ranges(self):
+        html = '<p><div class="thread">A</div><div class="thread">B</div>'\
+         '<div class="thread">C</div></p>'
+        self.assertEqual(fb.split_threads(html, 2), [(3, 30), (30, len(html))])
+        self.assertEqual(
+         fb.split_threads(html, 10), [(3, 30), (30, 57), (57, len(html))]
+        )
+        self.assertEqual(fb.split_threads("<p></p>", 2), [])
+
+
+    def test_thread_class_can_be_quoted_any_way(self):
+        html = "<div class='thread'>A</div><div id=\"a\" class=\"b thread\">B"\
+         "</div><div class=thread>C</div><div class=\"threads\">D</div>"
+        self.assertEqual(
+         fb.split_threads(html), [(0, 27), (27, 63), (63, len(html))]
+        )
+        self.assertEqual(fb.split_threads(html.encode()), fb.split_threads(html))
+
+
+    def test_thread_ranges_parse_to_same_threads(self):
+        expected = list(fb.iter_thread_json(self.html))
+        for parts in (1, 2, 3, 5):
+            threads = []
+            for start, end in fb.split_threads(self.html, parts):
+                threads += fb.iter_thread_json(self.html[start:end])
+            self.assertEqual(threads, expected)
+
+
+    def test_workers_give_same_chatlog(self):
+        for backend in ("events", "soup"):
+            serial = fb.html_to_chatlog(self.html, backend)
+            parallel = fb.html_to_chatlog(self.html, backend, workers=2)
+            self.assertEqual(
+             sorted(serial.to_json()["conversations"], key=str),
+             sorted(parallel.to_json()["conversations"], key=str)
+            )
+
+
+    def test_workers_must_be_int(self):
+        with self.assertRaises(TypeError):
+            fb.html_to_chatlog(self.html, workers=2.0)
+
+
+    def test_workers_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            fb.html_to_chatlog(self.html, workers=0)
+
+
+    def test_parallel_parsing_checks_input(self):
+        with self.assertRaises(TypeError):
+            fb.html_to_chatlog(100, workers=2)
+        with self.assertRaises(ValueError):
+            fb.html_to_chatlog(self.html, "lxml", workers=2)
+
+
+
 class HtmlToChatLogTests(TestCase):
 
-    @patch("pychats.parse.facebook.html_to_threads")
-    @patch("pychats.parse.facebook.thread_to_json")
+    @patch("pychats.parse.facebook.iter_threads")
+    @patch("pychats.parse.facebook._read_thread")
     @patch("pychats.parse.facebook.consolidate_threads")
-    @patch("pychats.chats.chatlogs.ChatLog.from_json")
-    def test_chatlog_creation(self, from_json, mock_con, mock_json, mock_threads):
+    def test_chatlog_creation(self, mock_con, mock_read, mock_threads):
         html = "<html>"
         thread1, thread2 = Mock(), Mock()
-        mock_threads.return_value = [thread1, thread2]
-        mock_json.side_effect = [["a", "b"], ["c", "d"]]
-        mock_con.return_value = [["a", "b"], ["c", "d"]]
-        log = Mock()
-        from_json.return_value = log
+        mock_threads.return_value = iter([thread1, thread2])
+        mock_read.side_effect = [{"messages": [
+         ("Sam", datetime(2016, 8, 19, 13, 15), "B"),
+         ("Bob", datetime(2016, 8, 19, 13, 13), "A")
+        ]}, {"messages": [("Bob", datetime(2017, 1, 1, 9, 0), "C")]}]
+        mock_con.side_effect = lambda threads: list(threads)
 
-        chatlog = fb.html_to_chatlog(html)
+        chatlog = fb.html_to_chatlog(html, backend="soup")
 
         mock_threads.assert_called_with("<html>")
-        mock_json.assert_any_call(thread1)
-        mock_json.assert_any_call(thread2)
-        mock_con.assert_called_with([["a", "b"], ["c", "d"]])
-        from_json.assert_called_with(
-         {"name": "Facebook", "conversations": [["a", "b"], ["c", "d"]]}
+        mock_read.assert_any_call(thread1)
+        mock_read.assert_any_call(thread2)
+        mock_con.assert_called()
+        self.assertIsInstance(chatlog, ChatLog)
+        self.assertEqual(chatlog.name(), "Facebook")
+        conv1, conv2 = sorted(
+         chatlog.conversations(), key=lambda c: len(c.messages())
+        )
+        self.assertEqual(
+         [(m.text(), m.timestamp()) for m in conv2.messages()],
+         [("A", datetime(2016, 8, 19, 13, 13)), ("B", datetime(2016, 8, 19, 13, 15))]
+        )
+        bob = conv2.messages()[0].sender()
+        self.assertEqual(bob.name(), "Bob")
+        self.assertIs(conv1.messages()[0].sender(), bob)
+        self.assertIsInstance(bob._registry, ContactRegistry)
+
+
+
+class MetaParsingTests(TestCase):
+
+    def test_can_parse_meta_lines(self):
+        self.assertEqual(
+         fb.parse_meta("Friday, 19 August 2016 at 13:13 UTC+01"),
+         datetime(2016, 8, 19, 13, 13)
         )
-        self.assertIs(log, chatlog)
+
+
+    def test_meta_parsing_matches_strptime(self):
+        for meta in (
+         "Thursday, 28 August 2014 at 00:19 UTC+01",
+         "Thursday, 28 August 2014 at 23:59 UTC+01",
+         "Monday, 29 February 2016 at 9:05 UTC",
+         "Monday,  1 March 2016 at 10:05 UTC",
+         "Monday, 01 March 2016 at 10:05 UTC",
+         "saturday, 5 JANUARY 2013 at 00:05 UTC"
+        ):
+            self.assertEqual(fb.parse_meta(meta), datetime.strptime(
+             " ".join(meta.split(" ")[:-1]), "%A, %d %B %Y at %H:%M"
+            ))
+
+
+    def test_invalid_meta_lines_raise_strptime_errors(self):
+        for meta in (
+         "Thursday, 28 August 2014 at 24:19 UTC+01",
+         "Thursday, 28 August 2014 at 12:60 UTC+01",
+         "Thursday, 28 August 2014 at 1/:00 UTC+01",
+         "Thursday, 28 August 2014 at 12:5/ UTC+01",
+         "Thursday, 30 February 2014 at 12:00 UTC+01",
+         "Someday, 28 August 2014 at 12:00 UTC+01",
+         "Thursday, 28 Augustus 2014 at 12:00 UTC+01",
+         "Sat, 5 January 2013 at 00:05 UTC",
+         "Saturday, 5 Jan 2013 at 00:05 UTC",
+         "Thursday, 28 August 2014 at 12:00",
+         ""
+        ):
+            with self.assertRaises(ValueError):
+                fb.parse_meta(meta)
+
+
+    def test_date_prefixes_are_memoised(self):
+        fb._DATES.clear()
+        fb.parse_meta("Friday, 19 August 2016 at 13:13 UTC+01")
+        with patch("pychats.parse.facebook._parse_date_prefix") as mock_parse:
+            self.assertEqual(
+             fb.parse_meta("Friday, 19 August 2016 at 18:40 UTC+01"),
+             datetime(2016, 8, 19, 18, 40)
+            )
+            self.assertFalse(mock_parse.called)
 
 
 
 class FacebookFileLoadingTests(TestCase):
 
-    @patch("pychats.parse.facebook.html_to_chatlog")
-    @patch("builtins.open")
-    def test_loading_from_json_file(self, mock_open, mock_html):
-        open_return = MagicMock()
-        mock_file = Mock()
-        open_return.__enter__.return_value = mock_file
-        mock_file.read.return_value = "<html>"
-        mock_open.return_value = open_return
-        mock_html.return_value = "log object"
-        log = fb.from_facebook("path/to/file")
-        mock_open.assert_called_with("path/to/file")
-        mock_html.assert_called_with("<html>")
-        self.assertEqual(log, "log object")
+    def setUp(self):
+        with open("itests/test_files/messages.htm") as f:
+            self.html = f.read()
+
+
+    def test_loading_from_file_matches_loading_from_string(self):
+        expected = fb.html_to_chatlog(self.html).to_json()["conversations"]
+        for workers in (1, 2):
+            log = fb.from_facebook("itests/test_files/messages.htm", workers=workers)
+            self.assertEqual(
+             sorted(log.to_json()["conversations"], key=str),
+             sorted(expected, key=str)
+            )
+
+
+    def test_loading_matches_loading_from_string_however_classes_are_quoted(self):
+        parts = self.html.split('<div class="thread">')
+        markup = ['<div class="thread extra">', "<div class='thread'>"]
+        html = parts[0] + "".join(
+         markup[index % 2] + part for index, part in enumerate(parts[1:])
+        )
+        expected = fb.html_to_chatlog(self.html).to_json()["conversations"]
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, "messages.htm")
+            with open(path, "w") as f:
+                f.write(html)
+            for workers in (1, 2):
+                for log in (fb.html_to_chatlog(html, workers=workers),
+                 fb.from_facebook(path, workers=workers)):
+                    self.assertEqual(
+                     sorted(log.to_json()["conversations"], key=str),
+                     sorted(expected, key=str)
+                    )
+
+
+    @patch("pychats.parse.facebook.map_file")
+    def test_loading_only_decodes_threads(self, mock_map):
+        data = self.html.encode()
+        mock_map.return_value.__enter__.return_value = data
+        with patch("pychats.parse.facebook.decode_text") as mock_decode:
+            mock_decode.side_effect = lambda data: str(data, "utf-8")
+            log = fb.from_facebook("path/to/file")
+        mock_map.assert_called_with("path/to/file")
+        self.assertEqual(mock_decode.call_count, 5)
+        for args in mock_decode.call_args_list:
+            self.assertTrue(args[0][0].startswith(b'<div class="thread">'))
+        self.assertEqual(len(log.conversations()), 4)
+
+
+    def test_can_split_bytes_into_thread_ranges(self):
+        data = self.html.encode()
+        self.assertEqual(
+         [data[start:end] for start, end in fb.split_threads(data)],
+         [text.encode() for text in (
+          self.html[start:end] for start, end in fb.split_threads(self.html)
+         )]
+        )
+
+
+    def test_loading_checks_arguments_before_reading(self):
+        with self.assertRaises(ValueError):
+            fb.from_facebook("path/to/file", "lxml")
+        with self.assertRaises(ValueError):
+            fb.from_facebook("path/to/file", workers=0)
@@ -0,0 +1,256 @@
+import os
+import struct
+import tempfile
+from array import array
+from datetime import datetime
+from unittest import TestCase
+from pychats.chats.people import Contact
+from pychats.chats.messages import Message
+from pychats.chats.conversations import Conversation
+from pychats.chats.chatlogs import ChatLog
+from pychats.search import SearchIndex, tokenize, _intersect
+
+class SearchTest(TestCase):
+
+    def setUp(self):
+        self.marvin = Contact("Marvin Goodwright")
+        self.mildred = Contact("Mildred Mayhew")
+        self.messages = [
+         Message("Hello there, World", datetime(2017, 8, 21, 9, 0), self.marvin),
+         Message("See you tomorrow", datetime(2017, 8, 21, 9, 1), self.mildred),
+         Message("Breakfast is ready", datetime(2017, 8, 21, 9, 2), self.marvin),
+         Message("Don't break it", datetime(2017, 8, 21, 9, 3), self.mildred),
+         Message("world hello", datetime(2017, 8, 22, 9, 0), self.marvin),
+        ]
+        self.conversation1 = Conversation()
+        self.conversation1.add_messages(self.messages[:4])
+        self.conversation2 = Conversation()
+        self.conversation2.add_messages(self.messages[4:])
+        self.log = ChatLog("Test")
+        self.log.add_conversations([self.conversation1, self.conversation2])
+        self.index = SearchIndex(self.log)
+
+
+    def assertFound(self, results, indexes):
+        self.assertEqual(
+         sorted(self.messages.index(message) for message in results), indexes
+        )
+
+
+
+class TokenizingTests(TestCase):
+
+    def test_can_tokenize_text(self):
+        self.assertEqual(tokenize("Hello, WORLD! Don't 2day"), [
+         "hello", "world", "don", "t", "2day"
+        ])
+        self.assertEqual(tokenize("Straße"), ["strasse"])
+        self.assertEqual(tokenize(" ... "), [])
+
+
+
+class IntersectionTests(TestCase):
+
+    def test_can_intersect_postings(self):
+        first = array("q", [1, 5, 9, 200])
+        second = array("q", range(0, 300, 3))
+        self.assertEqual(list(_intersect(first, second)), [9])
+        self.assertEqual(list(_intersect(second, first)), [9])
+        self.assertEqual(list(_intersect(first, array("q"))), [])
+        self.assertEqual(
+         list(_intersect(array("q", range(100)), array("q", range(50, 60)))),
+         list(range(50, 60))
+        )
+
+
+
+class SearchIndexCreationTests(SearchTest):
+
+    def test_can_create_index(self):
+        self.assertEqual(len(self.index), 5)
+        self.assertEqual(repr(self.index), "<SearchIndex (5 messages)>")
+        self.assertEqual(list(self.index._postings["hello"]), sorted([
+         self.index._numbers[self.messages[0]],
+         self.index._numbers[self.messages[4]]
+        ]))
+        self.assertIn(self.index, self.log._indexes)
+
+
+    def test_index_needs_chatlog(self):
+        with self.assertRaises(TypeError):
+            SearchIndex(self.conversation1)
+
+
+
+class SearchIndexQueryTests(SearchTest):
+
+    def test_can_search_terms(self):
+        self.assertFound(self.index.term("World"), [0, 4])
+        self.assertFound(self.index.term("nothing"), [])
+        self.assertFound(self.index.search("hello world"), [0, 4])
+        self.assertFound(self.index.search("hello you"), [])
+        self.assertFound(self.index.search("HELLO"), [0, 4])
+
+
+    def test_can_search_phrases(self):
+        self.assertFound(self.index.phrase("World Hello"), [4])
+        self.assertFound(self.index.phrase("hello world"), [])
+        self.assertFound(self.index.phrase("There world"), [0])
+        self.assertFound(self.index.phrase("world there"), [])
+        self.assertFound(self.index.search('"see you" tomorrow'), [1])
+        self.assertFound(self.index.search("don't"), [3])
+        self.assertFound(self.index.search("t don"), [3])
+
+
+    def test_can_search_prefixes(self):
+        self.assertFound(self.index.prefix("Brea"), [2, 3])
+        self.assertFound(self.index.prefix("z"), [])
+        self.assertFound(self.index.search("brea* ready"), [2])
+        self.assertFound(self.index.search("bre* w*"), [])
+
+
+    def test_empty_query_finds_nothing(self):
+        self.assertEqual(self.index.search(""), [])
+        self.assertEqual(self.index.search('"" !'), [])
+
+
+
+class SearchIndexUpdateTests(SearchTest):
+
+    def test_adding_messages_updates_index(self):
+        message = Message("Hello again", datetime(2017, 9, 1), self.marvin)
+        self.conversation2.add_message(message)
+        self.messages.append(message)
+        self.assertFound(self.index.search("hello"), [0, 4, 5])
+        message = Message("hello", datetime(2017, 9, 2), self.marvin)
+        self.conversation1.add_messages([message])
+        self.messages.append(message)
+        self.assertFound(self.index.search("hello"), [0, 4, 5, 6])
+
+
+    def test_removing_messages_updates_index(self):
+        self.conversation2.remove_message(self.messages[4])
+        self.assertFound(self.index.search("hello"), [0])
+        self.assertEqual(len(self.index), 4)
+
+
+    def test_editing_text_updates_index(self):
+        self.messages[1].text("Hello tomorrow")
+        self.assertFound(self.index.search("hello"), [0, 1, 4])
+        self.assertFound(self.index.search("see"), [])
+
+
+    def test_adding_and_removing_conversations_updates_index(self):
+        conversation = Conversation()
+        message = Message("hello", datetime(2017, 9, 2), self.marvin)
+        conversation.add_message(message)
+        self.messages.append(message)
+        self.log.add_conversation(conversation)
+        self.assertFound(self.index.search("hello"), [0, 4, 5])
+        self.log.remove_conversation(self.conversation1)
+        self.assertFound(self.index.search("hello"), [4, 5])
+        self.conversation1.add_message(
+         Message("hello", datetime(2017, 9, 3), self.marvin)
+        )
+        self.assertFound(self.index.search("hello"), [4, 5])
+
+
+    def test_index_compacts_after_removals(self):
+        for message in self.messages[:3]:
+            self.conversation1.remove_message(message)
+        self.assertEqual(self.index._removed, 0)
+        self.assertEqual(
+         sorted(self.index._documents, key=Message.timestamp), self.messages[3:]
+        )
+        self.assertNotIn("see", self.index._postings)
+        self.assertFound(self.index.search("hello"), [4])
+
+
+    def test_unused_indexes_are_not_updated(self):
+        del self.index
+        self.assertEqual(len(self.log._indexes), 0)
+        self.conversation1.add_message(
+         Message("hello", datetime(2017, 9, 3), self.marvin)
+        )
+
+
+
+class SearchIndexSavingTests(SearchTest):
+
+    def setUp(self):
+        SearchTest.setUp(self)
+        self.path = os.path.join(tempfile.mkdtemp(), "index")
+
+
+    def tearDown(self):
+        if os.path.exists(self.path): os.remove(self.path)
+        os.rmdir(os.path.dirname(self.path))
+
+
+    def postings(self, index):
+        return {term: sorted(
+         self.messages.index(index._documents[n]) for n in postings
+         if index._documents[n] is not None
+        ) for term, postings in index._postings.items()}
+
+
+    def test_can_save_and_load_index(self):
+        self.conversation2.remove_message(self.messages[4])
+        self.conversation2.add_message(self.messages[4])
+        self.index.save(self.path)
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(8), b"PYCHATSI")
+        index = SearchIndex.load(self.path, self.log)
+        self.assertEqual(len(index), 5)
+        self.assertEqual(index._removed, 0)
+        self.assertFound(index.search("hello"), [0, 4])
+        self.assertFound(index.search('"see you" brea*'), [])
+        self.assertFound(index.prefix("brea"), [2, 3])
+        self.assertEqual(self.postings(index), self.postings(self.index))
+        message = Message("hello", datetime(2017, 9, 3), self.marvin)
+        self.conversation2.add_message(message)
+        self.messages.append(message)
+        self.assertFound(index.search("hello"), [0, 4, 5])
+
+
+    def test_loading_reindexes_changed_conversations(self):
+        self.index.save(self.path)
+        self.messages[4].text("Goodbye")
+        conversation = Conversation()
+        message = Message("hello", datetime(2017, 9, 2), self.marvin)
+        conversation.add_message(message)
+        self.messages.append(message)
+        self.log.add_conversation(conversation)
+        index = SearchIndex.load(self.path, self.log)
+        self.assertEqual(len(index), 6)
+        self.assertFound(index.search("hello"), [0, 5])
+        self.assertFound(index.search("goodbye"), [4])
+
+
+    def test_can_load_index_into_a_copy_of_the_chatlog(self):
+        self.index.save(self.path)
+        log = ChatLog.from_json(self.log.to_json())
+        index = SearchIndex.load(self.path, log)
+        results = index.search("hello")
+        self.assertEqual(
+         sorted(message.text() for message in results),
+         ["Hello there, World", "world hello"]
+        )
+        self.assertEqual(
+         set(message.conversation().chatlog() for message in results), {log}
+        )
+
+
+    def test_saved_index_must_be_valid(self):
+        self.index.save(self.path)
+        with open(self.path, "rb") as f:
+            data = f.read()
+        for bad in (b"", b"NOTCHATS" + data[8:], data[:30], data[:-3]):
+            with open(self.path, "wb") as f:
+                f.write(bad)
+            with self.assertRaises(ValueError):
+                SearchIndex.load(self.path, self.log)
+        with open(self.path, "wb") as f:
+            f.write(data[:8] + struct.pack("<I", 99) + data[12:])
+        with self.assertRaises(ValueError):
+            SearchIndex.load(self.path, self.log)
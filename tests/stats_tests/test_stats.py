@@ -0,0 +1,134 @@
+from datetime import datetime, date
+from unittest import TestCase
+from unittest.mock import patch
+from pychats.chats.people import Contact
+from pychats.chats.messages import Message
+from pychats.chats.conversations import Conversation
+from pychats.chats.chatlogs import ChatLog
+from pychats.chats.columns import MessageColumns
+import pychats.stats as stats
+
+class StatsTest(TestCase):
+
+    def setUp(self):
+        self.marvin = Contact("Marvin Goodwright")
+        self.mildred = Contact("Mildred Mayhew")
+        self.conversation1 = Conversation()
+        self.conversation1.add_messages([
+         Message("1", datetime(2017, 8, 21, 9, 0, 0), self.marvin),
+         Message("2", datetime(2017, 8, 21, 9, 0, 30), self.marvin),
+         Message("3", datetime(2017, 8, 21, 9, 1, 0), self.mildred),
+         Message("4", datetime(2017, 8, 22, 23, 59, 59), self.marvin),
+         Message("5", datetime(2017, 8, 24, 0, 0, 1), self.mildred),
+        ])
+        self.conversation2 = Conversation()
+        self.conversation2.add_messages([
+         Message("6", datetime(2017, 8, 23, 9, 0, 0), self.mildred),
+         Message("7", datetime(2017, 8, 30, 10, 0, 5), self.marvin),
+         Message("8", datetime(1969, 12, 31, 23, 0, 0), self.marvin),
+        ])
+        self.log = ChatLog("Test")
+        self.log.add_conversations([self.conversation1, self.conversation2])
+
+
+    def check(self, function, *args):
+        # Runs a test with and without NumPy, if it is installed.
+        if stats.numpy is not None:
+            function(*args)
+        with patch("pychats.stats.numpy", None):
+            function(*args)
+
+
+
+class MessageCountTests(StatsTest):
+
+    def test_can_count_messages(self):
+        def test():
+            self.assertEqual(stats.message_counts(self.conversation1), {
+             self.marvin: 3, self.mildred: 2
+            })
+            self.assertEqual(stats.message_counts(self.log), {
+             self.marvin: 5, self.mildred: 3
+            })
+            self.assertEqual(stats.message_counts(MessageColumns()), {})
+        self.check(test)
+
+
+    def test_source_must_be_valid(self):
+        with self.assertRaises(TypeError):
+            stats.message_counts([])
+
+
+
+class HistogramTests(StatsTest):
+
+    def test_can_make_hour_histogram(self):
+        def test():
+            expected = [0] * 24
+            expected[9], expected[23], expected[0], expected[10] = 4, 2, 1, 1
+            self.assertEqual(stats.histogram(self.log), expected)
+            self.assertEqual(stats.histogram(self.log, "hour"), expected)
+        self.check(test)
+
+
+    def test_can_make_weekday_histogram(self):
+        def test():
+            self.assertEqual(
+             stats.histogram(self.log, "weekday"), [3, 1, 3, 1, 0, 0, 0]
+            )
+        self.check(test)
+
+
+    def test_can_make_day_histogram(self):
+        def test():
+            self.assertEqual(stats.histogram(self.conversation1, "day"), {
+             date(2017, 8, 21): 3, date(2017, 8, 22): 1, date(2017, 8, 24): 1
+            })
+            self.assertEqual(stats.histogram(self.log, "day")[
+             date(1969, 12, 31)
+            ], 1)
+        self.check(test)
+
+
+    def test_can_make_week_histogram(self):
+        def test():
+            self.assertEqual(stats.histogram(self.log, "week"), {
+             date(1969, 12, 29): 1, date(2017, 8, 21): 6, date(2017, 8, 28): 1
+            })
+        self.check(test)
+
+
+    def test_histogram_period_must_be_valid(self):
+        with self.assertRaises(ValueError):
+            stats.histogram(self.log, "month")
+
+
+
+class ResponseTimeTests(StatsTest):
+
+    def test_can_get_response_times(self):
+        def test():
+            self.assertEqual(list(stats.response_times(self.conversation1)), [
+             30 * 10 ** 6, (86400 + 14 * 3600 + 58 * 60 + 59) * 10 ** 6,
+             (86400 + 2) * 10 ** 6
+            ])
+            self.assertEqual(sorted(stats.response_times(self.log)), sorted([
+             30 * 10 ** 6, (86400 + 14 * 3600 + 58 * 60 + 59) * 10 ** 6,
+             (86400 + 2) * 10 ** 6, (7 * 86400 + 3600 + 5) * 10 ** 6,
+             (datetime(2017, 8, 23, 9) - datetime(1969, 12, 31, 23)
+             ).total_seconds() * 10 ** 6
+            ]))
+            self.assertEqual(list(stats.response_times(MessageColumns())), [])
+        self.check(test)
+
+
+
+class StreakTests(StatsTest):
+
+    def test_can_get_streaks(self):
+        def test():
+            self.assertEqual(stats.streaks(self.conversation1), [2, 1])
+            self.assertEqual(stats.streaks(self.log), [1, 4, 1])
+            self.assertEqual(stats.streaks(MessageColumns()), [])
+            self.assertEqual(stats.streaks(ChatLog("Empty")), [])
+        self.check(test)